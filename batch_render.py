@@ -0,0 +1,176 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing as mp
+from loguru import logger
+
+from settings import Settings
+
+
+PARAM_EXTENSIONS = ('.pkl', '.joblib', '.bmvp')
+
+_WORKER = None
+_CACHE = None
+
+
+def collect_inputs(paths):
+    # Returns {input path: name of its image}. Files found in a directory are
+    # named by their path relative to that directory, with the extension
+    # kept, so a/x.pkl, b/x.pkl and x.bmvp get different images.
+    names = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for ext in PARAM_EXTENSIONS:
+                for f in glob.glob(os.path.join(path, '**', f'*{ext}'), recursive=True):
+                    names.setdefault(f, os.path.relpath(f, path))
+        else:
+            names.setdefault(path, os.path.basename(path))
+    inputs = dict(sorted(names.items()))
+    # the same relative name can still come from two input roots
+    by_name = {}
+    for f, name in inputs.items():
+        by_name.setdefault(name, []).append(f)
+    clashes = {name: files for name, files in by_name.items() if len(files) > 1}
+    if clashes:
+        lines = '\n'.join(f'  {name}: {", ".join(files)}' for name, files in sorted(clashes.items()))
+        raise ValueError(f'Inputs would be rendered to the same image:\n{lines}')
+    return inputs
+
+
+def read_manifest(manifest_path):
+    done = {}
+    if not os.path.isfile(manifest_path):
+        return done
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # a partially written last line from an interrupted run
+                continue
+            if entry.get('status') == 'ok' and os.path.isfile(entry['output']):
+                done[entry['input']] = entry
+    return done
+
+
+def get_output_path(name, output_dir):
+    # name from collect_inputs, e.g. subject_01/pose.pkl -> <output>/subject_01/pose.pkl.png
+    return os.path.join(output_dir, f'{name}.png')
+
+
+def _init_worker(renderer_kwargs, cache_dir=None, cache_bytes=None):
+    # Every worker owns one renderer and keeps the body models it has used
+    # loaded, so only the first file of each model type pays the setup cost.
+    global _WORKER, _CACHE
+    from offscreen import OffscreenBodyRenderer
+    _WORKER = OffscreenBodyRenderer(**renderer_kwargs)
+    if cache_dir is not None:
+        from render_cache import RenderCache
+        _CACHE = RenderCache(cache_dir, max_bytes=cache_bytes)
+
+
+def _render_file(job):
+    from offscreen import write_image
+    from render_cache import copy_cached
+    from body_models import load_saved_params
+
+    input_path, output_path = job
+    start = time.perf_counter()
+    try:
+        params = load_saved_params(input_path)
+        key = None
+        if _CACHE is not None:
+            key = _WORKER.get_render_key(params)
+            cached_path = _CACHE.get(key)
+            if cached_path is not None:
+                copy_cached(cached_path, output_path)
+                return {
+                    'input': input_path, 'output': output_path, 'status': 'ok', 'cached': True,
+                    'seconds': round(time.perf_counter() - start, 4),
+                }
+        _WORKER.set_body(params)
+        _WORKER.setup_camera()
+        write_image(output_path, _WORKER.render())
+        if key is not None:
+            _CACHE.put_file(key, output_path)
+    except Exception as e:
+        return {'input': input_path, 'output': output_path, 'status': 'error', 'error': str(e)}
+    return {
+        'input': input_path, 'output': output_path, 'status': 'ok', 'cached': False,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+def main(args):
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(args.output, 'manifest.jsonl')
+
+    try:
+        inputs = collect_inputs(args.input)
+    except ValueError as e:
+        logger.error(e)
+        return 1
+    outputs = {f: get_output_path(name, args.output) for f, name in inputs.items()}
+    # entries written for a different output path (older naming) are rendered again
+    done = {f: e for f, e in read_manifest(manifest_path).items()
+            if f in outputs and os.path.abspath(e['output']) == os.path.abspath(outputs[f])}
+    jobs = [(f, outputs[f]) for f in inputs if f not in done]
+    for _, output_path in jobs:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    logger.info(f'{len(inputs)} parameter files, {len(done)} already rendered, {len(jobs)} to go')
+    if len(jobs) == 0:
+        return
+
+    renderer_kwargs = {
+        'width': args.width,
+        'height': args.height,
+        'material': args.material,
+        'lighting': args.lighting,
+        'show_ground': not args.no_ground,
+    }
+
+    # spawn, so that no worker inherits a half-initialized rendering context
+    ctx = mp.get_context('spawn')
+    n_failed = 0
+    start = time.perf_counter()
+    initargs = (renderer_kwargs, args.cache_dir, args.cache_size_mb * 1024 ** 2)
+    with ctx.Pool(args.workers, initializer=_init_worker, initargs=initargs) as pool, \
+            open(manifest_path, 'a') as manifest:
+        results = pool.imap_unordered(_render_file, jobs, chunksize=args.chunksize)
+        for idx, entry in enumerate(results):
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            if entry['status'] != 'ok':
+                n_failed += 1
+                logger.warning(f'Failed to render {entry["input"]}: {entry["error"]}')
+            if (idx + 1) % 100 == 0:
+                logger.info(f'Rendered {idx + 1}/{len(jobs)}')
+
+    elapsed = time.perf_counter() - start
+    logger.info(f'Rendered {len(jobs) - n_failed}/{len(jobs)} files in {elapsed:.1f}s, {n_failed} failed')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render saved model params to PNGs without a display')
+    parser.add_argument('input', nargs='+', help='Parameter files or directories')
+    parser.add_argument('--output', required=True, help='Output directory for images and manifest.jsonl')
+    parser.add_argument('--width', type=int, default=512)
+    parser.add_argument('--height', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=max(1, os.cpu_count() // 2))
+    parser.add_argument('--chunksize', type=int, default=8)
+    parser.add_argument('--material', default=Settings.DEFAULT_MATERIAL_NAME,
+                        choices=sorted(Settings.PREFAB.keys()))
+    parser.add_argument('--lighting', default=Settings.DEFAULT_PROFILE_NAME,
+                        choices=sorted(Settings.LIGHTING_PROFILES.keys()))
+    parser.add_argument('--no-ground', action='store_true', help='Do not draw the ground plane')
+    parser.add_argument('--cache-dir', default=None, help='Reuse identical renders from this cache directory')
+    parser.add_argument('--cache-size-mb', type=int, default=2048, help='Size cap of the render cache')
+
+    args = parser.parse_args()
+    sys.exit(main(args))
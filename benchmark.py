@@ -0,0 +1,261 @@
+# Per-stage latency of a body update, the same stages the GUI runs in
+# load_body_model / _on_show_joints / _on_show_joint_labels:
+#
+#   forward   batched forward pass (every batch size)
+#   mesh      Open3D TriangleMesh construction
+#   normals   vertex normals
+#   upload    replacing the body geometry in a scene
+#   joints    rebuilding the joint spheres
+#   labels    rebuilding the joint labels (needs --window)
+#   ik        5 iterations of the incremental IK used by joint dragging
+#   render    rendering the scene to an image (offscreen only)
+#
+# Models are synthetic (synthetic_models.py) unless --model-dir is given, so
+# the suite runs without the licensed model files.
+import os
+import json
+import time
+import tempfile
+import argparse
+import platform
+import numpy as np
+import torch
+import open3d as o3d
+from loguru import logger
+
+from body_models import (
+    build_body_model,
+    build_body_mesh,
+    forward_body_model_batch,
+    get_default_pose_params,
+)
+from simple_ik import IncrementalIKSolver
+from synthetic_models import write_synthetic_models
+
+STAGES = ['forward', 'mesh', 'normals', 'upload', 'joints', 'labels', 'ik', 'render']
+
+
+def time_stage(fn, repeat=20, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(1000 * (time.perf_counter() - start))
+    return samples
+
+
+def summarize(samples):
+    samples = np.asarray(samples)
+    median = float(np.median(samples))
+    return {
+        'median_ms': median,
+        'mad_ms': float(np.median(np.abs(samples - median))),
+        'min_ms': float(samples.min()),
+        'samples_ms': samples.tolist(),
+    }
+
+
+class SceneTarget:
+    # Where geometry gets uploaded: an offscreen renderer, or a real window
+    # when labels should be measured as well.
+    def __init__(self, use_window=False, width=640, height=480):
+        import open3d.visualization.gui as gui
+        import open3d.visualization.rendering as rendering
+        self.widget = None
+        self.material = rendering.MaterialRecord()
+        self.material.shader = 'defaultLit'
+        if use_window:
+            gui.Application.instance.initialize()
+            self.window = gui.Application.instance.create_window('benchmark', width, height)
+            self.widget = gui.SceneWidget()
+            self.widget.scene = rendering.Open3DScene(self.window.renderer)
+            self.window.add_child(self.widget)
+            self.scene = self.widget.scene
+        else:
+            self.renderer = rendering.OffscreenRenderer(width, height)
+            self.scene = self.renderer.scene
+
+
+def get_scene_target(use_window):
+    try:
+        return SceneTarget(use_window)
+    except Exception as e:
+        logger.warning(f'No render target, skipping upload/joints/labels stages ({e})')
+        return None
+
+
+def benchmark_model(model, body_model, batch_sizes, target, repeat):
+    results = {}
+    for batch_size in batch_sizes:
+        betas = torch.zeros(batch_size, 10)
+        expression = torch.zeros(batch_size, 10)
+        pose_params = get_default_pose_params(body_model, batch_size)
+        for v in pose_params.values():
+            v.normal_(std=0.2)
+        results[('forward', batch_size)] = time_stage(
+            lambda: forward_body_model_batch(model, betas, expression, pose_params), repeat)
+
+    # the remaining stages run once per displayed frame
+    verts, joints = forward_body_model_batch(
+        model, torch.zeros(1, 10), torch.zeros(1, 10), get_default_pose_params(body_model, 1))
+    verts, joints = verts[0], joints[0]
+    faces = model.faces.astype(np.int32)
+
+    def build_mesh():
+        mesh = o3d.geometry.TriangleMesh()
+        mesh.vertices = o3d.utility.Vector3dVector(verts)
+        mesh.triangles = o3d.utility.Vector3iVector(faces)
+        return mesh
+
+    mesh = build_mesh()
+    results[('mesh', 1)] = time_stage(build_mesh, repeat)
+    results[('normals', 1)] = time_stage(mesh.compute_vertex_normals, repeat)
+
+    if body_model in ('SMPL', 'SMPLX'):
+        pose = get_default_pose_params(body_model, 1)['body_pose']
+        target_joints = torch.from_numpy(joints[:22]) + 0.05
+        solver = IncrementalIKSolver(model, pose, betas=torch.zeros(1, 10))
+        results[('ik', 1)] = time_stage(
+            lambda: solver.step(target_joints, max_iter=5, time_budget=float('inf')), repeat)
+
+    if target is None:
+        return results
+
+    body = build_body_mesh(verts, faces)
+
+    def upload():
+        target.scene.remove_geometry('__body_model__')
+        target.scene.add_geometry('__body_model__', body, target.material)
+
+    def rebuild_joints():
+        for i in range(len(joints)):
+            target.scene.remove_geometry(f'__joints_{i}__')
+            sphere = o3d.geometry.TriangleMesh.create_sphere(radius=0.01)
+            sphere.compute_vertex_normals()
+            sphere.translate(joints[i])
+            target.scene.add_geometry(f'__joints_{i}__', sphere, target.material)
+
+    results[('upload', 1)] = time_stage(upload, repeat)
+    results[('joints', 1)] = time_stage(rebuild_joints, max(1, repeat // 4))
+
+    if target.widget is not None:
+        labels = []
+
+        def rebuild_labels():
+            for label in labels:
+                target.widget.remove_3d_label(label)
+            labels[:] = [target.widget.add_3d_label(j, f'{i}') for i, j in enumerate(joints)]
+
+        results[('labels', 1)] = time_stage(rebuild_labels, max(1, repeat // 4))
+    else:
+        target.renderer.setup_camera(60.0, body.get_axis_aligned_bounding_box(),
+                                     body.get_center())
+        results[('render', 1)] = time_stage(target.renderer.render_to_image, repeat)
+    return results
+
+
+def run_benchmark(body_models, n_verts_list, batch_sizes, model_dir=None,
+                  use_window=False, repeat=20, n_threads=None):
+    if n_threads is not None:
+        torch.set_num_threads(n_threads)
+    target = get_scene_target(use_window)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_verts in ([None] if model_dir is not None else n_verts_list):
+            synthetic_dir = model_dir
+            if model_dir is None:
+                synthetic_dir = os.path.join(tmp, f'{n_verts}')
+                write_synthetic_models(synthetic_dir, body_models, genders=('neutral',),
+                                       n_verts=n_verts)
+            for body_model in body_models:
+                model = build_body_model(body_model, 'neutral', synthetic_dir)
+                n_model_verts = model.v_template.shape[0]
+
+                results = benchmark_model(model, body_model, batch_sizes, target, repeat)
+                for (stage, batch_size), samples in results.items():
+                    row = {
+                        'body_model': body_model,
+                        'n_verts': n_model_verts,
+                        'batch_size': batch_size,
+                        'stage': stage,
+                    }
+                    row.update(summarize(samples))
+                    rows.append(row)
+                    logger.info(f'{body_model:6s} V={n_model_verts:6d} B={batch_size:4d} '
+                                f'{stage:8s} {row["median_ms"]:8.3f} ms')
+    return rows
+
+
+def get_machine_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'open3d': o3d.__version__,
+        'torch_threads': torch.get_num_threads(),
+    }
+
+
+def print_table(rows):
+    stages = [s for s in STAGES if any(r['stage'] == s for r in rows)]
+    keys = sorted({(r['body_model'], r['n_verts'], r['batch_size']) for r in rows})
+    by_key = {(r['body_model'], r['n_verts'], r['batch_size'], r['stage']): r for r in rows}
+    print(f'{"model":6s} {"verts":>7s} {"batch":>5s} ' + ' '.join(f'{s:>9s}' for s in stages))
+    for bm, n_verts, batch_size in keys:
+        cells = []
+        for s in stages:
+            r = by_key.get((bm, n_verts, batch_size, s))
+            cells.append(f'{r["median_ms"]:9.3f}' if r else f'{"-":>9s}')
+        print(f'{bm:6s} {n_verts:7d} {batch_size:5d} ' + ' '.join(cells))
+
+
+def plot_results(rows, path):
+    import matplotlib.pyplot as plt
+    fig, (ax_verts, ax_batch) = plt.subplots(1, 2, figsize=(12, 5))
+    for bm in sorted({r['body_model'] for r in rows}):
+        for stage in STAGES:
+            pts = sorted((r['n_verts'], r['median_ms']) for r in rows
+                         if r['body_model'] == bm and r['stage'] == stage and r['batch_size'] == 1)
+            if len(pts) > 1:
+                ax_verts.plot(*zip(*pts), marker='o', label=f'{bm} {stage}')
+        n_verts = max(r['n_verts'] for r in rows if r['body_model'] == bm)
+        pts = sorted((r['batch_size'], r['median_ms'] / r['batch_size']) for r in rows
+                     if r['body_model'] == bm and r['stage'] == 'forward' and r['n_verts'] == n_verts)
+        ax_batch.plot(*zip(*pts), marker='o', label=f'{bm} V={n_verts}')
+    ax_verts.set(xlabel='vertices', ylabel='ms (batch 1)', xscale='log', yscale='log')
+    ax_batch.set(xlabel='batch size', ylabel='forward ms per frame', xscale='log', yscale='log')
+    ax_verts.legend(fontsize=7)
+    ax_batch.legend(fontsize=7)
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the stages of a body model update')
+    parser.add_argument('--body-models', nargs='+', default=['SMPL', 'SMPLX', 'MANO', 'FLAME'])
+    parser.add_argument('--n-verts', type=int, nargs='+', default=[1000, 5000, 10000, 50000],
+                        help='Vertex counts of the synthetic models')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--model-dir', default=None,
+                        help='Benchmark the real models in this directory instead of synthetic ones')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per stage')
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--window', action='store_true',
+                        help='Upload into a real window, which also measures label rebuilds')
+    parser.add_argument('--output', default=None, help='Write the results as json')
+    parser.add_argument('--plot', default=None, help='Save scaling curves to this image')
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.body_models, args.n_verts, args.batch_sizes, args.model_dir,
+                         args.window, args.repeat, args.threads)
+    print_table(rows)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'machine': get_machine_info(), 'results': rows}, f, indent=2)
+        logger.info(f'Wrote {args.output}')
+    if args.plot is not None:
+        plot_results(rows, args.plot)
+        logger.info(f'Saved scaling curves to {args.plot}')
@@ -0,0 +1,149 @@
+import torch
+import numpy as np
+import open3d as o3d
+from loguru import logger
+
+
+BODY_MODEL_DIR = 'data/body_models'
+
+# number of joints in every pose group, each joint being an axis-angle vector
+POSE_PARAM_SHAPES = {
+    'SMPL': {
+        'body_pose': 23,
+        'global_orient': 1,
+    },
+    'SMPLX': {
+        'body_pose': 21,
+        'global_orient': 1,
+        'left_hand_pose': 15,
+        'right_hand_pose': 15,
+        'jaw_pose': 1,
+        'leye_pose': 1,
+        'reye_pose': 1,
+    },
+    'MANO': {
+        'hand_pose': 15,
+        'global_orient': 1,
+    },
+    'FLAME': {
+        'global_orient': 1,
+        'jaw_pose': 1,
+        'neck_pose': 1,
+        'leye_pose': 1,
+        'reye_pose': 1,
+    },
+}
+
+
+def build_body_model(body_model, gender='neutral', model_dir=BODY_MODEL_DIR):
+    from smplx import SMPL, SMPLX, MANO, FLAME
+
+    extra_params = {'gender': gender}
+    if body_model in ('SMPLX', 'MANO', 'FLAME'):
+        extra_params['use_pca'] = False
+        extra_params['flat_hand_mean'] = True
+        extra_params['use_face_contour'] = True
+    model_cls = {'SMPL': SMPL, 'SMPLX': SMPLX, 'MANO': MANO, 'FLAME': FLAME}[body_model.upper()]
+    logger.info(f'Loading {body_model}-{gender}')
+    model = model_cls(f'{model_dir}/{body_model.lower()}', **extra_params)
+    wrap_extra_joint_ids(model)
+    return model
+
+
+def wrap_extra_joint_ids(model):
+    # smplx selects extra keypoints (feet, fingertips, face) by fixed vertex
+    # ids of the official meshes. Synthetic models (synthetic_models.py) can
+    # have fewer vertices, wrap the ids around so the forward pass works.
+    selector = getattr(model, 'vertex_joint_selector', None)
+    if selector is None or selector.extra_joints_idxs.numel() == 0:
+        return
+    n_verts = model.v_template.shape[0]
+    if selector.extra_joints_idxs.max().item() >= n_verts:
+        selector.extra_joints_idxs = selector.extra_joints_idxs % n_verts
+
+
+def get_model_key(body_model, gender):
+    return f'{body_model.lower()}-{gender.lower()}'
+
+
+@torch.no_grad()
+def forward_body_model(model, betas, expression, pose_params, ground=True):
+    # Runs a single forward pass and returns numpy vertices and joints. When
+    # ``ground`` is set the body is shifted along y so that it stands on y=0,
+    # the same way the GUI places it.
+    input_params = {k: v.reshape(1, -1) for k, v in pose_params.items()}
+    model_output = model(
+        betas=betas,
+        expression=expression,
+        **input_params,
+    )
+    verts = model_output.vertices[0].numpy()
+    joints = model_output.joints[0].numpy()
+
+    min_y = -verts[:, 1].min() if ground else 0.0
+    transl = np.array([0, min_y, 0])
+    return verts + transl, joints + transl, transl
+
+
+def get_default_pose_params(body_model, batch_size=1):
+    return {
+        k: torch.zeros(batch_size, n, 3)
+        for k, n in POSE_PARAM_SHAPES[body_model].items()
+    }
+
+
+@torch.no_grad()
+def forward_body_model_batch(model, betas, expression, pose_params, transl=None):
+    # Batched forward pass over B frames. smplx falls back to its batch-1
+    # defaults for any missing argument, so every input is expanded to B here.
+    batch_size = max(v.shape[0] for v in pose_params.values())
+    input_params = {
+        k: v.reshape(v.shape[0], -1).expand(batch_size, -1)
+        for k, v in pose_params.items()
+    }
+    if transl is not None:
+        input_params['transl'] = transl.reshape(-1, 3).expand(batch_size, -1)
+    model_output = model(
+        betas=betas.reshape(betas.shape[0], -1).expand(batch_size, -1),
+        expression=expression.reshape(expression.shape[0], -1).expand(batch_size, -1),
+        **input_params,
+    )
+    return model_output.vertices.numpy(), model_output.joints.numpy()
+
+
+def build_body_mesh(verts, faces, compute_normals=True):
+    mesh = o3d.geometry.TriangleMesh()
+    mesh.vertices = o3d.utility.Vector3dVector(verts)
+    mesh.triangles = o3d.utility.Vector3iVector(faces)
+    if compute_normals:
+        mesh.compute_vertex_normals()
+    mesh.paint_uniform_color([0.5, 0.5, 0.5])
+    return mesh
+
+
+def load_saved_params(path):
+    # Reads a file written by "File > Save Model Params", either a .bmvp file
+    # or a joblib pickle. Arrays come back as batch-1 float tensors.
+    from param_io import EXTENSION, load_params
+    if path.endswith(EXTENSION):
+        params = load_params(path, mmap=False)
+        for k, v in params.items():
+            if isinstance(v, np.ndarray) and k != 'joints':
+                params[k] = torch.from_numpy(v)[None]
+        return params
+
+    import joblib
+    params = joblib.load(path)
+    for k, v in params.items():
+        if isinstance(v, np.ndarray) and k != 'joints':
+            params[k] = torch.from_numpy(v).float()
+    return params
+
+
+def split_saved_params(params):
+    # Separates the pose groups from betas, expression and metadata
+    meta_keys = ('betas', 'expression', 'gender', 'body_model', 'joints')
+    pose_params = {k: v for k, v in params.items() if k not in meta_keys}
+    betas = params.get('betas', torch.zeros(1, 10))
+    expression = params.get('expression', torch.zeros(1, 10))
+    return betas, expression, pose_params
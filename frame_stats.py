@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+HUD_STAGES = ['forward', 'normals', 'upload', 'joints', 'labels']
+
+
+class FrameStats:
+    # Rolling per-update timings for the frame time HUD. Stages may nest,
+    # each one is charged only for the time not spent in inner stages, so
+    # e.g. 'joints' excludes the 'labels' rebuild it triggers.
+    def __init__(self, window=60):
+        self.frames = deque(maxlen=window)
+        self.frame_ends = deque(maxlen=window)
+        self.current = None
+        self.stack = []
+        self.queued = 0
+        self.lock = threading.Lock()
+
+    def begin(self):
+        self.current = {}
+
+    def end(self):
+        if self.current is None:
+            return
+        self.frames.append(self.current)
+        self.frame_ends.append(time.perf_counter())
+        self.current = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self.stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            if self.current is not None:
+                self.current[name] = self.current.get(name, 0.0) + elapsed - inner
+
+    def post(self):
+        with self.lock:
+            self.queued += 1
+
+    def done(self):
+        with self.lock:
+            self.queued -= 1
+
+    def get_fps(self):
+        if len(self.frame_ends) < 2:
+            return 0.0
+        span = self.frame_ends[-1] - self.frame_ends[0]
+        # only count recent activity, an idle viewer is not running at 0.1 fps
+        if span <= 0 or time.perf_counter() - self.frame_ends[-1] > 1.0:
+            return 0.0
+        return (len(self.frame_ends) - 1) / span
+
+    def get_means(self):
+        means = {}
+        for name in HUD_STAGES:
+            values = [f[name] for f in self.frames if name in f]
+            means[name] = 1000 * sum(values) / len(values) if values else 0.0
+        return means
+
+    def format(self):
+        means = self.get_means()
+        lines = [f'{name:8s} {means[name]:6.2f} ms' for name in HUD_STAGES]
+        lines.append(f'{"total":8s} {sum(means.values()):6.2f} ms')
+        lines.append(f'{self.get_fps():5.1f} fps, {self.queued} queued')
+        return '\n'.join(lines)
@@ -28,10 +28,15 @@
 import os
 import sys
 import copy
+import json
 import glob
+import time
+import atexit
+import signal
 import torch
 import joblib
 import platform
+import threading
 import argparse
 import numpy as np
 import open3d as o3d
@@ -43,6 +48,8 @@ import open3d.visualization.rendering as rendering
 
 from utils import (
     get_checkerboard_plane,
+    get_skeleton_bones,
+    get_skeleton_lineset,
     smpl_joint_names,
     smplx_body_joint_names,
     hand_joint_names,
@@ -55,185 +62,61 @@ from utils import (
     SMPLX_NAMES,
     MANO_NAMES,
 )
-from simple_ik import simple_ik_solver
+import param_io
+from settings import Settings
+from session import ViewerSession
+from frame_stats import FrameStats
+from memory_stats import (
+    AllocationMeter,
+    format_report,
+    get_geometry_bytes,
+    get_module_bytes,
+    get_rss_bytes,
+)
+from session_replay import (
+    EventRecorder,
+    instrument_recording,
+    load_events,
+    print_latency_report,
+    replay,
+)
+from thread_tuning import configure_threads
+from tracing import enable_tracing, instrument_class, traced
+from mesh_stream import MeshStreamServer
+from stream_control import AdaptiveStreamController, register_feedback_channel
+from sequence import SequencePrefetcher, PlaybackClock
+from motion_store import open_sequence
+from body_models import (
+    build_body_model,
+    build_body_mesh,
+    forward_body_model,
+    get_model_key,
+    load_saved_params,
+    split_saved_params,
+)
+from mesh_export import write_mesh
+from scan_loader import read_geometry, PointCloudLOD
+from scan_fitting import fit_body_to_scan
+from render_cache import (
+    RenderCache,
+    copy_cached,
+    get_render_key,
+    get_material_state,
+    get_lighting_state,
+)
+from simple_ik import simple_ik_solver, IncrementalIKSolver
 
 
 isMacOS = (platform.system() == "Darwin")
 
 
-class Settings:
-    UNLIT = "defaultUnlit"
-    LIT = "defaultLit"
-    NORMALS = "normals"
-    DEPTH = "depth"
-
-    DEFAULT_PROFILE_NAME = "Bright day with sun at +Y [default]"
-    POINT_CLOUD_PROFILE_NAME = "Cloudy day (no direct sun)"
-    CUSTOM_PROFILE_NAME = "Custom"
-    LIGHTING_PROFILES = {
-        DEFAULT_PROFILE_NAME: {
-            "ibl_intensity": 45000,
-            "sun_intensity": 45000,
-            "sun_dir": [0.577, -0.577, -0.577],
-            # "ibl_rotation":
-            "use_ibl": True,
-            "use_sun": True,
-        },
-        "Bright day with sun at -Y": {
-            "ibl_intensity": 45000,
-            "sun_intensity": 45000,
-            "sun_dir": [0.577, 0.577, 0.577],
-            # "ibl_rotation":
-            "use_ibl": True,
-            "use_sun": True,
-        },
-        "Bright day with sun at +Z": {
-            "ibl_intensity": 45000,
-            "sun_intensity": 45000,
-            "sun_dir": [0.577, 0.577, -0.577],
-            # "ibl_rotation":
-            "use_ibl": True,
-            "use_sun": True,
-        },
-        "Less Bright day with sun at +Y": {
-            "ibl_intensity": 35000,
-            "sun_intensity": 50000,
-            "sun_dir": [0.577, -0.577, -0.577],
-            # "ibl_rotation":
-            "use_ibl": True,
-            "use_sun": True,
-        },
-        "Less Bright day with sun at -Y": {
-            "ibl_intensity": 35000,
-            "sun_intensity": 50000,
-            "sun_dir": [0.577, 0.577, 0.577],
-            # "ibl_rotation":
-            "use_ibl": True,
-            "use_sun": True,
-        },
-        "Less Bright day with sun at +Z": {
-            "ibl_intensity": 35000,
-            "sun_intensity": 50000,
-            "sun_dir": [0.577, 0.577, -0.577],
-            # "ibl_rotation":
-            "use_ibl": True,
-            "use_sun": True,
-        },
-        POINT_CLOUD_PROFILE_NAME: {
-            "ibl_intensity": 60000,
-            "sun_intensity": 50000,
-            "use_ibl": True,
-            "use_sun": False,
-            # "ibl_rotation":
-        },
-    }
-
-    DEFAULT_MATERIAL_NAME = "Polished ceramic [default]"
-    PREFAB = {
-        DEFAULT_MATERIAL_NAME: {
-            "metallic": 0.0,
-            "roughness": 0.7,
-            "reflectance": 0.5,
-            "clearcoat": 0.2,
-            "clearcoat_roughness": 0.2,
-            "anisotropy": 0.0
-        },
-        "Metal (rougher)": {
-            "metallic": 1.0,
-            "roughness": 0.5,
-            "reflectance": 0.9,
-            "clearcoat": 0.0,
-            "clearcoat_roughness": 0.0,
-            "anisotropy": 0.0
-        },
-        "Metal (smoother)": {
-            "metallic": 1.0,
-            "roughness": 0.3,
-            "reflectance": 0.9,
-            "clearcoat": 0.0,
-            "clearcoat_roughness": 0.0,
-            "anisotropy": 0.0
-        },
-        "Plastic": {
-            "metallic": 0.0,
-            "roughness": 0.5,
-            "reflectance": 0.5,
-            "clearcoat": 0.5,
-            "clearcoat_roughness": 0.2,
-            "anisotropy": 0.0
-        },
-        "Glazed ceramic": {
-            "metallic": 0.0,
-            "roughness": 0.5,
-            "reflectance": 0.9,
-            "clearcoat": 1.0,
-            "clearcoat_roughness": 0.1,
-            "anisotropy": 0.0
-        },
-        "Clay": {
-            "metallic": 0.0,
-            "roughness": 1.0,
-            "reflectance": 0.5,
-            "clearcoat": 0.1,
-            "clearcoat_roughness": 0.287,
-            "anisotropy": 0.0
-        },
-    }
-
-    def __init__(self):
-        self.mouse_model = gui.SceneWidget.Controls.ROTATE_CAMERA
-        self.bg_color = gui.Color(1, 1, 1)
-        self.show_skybox = False
-        self.show_axes = True
-        self.show_ground = True
-        self.use_ibl = True
-        self.use_sun = True
-        self.new_ibl_name = None  # clear to None after loading
-        self.ibl_intensity = 45000
-        self.sun_intensity = 45000
-        self.sun_dir = [0.577, -0.577, -0.577]
-        self.sun_color = gui.Color(1, 1, 1)
-
-        self.apply_material = True  # clear to False after processing
-        self._materials = {
-            Settings.LIT: rendering.MaterialRecord(),
-            Settings.UNLIT: rendering.MaterialRecord(),
-            Settings.NORMALS: rendering.MaterialRecord(),
-            Settings.DEPTH: rendering.MaterialRecord()
-        }
-        self._materials[Settings.LIT].base_color = [0.9, 0.9, 0.9, 1.0]
-        self._materials[Settings.LIT].shader = Settings.LIT
-        self._materials[Settings.UNLIT].base_color = [0.9, 0.9, 0.9, 1.0]
-        self._materials[Settings.UNLIT].shader = Settings.UNLIT
-        self._materials[Settings.NORMALS].shader = Settings.NORMALS
-        self._materials[Settings.DEPTH].shader = Settings.DEPTH
-
-        # Conveniently, assigning from self._materials[...] assigns a reference,
-        # not a copy, so if we change the property of a material, then switch
-        # to another one, then come back, the old setting will still be there.
-        self.material = self._materials[Settings.LIT]
-
-    def set_material(self, name):
-        self.material = self._materials[name]
-        self.apply_material = True
-
-    def apply_material_prefab(self, name):
-        assert (self.material.shader == Settings.LIT)
-        prefab = Settings.PREFAB[name]
-        for key, val in prefab.items():
-            setattr(self.material, "base_" + key, val)
-
-    def apply_lighting_profile(self, name):
-        profile = Settings.LIGHTING_PROFILES[name]
-        for key, val in profile.items():
-            setattr(self, key, val)
-
-
 class AppWindow:
     MENU_OPEN = 1
     MENU_EXPORT = 2
     MENU_QUIT = 3
     MENU_SAVE = 4
+    MENU_LOAD = 5
+    MENU_EXPORT_MESH = 6
     MENU_SHOW_SETTINGS = 11
     MENU_ABOUT = 21
 
@@ -257,36 +140,8 @@ class AppWindow:
         'MANO': 10,
         'FLAME': 10,
     }
-    CAM_FIRST = True
-
     PRELOADED_BODY_MODELS = {}
-
-    POSE_PARAMS = {
-        'SMPL': {
-            'body_pose': torch.zeros(1, 23, 3),
-            'global_orient': torch.zeros(1, 1, 3),
-        },
-        'SMPLX': {
-            'body_pose': torch.zeros(1, 21, 3),
-            'global_orient': torch.zeros(1, 1, 3),
-            'left_hand_pose': torch.zeros(1, 15, 3),
-            'right_hand_pose': torch.zeros(1, 15, 3),
-            'jaw_pose': torch.zeros(1, 1, 3),
-            'leye_pose': torch.zeros(1, 1, 3),
-            'reye_pose': torch.zeros(1, 1, 3),
-        },
-        'MANO': {
-            'hand_pose': torch.zeros(1, 15, 3),
-            'global_orient': torch.zeros(1, 1, 3),
-        },
-        'FLAME': {
-            'global_orient': torch.zeros(1, 1, 3),
-            'jaw_pose': torch.zeros(1, 1, 3),
-            'neck_pose': torch.zeros(1, 1, 3),
-            'leye_pose': torch.zeros(1, 1, 3),
-            'reye_pose': torch.zeros(1, 1, 3),
-        },
-    }
+    SKELETON_BONES = {}
 
     JOINT_NAMES = {
         'SMPL': {
@@ -322,12 +177,22 @@ class AppWindow:
         'FLAME': FLAME_KEYPOINT_NAMES,
     }
 
-    JOINTS = None
-    SELECTED_JOINT = None
-    BODY_TRANSL = None
+    SEQ_BUFFER_FRAMES = 256
+
+    DRAG_IK_MAX_ITER = 5
+    DRAG_IK_TIME_BUDGET = 0.015  # seconds spent in IK per mouse-move event
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, render_cache=None, adaptive_stream=False, mesh_stream=None):
+        self.session = ViewerSession()
+        self.frame_stats = FrameStats()
+        self._alloc_meter = AllocationMeter()
+        self._geometry_bytes = {}
         self.settings = Settings()
+        self.render_cache = render_cache
+        self.mesh_stream = mesh_stream
+        # under --web the stream resolution and update rate follow render cost
+        self._stream = AdaptiveStreamController() if adaptive_stream else None
+        self._pending_body_update = None
         resource_path = gui.Application.instance.resource_path
         self.settings.new_ibl_name = resource_path + "/" + AppWindow.DEFAULT_IBL
 
@@ -445,6 +310,13 @@ class AppWindow:
         view_ctrls.add_fixed(separation_height)
         view_ctrls.add_child(gui.Label("Lighting profiles"))
         view_ctrls.add_child(self._profiles)
+
+        self._lod_level = gui.Combobox()
+        self._lod_level.enabled = False
+        self._lod_level.set_on_selection_changed(self._on_lod_level)
+        view_ctrls.add_fixed(separation_height)
+        view_ctrls.add_child(gui.Label("Point cloud detail"))
+        view_ctrls.add_child(self._lod_level)
         self._settings_panel.add_fixed(separation_height)
         self._settings_panel.add_child(view_ctrls)
 
@@ -583,7 +455,7 @@ class AppWindow:
 
         # ------- BODY MODEL POSE SETTINGS ------- #
         self._body_pose_comp = gui.Combobox()
-        for k in AppWindow.POSE_PARAMS[AppWindow.BODY_MODEL_NAMES[0]].keys():
+        for k in self.session.pose_params[AppWindow.BODY_MODEL_NAMES[0]].keys():
             self._body_pose_comp.add_item(k)
 
         self._body_pose_joint = gui.Combobox()
@@ -597,6 +469,7 @@ class AppWindow:
 
         self._body_pose_reset = gui.Button("Reset pose")
         self._body_pose_ik = gui.Button("Run IK")
+        self._body_fit_scan = gui.Button("Fit to scan")
 
         self._show_joints = gui.Checkbox("Show joints")
         self._show_joints.set_on_checked(self._on_show_joints)
@@ -604,8 +477,13 @@ class AppWindow:
         self._show_joint_labels = gui.Checkbox("Show joint labels")
         self._show_joint_labels.set_on_checked(self._on_show_joint_labels)
 
+        self._show_skeleton = gui.Checkbox("Show skeleton")
+        self._show_skeleton.set_on_checked(self._on_show_skeleton)
+        self._show_hud = gui.Checkbox("Show frame times")
+        self._show_hud.set_on_checked(self._on_show_hud)
+
         self._on_body_model(AppWindow.BODY_MODEL_NAMES[0], 0)
-        # self._on_body_pose_comp(list(AppWindow.POSE_PARAMS[AppWindow.BODY_MODEL_NAMES[0]].keys())[0], 0)
+        # self._on_body_pose_comp(list(self.session.pose_params[AppWindow.BODY_MODEL_NAMES[0]].keys())[0], 0)
         self._body_model.set_on_selection_changed(self._on_body_model)
         self._body_model_gender.set_on_selection_changed(self._on_body_model_gender)
 
@@ -625,6 +503,7 @@ class AppWindow:
         self._body_pose_reset.set_on_clicked(self._on_body_pose_reset)
 
         self._body_pose_ik.set_on_clicked(self._on_run_ik)
+        self._body_fit_scan.set_on_clicked(self._on_fit_scan)
 
         self._scene.set_on_mouse(self._on_mouse_widget)
         self._scene.set_on_key(self._on_key_widget)
@@ -664,6 +543,11 @@ class AppWindow:
         h.add_child(self._show_joint_labels)
         self.model_settings.add_child(h)
 
+        h = gui.Horiz(0.25 * em)
+        h.add_child(self._show_skeleton)
+        h.add_child(self._show_hud)
+        self.model_settings.add_child(h)
+
         h = gui.Horiz(0.25 * em)  # row 3
         h.add_child(gui.Label("Pose Controls"))
         self.model_settings.add_child(h)
@@ -692,18 +576,86 @@ class AppWindow:
 
         h = gui.Horiz(0.25 * em)  # row 2
         h.add_child(self._body_pose_ik)
+        h.add_child(self._body_fit_scan)
         # h.add_child(gui.VectorEdit())
         self.model_settings.add_child(h)
 
         self._settings_panel.add_fixed(separation_height)
         self._settings_panel.add_child(self.model_settings)
 
+        # ------- SAVED PARAMS BROWSER ------- #
+        saved_params = gui.CollapsableVert("Saved params", 0,
+                                           gui.Margins(em, 0, 0, 0))
+        saved_params.set_is_open(False)
+        self._params_browse = gui.Button("Browse folder")
+        self._params_browse.set_on_clicked(self._on_params_browse)
+        self._params_list = gui.ListView()
+        self._params_list.set_max_visible_items(10)
+        self._params_list.set_on_selection_changed(self._on_params_list)
+        self._params_files = []
+
+        h = gui.Horiz(0.25 * em)
+        h.add_child(self._params_browse)
+        saved_params.add_child(h)
+        saved_params.add_child(self._params_list)
+
+        self._settings_panel.add_fixed(separation_height)
+        self._settings_panel.add_child(saved_params)
+
+        # ------- SEQUENCE PLAYBACK ------- #
+        playback = gui.CollapsableVert("Sequence playback", 0,
+                                       gui.Margins(em, 0, 0, 0))
+        playback.set_is_open(False)
+        self._seq_load = gui.Button("Load sequence")
+        self._seq_load.set_on_clicked(self._on_seq_load)
+        self._seq_play = gui.Button("Play")
+        self._seq_play.set_on_clicked(self._on_seq_play)
+        self._seq_scrubber = gui.Slider(gui.Slider.INT)
+        self._seq_scrubber.set_limits(0, 1)
+        self._seq_scrubber.set_on_value_changed(self._on_seq_scrub)
+        self._seq_info = gui.Label("No sequence loaded")
+
+        self._prefetcher = None
+        self._seq_clock = None
+        self._seq_frame_pending = False
+
+        h = gui.Horiz(0.25 * em)
+        h.add_child(self._seq_load)
+        h.add_child(self._seq_play)
+        playback.add_child(h)
+        grid = gui.VGrid(2, 0.25 * em)
+        grid.add_child(gui.Label("Frame"))
+        grid.add_child(self._seq_scrubber)
+        playback.add_child(grid)
+        playback.add_child(self._seq_info)
+
+        self._settings_panel.add_fixed(separation_height)
+        self._settings_panel.add_child(playback)
+
+        memory = gui.CollapsableVert("Memory", 0.25 * em, gui.Margins(em, 0, 0, 0))
+        memory.set_is_open(False)
+        self._memory_info = gui.Label("")
+        memory_refresh = gui.Button("Refresh")
+        memory_refresh.set_on_clicked(self._on_memory_refresh)
+        memory.add_child(memory_refresh)
+        memory.add_child(self._memory_info)
+        self._settings_panel.add_fixed(separation_height)
+        self._settings_panel.add_child(memory)
+
         # Info panel
         self.info = gui.Label("")
         self.info.visible = False
+        self._hud = gui.Label("")
+        self._hud.visible = False
+        self._progress = gui.ProgressBar()
+        self._progress.visible = False
+        self.loaded_geometry = None
 
         self.joint_label_3d = gui.Label3D("", [0,0,0])
         self.joint_labels_3d_list = []
+
+        self._drag = None
+        self._drag_pressed = False
         # self.joint_label_3d.visible = False
         # ----
 
@@ -715,9 +667,13 @@ class AppWindow:
         # (position + size) of every child correctly. After the callback is
         # done the window will layout the grandchildren.
         w.set_on_layout(self._on_layout)
+        if self._stream is not None:
+            w.set_on_tick_event(self._on_stream_tick)
         w.add_child(self._scene)
         w.add_child(self._settings_panel)
         w.add_child(self.info)
+        w.add_child(self._hud)
+        w.add_child(self._progress)
         # w.add_child(self.joint_label_3d)
 
         # ---- Menu ----
@@ -732,7 +688,9 @@ class AppWindow:
             file_menu = gui.Menu()
             file_menu.add_item("Open", AppWindow.MENU_OPEN)
             file_menu.add_item("Export Current Image", AppWindow.MENU_EXPORT)
+            file_menu.add_item("Export Body Mesh", AppWindow.MENU_EXPORT_MESH)
             file_menu.add_item("Save Model Params", AppWindow.MENU_SAVE)
+            file_menu.add_item("Load Model Params", AppWindow.MENU_LOAD)
             if not isMacOS:
                 file_menu.add_separator()
                 file_menu.add_item("Quit", AppWindow.MENU_QUIT)
@@ -766,8 +724,12 @@ class AppWindow:
         w.set_on_menu_item_activated(AppWindow.MENU_OPEN, self._on_menu_open)
         w.set_on_menu_item_activated(AppWindow.MENU_EXPORT,
                                      self._on_menu_export)
+        w.set_on_menu_item_activated(AppWindow.MENU_EXPORT_MESH,
+                                     self._on_menu_export_mesh)
         w.set_on_menu_item_activated(AppWindow.MENU_SAVE,
                                      self._on_save_dialog)
+        w.set_on_menu_item_activated(AppWindow.MENU_LOAD,
+                                     self._on_load_params_dialog)
         w.set_on_menu_item_activated(AppWindow.MENU_QUIT, self._on_menu_quit)
         w.set_on_menu_item_activated(AppWindow.MENU_SHOW_SETTINGS,
                                      self._on_menu_toggle_settings_panel)
@@ -843,6 +805,13 @@ class AppWindow:
         self.info.frame = gui.Rect(r.x,
                                    r.get_bottom() - pref.height, pref.width,
                                    pref.height)
+        progress_width = 15 * layout_context.theme.font_size
+        self._progress.frame = gui.Rect(r.x, r.get_bottom() - 2 * pref.height,
+                                        progress_width, pref.height)
+        if self._hud.visible:
+            hud = self._hud.calc_preferred_size(layout_context, gui.Widget.Constraints())
+            self._hud.frame = gui.Rect(r.x + pref.width + layout_context.theme.font_size,
+                                       r.get_bottom() - hud.height, hud.width, hud.height)
 
     def _set_mouse_mode_rotate(self):
         self._scene.set_view_controls(gui.SceneWidget.Controls.ROTATE_CAMERA)
@@ -884,12 +853,14 @@ class AppWindow:
         if hasattr(self, "joint_labels_3d_list"):
             for label3d in self.joint_labels_3d_list:
                 self._scene.remove_3d_label(label3d)
+            # removed labels used to stay in the list, which grew on every update
+            self.joint_labels_3d_list = []
         if show:
             joint_names = AppWindow.KEYPOINT_NAMES[self._body_model.selected_text]
             try:
                 for i in range(len(joint_names)):
                     self.joint_labels_3d_list.append(
-                        self._scene.add_3d_label(AppWindow.JOINTS[i], joint_names[i])
+                        self._scene.add_3d_label(self.session.joints[i], joint_names[i])
                     )
             except Exception as e:
                 print(e)
@@ -898,11 +869,12 @@ class AppWindow:
             if hasattr(self, "joint_labels_3d_list"):
                 for label3d in self.joint_labels_3d_list:
                     self._scene.remove_3d_label(label3d)
+                self.joint_labels_3d_list = []
 
     def _on_show_joints(self, show):
         for i in range(150):
             if self._scene.scene.has_geometry(f"__joints_{i}__"):
-                self._scene.scene.remove_geometry(f"__joints_{i}__")
+                self._remove_geometry(f"__joints_{i}__")
 
         green = [0.3, 0.7, 0.3, 1.0]
         red = [0.7, 0.3, 0.3, 1.0]
@@ -920,7 +892,7 @@ class AppWindow:
         mat_selected.base_color = green
         mat_selected.shader = "defaultLit"
 
-        joints = AppWindow.JOINTS
+        joints = self.session.joints
         if show:
             # logger.info('drawing joints')
             for i in range(joints.shape[0]):
@@ -934,26 +906,45 @@ class AppWindow:
 
                 sg = o3d.geometry.TriangleMesh.create_sphere(radius=radius)
                 sg.compute_vertex_normals()
-                # if i == AppWindow.SELECTED_JOINT:
+                # if i == self.session.selected_joint:
                 #     sg.paint_uniform_color(green)
                 # else:
                 #     sg.paint_uniform_color(red)
                 sg.translate(joints[i])
-                if (AppWindow.SELECTED_JOINT is not None) and (i == AppWindow.SELECTED_JOINT):
-                    self._scene.scene.add_geometry(f"__joints_{i}__", sg, mat_selected)
+                if (self.session.selected_joint is not None) and (i == self.session.selected_joint):
+                    self._add_geometry(f"__joints_{i}__", sg, mat_selected)
                 else:
-                    self._scene.scene.add_geometry(f"__joints_{i}__", sg, mat)
+                    self._add_geometry(f"__joints_{i}__", sg, mat)
 
-            # logger.debug(AppWindow.JOINTS[20])
+            # logger.debug(self.session.joints[20])
         else:
             # import ipdb; ipdb.set_trace()
             for i in range(150):
                 if self._scene.scene.has_geometry(f"__joints_{i}__"):
-                    self._scene.scene.remove_geometry(f"__joints_{i}__")
+                    self._remove_geometry(f"__joints_{i}__")
 
-        self._on_show_joint_labels(self._show_joint_labels.checked)
+        with self.frame_stats.stage('labels'):
+            self._on_show_joint_labels(self._show_joint_labels.checked)
+        self._on_show_skeleton(self._show_skeleton.checked)
         # import ipdb; ipdb.set_trace()
 
+    def _on_show_skeleton(self, show):
+        if self._scene.scene.has_geometry("__skeleton__"):
+            self._remove_geometry("__skeleton__")
+        if not show or self.session.joints is None:
+            return
+
+        bm = self._body_model.selected_text
+        gender = self._body_model_gender.selected_text
+        bones = AppWindow.SKELETON_BONES[f'{bm.lower()}-{gender.lower()}']
+
+        mat = rendering.MaterialRecord()
+        mat.shader = "unlitLine"
+        mat.line_width = 3
+
+        line_set = get_skeleton_lineset(self.session.joints, bones)
+        self._add_geometry("__skeleton__", line_set, mat)
+
     def _on_use_ibl(self, use):
         self.settings.use_ibl = use
         self._profiles.selected_text = Settings.CUSTOM_PROFILE_NAME
@@ -1000,26 +991,29 @@ class AppWindow:
     def _on_body_model(self, name, index):
         logger.info(f"Loading body model {name}-{index}")
         self._body_beta_val.double_value = 0.0
-        AppWindow.CAM_FIRST = True
+        self.session.cam_first = True
         self.load_body_model(name)
+        self._refresh_body_model_items(name)
+
+        self._reset_rot_sliders()
+        self.session.selected_joint = None
+        self._on_show_joints(self._show_joints.checked)
+
+    def _refresh_body_model_items(self, name):
         self._body_model_gender.clear_items()
 
         for gender in AppWindow.BODY_MODEL_GENDERS[name]:
             self._body_model_gender.add_item(gender)
 
         self._body_pose_comp.clear_items()
-        for k in AppWindow.POSE_PARAMS[name].keys():
+        for k in self.session.pose_params[name].keys():
             self._body_pose_comp.add_item(k)
 
         self._body_pose_joint.clear_items()
         joint_names = AppWindow.JOINT_NAMES[name][self._body_pose_comp.selected_text]
-        for i in range(AppWindow.POSE_PARAMS[name][self._body_pose_comp.selected_text].shape[1]):
+        for i in range(self.session.pose_params[name][self._body_pose_comp.selected_text].shape[1]):
             self._body_pose_joint.add_item(f'{i}-{joint_names[i]}')
 
-        self._reset_rot_sliders()
-        AppWindow.SELECTED_JOINT = None
-        self._on_show_joints(self._show_joints.checked)
-
     def _on_body_model_gender(self, name, index):
         logger.info(f"Changing {self._body_model.selected_text} body model gender to {name}-{index}")
         self._body_beta_val.double_value = 0.0
@@ -1031,21 +1025,25 @@ class AppWindow:
     def _on_body_beta_val(self, val):
         self._body_beta_tensor[0, int(self._body_model_shape_comp.selected_text)-1] = float(val)
         self._body_beta_text.text = f",".join(f'{x:.1f}' for x in self._body_beta_tensor[0].numpy().tolist())
-        self.load_body_model(
-            self._body_model.selected_text,
-            gender=self._body_model_gender.selected_text,
-        )
+        self._load_body_model_from_slider()
         # self._on_show_joints(self._show_joints.checked)
 
     def _on_body_exp_val(self, val):
         self._body_exp_tensor[0, int(self._body_model_exp_comp.selected_text)-1] = float(val)
         self._body_exp_text.text = f",".join(f'{x:.1f}' for x in self._body_exp_tensor[0].numpy().tolist())
-        self.load_body_model(
-            self._body_model.selected_text,
-            gender=self._body_model_gender.selected_text,
-        )
+        self._load_body_model_from_slider()
         # self._on_show_joints(self._show_joints.checked)
 
+    def _load_body_model_from_slider(self):
+        # when streaming, slider updates faster than the target fps are
+        # coalesced and applied from _on_stream_tick
+        body_model, gender = self._body_model.selected_text, self._body_model_gender.selected_text
+        if self._stream is not None and not self._stream.should_push():
+            self._pending_body_update = (body_model, gender)
+            self._stream.mark_changed()
+            return
+        self.load_body_model(body_model, gender=gender)
+
     def _on_body_pose_joint(self, name, index):
         self._reset_rot_sliders()
 
@@ -1055,12 +1053,9 @@ class AppWindow:
         ji = int(self._body_pose_joint.selected_text.split('-')[0])
         euler_angle = [val, self._body_pose_joint_y.int_value, self._body_pose_joint_z.int_value]
         axis_angle = R.Rotation.from_euler('xyz', euler_angle, degrees=True).as_rotvec()
-        AppWindow.POSE_PARAMS[bm][bp][0, ji] = torch.from_numpy(axis_angle)
+        self.session.pose_params[bm][bp][0, ji] = torch.from_numpy(axis_angle)
 
-        self.load_body_model(
-            self._body_model.selected_text,
-            gender=self._body_model_gender.selected_text,
-        )
+        self._load_body_model_from_slider()
         # self._on_show_joints(self._show_joints.checked)
 
     def _on_body_pose_joint_y(self, val):
@@ -1069,12 +1064,9 @@ class AppWindow:
         ji = int(self._body_pose_joint.selected_text.split('-')[0])
         euler_angle = [self._body_pose_joint_x.int_value, val, self._body_pose_joint_z.int_value]
         axis_angle = R.Rotation.from_euler('xyz', euler_angle, degrees=True).as_rotvec()
-        AppWindow.POSE_PARAMS[bm][bp][0, ji] = torch.from_numpy(axis_angle)
+        self.session.pose_params[bm][bp][0, ji] = torch.from_numpy(axis_angle)
 
-        self.load_body_model(
-            self._body_model.selected_text,
-            gender=self._body_model_gender.selected_text,
-        )
+        self._load_body_model_from_slider()
         # self._on_show_joints(self._show_joints.checked)
 
     def _on_body_pose_joint_z(self, val):
@@ -1083,12 +1075,9 @@ class AppWindow:
         ji = int(self._body_pose_joint.selected_text.split('-')[0])
         euler_angle = [self._body_pose_joint_x.int_value, self._body_pose_joint_y.int_value, val]
         axis_angle = R.Rotation.from_euler('xyz', euler_angle, degrees=True).as_rotvec()
-        AppWindow.POSE_PARAMS[bm][bp][0, ji] = torch.from_numpy(axis_angle)
+        self.session.pose_params[bm][bp][0, ji] = torch.from_numpy(axis_angle)
 
-        self.load_body_model(
-            self._body_model.selected_text,
-            gender=self._body_model_gender.selected_text,
-        )
+        self._load_body_model_from_slider()
         # self._on_show_joints(self._show_joints.checked)
 
     def _on_body_model_shape_comp(self, name, index):
@@ -1100,7 +1089,7 @@ class AppWindow:
     def _on_body_pose_comp(self, name, index):
         self._body_pose_joint.clear_items()
         joint_names = AppWindow.JOINT_NAMES[self._body_model.selected_text][name]
-        for i in range(AppWindow.POSE_PARAMS[self._body_model.selected_text][name].shape[1]):
+        for i in range(self.session.pose_params[self._body_model.selected_text][name].shape[1]):
             self._body_pose_joint.add_item(f'{i}-{joint_names[i]}')
         self._reset_rot_sliders()
 
@@ -1125,7 +1114,7 @@ class AppWindow:
     def _on_body_pose_reset(self):
         bm = self._body_model.selected_text
         bp = self._body_pose_comp.selected_text
-        AppWindow.POSE_PARAMS[bm][bp] = torch.zeros_like(AppWindow.POSE_PARAMS[bm][bp])
+        self.session.pose_params[bm][bp] = torch.zeros_like(self.session.pose_params[bm][bp])
         self._reset_rot_sliders()
         self.load_body_model(
             self._body_model.selected_text,
@@ -1137,7 +1126,7 @@ class AppWindow:
         step = 0.01
         # logger.debug(f"key {key} is pressed")
         if (self._show_joints.checked) and \
-                (AppWindow.SELECTED_JOINT is not None) and \
+                (self.session.selected_joint is not None) and \
                 (key in ('ONE', 'TWO', 'THREE', 'FOUR', 'FIVE', 'SIX')):
             if key == 'ONE':
                 transl = np.array([-step, 0.0, 0.0])
@@ -1152,7 +1141,7 @@ class AppWindow:
             elif key == 'SIX':
                 transl = np.array([0.0, 0.0, step])
 
-            AppWindow.JOINTS[AppWindow.SELECTED_JOINT] = AppWindow.JOINTS[AppWindow.SELECTED_JOINT] + transl
+            self.session.joints[self.session.selected_joint] = self.session.joints[self.session.selected_joint] + transl
             self._on_show_joints(show=True)
             return gui.Widget.EventCallbackResult.HANDLED
         return gui.Widget.EventCallbackResult.IGNORED
@@ -1167,19 +1156,30 @@ class AppWindow:
         #         event.x, (self._scene.frame.height - event.y), 0.1, self._scene.frame.width,
         #         self._scene.frame.height)
         #     # logger.debug(mouse_pos)
-        #     label_idx = np.argmin(((AppWindow.JOINTS - mouse_pos) ** 2).sum(1))
+        #     label_idx = np.argmin(((self.session.joints - mouse_pos) ** 2).sum(1))
         #     label_text = AppWindow.KEYPOINT_NAMES[self._body_model.selected_text][label_idx]
-        #     label_pos = AppWindow.JOINTS[label_idx]
+        #     label_pos = self.session.joints[label_idx]
         #     self.joint_label_3d.text = label_text
         #     self.joint_label_3d.position = label_pos
         #     logger.debug(label_text, label_pos)
             # self._scene.add_3d_label(label_pos, label_text)
 
+        if event.type == gui.MouseEvent.Type.BUTTON_UP:
+            self._drag_pressed = False
+        if self._drag is not None:
+            if event.type == gui.MouseEvent.Type.DRAG:
+                self._on_joint_drag(event.x, event.y)
+                return gui.Widget.EventCallbackResult.HANDLED
+            if event.type == gui.MouseEvent.Type.BUTTON_UP:
+                self._end_joint_drag()
+                return gui.Widget.EventCallbackResult.HANDLED
+
         if event.type == gui.MouseEvent.Type.BUTTON_DOWN and event.is_modifier_down(
                 gui.KeyModifier.CTRL) and self._show_joints.checked:
             # x = event.x - self._scene.frame.x
             # y = event.y - self._scene.frame.y
             # logger.debug(f'Clicked point x: {x}, y: {y}')
+            self._drag_pressed = True
 
             def depth_callback(depth_image):
                 # Coordinates are expressed in absolute coordinates of the
@@ -1214,20 +1214,21 @@ class AppWindow:
                     # logger.debug(f'Clicked {text}')
 
                     # find the closest joint to the clicked pos
-                    dist = ((AppWindow.JOINTS - np.array([world[0], world[1], world[2]]))**2).sum(1)
-                    AppWindow.SELECTED_JOINT = np.argmin(dist)
-                    # logger.debug(AppWindow.SELECTED_JOINT)
+                    dist = ((self.session.joints - np.array([world[0], world[1], world[2]]))**2).sum(1)
+                    self.session.selected_joint = np.argmin(dist)
+                    # logger.debug(self.session.selected_joint)
                     # import ipdb; ipdb.set_trace()
-                    jn = AppWindow.KEYPOINT_NAMES[self._body_model.selected_text][AppWindow.SELECTED_JOINT]
+                    jn = AppWindow.KEYPOINT_NAMES[self._body_model.selected_text][self.session.selected_joint]
                     self._update_label(f'{self._body_model.selected_text} joint "{jn}" selected')
                     self._scene.remove_3d_label(self.joint_label_3d)
                     self.joint_label_3d = self._scene.add_3d_label(
-                        AppWindow.JOINTS[AppWindow.SELECTED_JOINT],
-                        AppWindow.KEYPOINT_NAMES[self._body_model.selected_text][AppWindow.SELECTED_JOINT]
+                        self.session.joints[self.session.selected_joint],
+                        AppWindow.KEYPOINT_NAMES[self._body_model.selected_text][self.session.selected_joint]
                     )
                     # self.joint_label_3d.text = jn
-                    # self.joint_label_3d.position = AppWindow.JOINTS[AppWindow.SELECTED_JOINT]
+                    # self.joint_label_3d.position = self.session.joints[self.session.selected_joint]
                     self._on_show_joints(show=True)
+                    self._start_joint_drag()
 
                 # This is not called on the main thread, so we need to
                 # post to the main thread to safely access UI items.
@@ -1246,6 +1247,87 @@ class AppWindow:
             return gui.Widget.EventCallbackResult.HANDLED
         return gui.Widget.EventCallbackResult.IGNORED
 
+    def _mouse_ray(self, x, y):
+        # Returns the camera center and the unit view ray through pixel (x, y)
+        camera = self._scene.scene.camera
+        frame = self._scene.frame
+        origin = camera.get_model_matrix()[:3, 3]
+        far = camera.unproject(x, (frame.height - y), 0.5, frame.width, frame.height)
+        direction = np.asarray(far) - origin
+        return origin, direction / np.linalg.norm(direction)
+
+    def _start_joint_drag(self):
+        # The selected joint is dragged on the plane facing the camera that
+        # passes through its current position.
+        if not self._drag_pressed:
+            return
+        bm = self._body_model.selected_text
+        joint_idx = int(self.session.selected_joint)
+        view_dir = -self._scene.scene.camera.get_model_matrix()[:3, 2]
+        self._drag = {
+            'joint': joint_idx,
+            'point': self.session.joints[joint_idx].copy(),
+            'normal': view_dir / np.linalg.norm(view_dir),
+            'target': self.session.joints[:22].copy(),
+            'solver': None,
+        }
+        if bm in ('SMPL', 'SMPLX') and joint_idx < 22:
+            gender = self._body_model_gender.selected_text
+            model_kwargs = {
+                'betas': self._body_beta_tensor,
+                'transl': self.session.body_transl,
+                'global_orient': self.session.pose_params[bm]['global_orient'].reshape(1, -1),
+            }
+            if bm == 'SMPLX':
+                model_kwargs['expression'] = self._body_exp_tensor
+            self._drag['solver'] = IncrementalIKSolver(
+                model=AppWindow.PRELOADED_BODY_MODELS[f'{bm.lower()}-{gender.lower()}'],
+                init=self.session.pose_params[bm]['body_pose'],
+                **model_kwargs,
+            )
+
+    def _on_joint_drag(self, x, y):
+        origin, direction = self._mouse_ray(x, y)
+        normal = self._drag['normal']
+        denom = np.dot(direction, normal)
+        if abs(denom) < 1e-6:
+            return
+        t = np.dot(self._drag['point'] - origin, normal) / denom
+        new_pos = origin + t * direction
+
+        joint_idx = self._drag['joint']
+        solver = self._drag['solver']
+        if solver is None:
+            self.session.joints[joint_idx] = new_pos
+            self._on_show_joints(show=True)
+            return
+
+        bm = self._body_model.selected_text
+        self._drag['target'][joint_idx] = new_pos
+        target = torch.from_numpy(self._drag['target']).float()
+        pose = solver.step(
+            target,
+            max_iter=AppWindow.DRAG_IK_MAX_ITER,
+            time_budget=AppWindow.DRAG_IK_TIME_BUDGET,
+        )
+        self.session.pose_params[bm]['body_pose'] = pose.reshape(1, -1, 3)
+        self.load_body_model(
+            self._body_model.selected_text,
+            gender=self._body_model_gender.selected_text,
+            keep_transl=True,
+        )
+        self.session.joints[joint_idx] = new_pos
+
+    def _end_joint_drag(self):
+        solver = self._drag['solver']
+        self._drag = None
+        if solver is not None:
+            logger.info(f'Drag IK final loss {solver.last_loss or 0.0:.5f}')
+            self.load_body_model(
+                self._body_model.selected_text,
+                gender=self._body_model_gender.selected_text,
+            )
+
     def _update_label(self, text):
         self.info.text = text
         self.info.visible = (text != "")
@@ -1263,25 +1345,88 @@ class AppWindow:
             return 0
 
         gender = self._body_model_gender.selected_text
-        init_pose = copy.deepcopy(AppWindow.POSE_PARAMS[bm][bp])
+        init_pose = copy.deepcopy(self.session.pose_params[bm][bp])
 
-        target_keypoints = AppWindow.JOINTS[:22][None]
+        target_keypoints = self.session.joints[:22][None]
         target_keypoints = torch.from_numpy(target_keypoints).float()
         opt_params = simple_ik_solver(
             model=AppWindow.PRELOADED_BODY_MODELS[f'{bm.lower()}-{gender.lower()}'],
             target=target_keypoints, init=init_pose, device='cpu',
-            max_iter=50, transl=AppWindow.BODY_TRANSL,
+            max_iter=50, transl=self.session.body_transl,
             betas=self._body_beta_tensor,
         )
         opt_params = opt_params.requires_grad_(False)
         # import ipdb; ipdb.set_trace()
-        AppWindow.POSE_PARAMS[bm][bp] = opt_params.reshape(1, -1, 3)
+        self.session.pose_params[bm][bp] = opt_params.reshape(1, -1, 3)
 
         self.load_body_model(
             self._body_model.selected_text,
             gender=self._body_model_gender.selected_text,
         )
 
+    def _on_fit_scan(self):
+        bm = self._body_model.selected_text
+        if bm not in ('SMPL', 'SMPLX'):
+            logger.warning('Scan fitting is not implemented for this body model')
+            return
+        if self.loaded_geometry is None:
+            logger.warning('Open a scan first')
+            return
+        geometry = self.loaded_geometry['geometry']
+        if self.loaded_geometry['lod'] is not None:
+            geometry = self.loaded_geometry['lod'].full
+        if isinstance(geometry, o3d.geometry.TriangleMesh):
+            scan_points = np.asarray(geometry.vertices)
+        else:
+            scan_points = np.asarray(geometry.points)
+
+        gender = self._body_model_gender.selected_text
+        model = AppWindow.PRELOADED_BODY_MODELS[get_model_key(bm, gender)]
+        self._body_fit_scan.enabled = False
+        self._progress.value = 0.0
+        self._progress.visible = True
+
+        def progress(stage, value):
+            def update():
+                self._progress.value = value
+                self._update_label(f'Fitting {bm} to scan: {stage}')
+            self._post_to_main_thread(update)
+
+        def work():
+            try:
+                result = fit_body_to_scan(model, scan_points, body_model=bm, progress=progress)
+            except Exception as e:
+                logger.exception(f'Fitting {bm} to the scan failed')
+                # `e` is unbound once the except block ends, failed() runs later
+                message = f'Scan fitting failed: {e}'
+
+                def failed():
+                    self._body_fit_scan.enabled = True
+                    self._progress.visible = False
+                    self._update_label(message)
+
+                self._post_to_main_thread(failed)
+                return
+            self._post_to_main_thread(lambda: self._on_fit_scan_done(bm, gender, result))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _on_fit_scan_done(self, bm, gender, result):
+        self._body_fit_scan.enabled = True
+        self._progress.visible = False
+        self._update_label(f'Scan fitting loss {result["loss"]:.5f}')
+
+        self.session.pose_params[bm]['body_pose'] = result['body_pose']
+        self.session.pose_params[bm]['global_orient'] = result['global_orient']
+        self._body_beta_tensor = result['betas'][:, :10].clone()
+        self.load_body_model(bm, gender=gender)
+
+        # The body is displayed grounded without the fitted translation, move
+        # the scan by the same offset so they stay registered
+        transform = np.eye(4)
+        transform[:3, 3] = (self.session.body_transl - result['transl']).numpy()[0]
+        self._scene.scene.set_geometry_transform("__model__", transform)
+
     def _reset_rot_sliders(self):
         self._body_pose_joint_x.int_value = 0
         self._body_pose_joint_y.int_value = 0
@@ -1338,6 +1483,8 @@ class AppWindow:
     def _on_save_dialog(self):
         dlg = gui.FileDialog(gui.FileDialog.SAVE, "Choose file to save",
                              self.window.theme)
+        dlg.add_filter(".bmvp", "Body model params (.bmvp)")
+        dlg.add_filter(".pkl", "Pickled python dict (.pkl)")
         dlg.set_on_cancel(self._on_save_dialog_cancel)
         dlg.set_on_done(self._on_save_dialog_done)
         self.window.show_dialog(dlg)
@@ -1352,11 +1499,82 @@ class AppWindow:
             'expression': self._body_exp_tensor,
             'gender': self._body_model_gender.selected_text,
             'body_model': self._body_model.selected_text,
-            'joints': AppWindow.JOINTS,
+            'joints': self.session.joints,
         }
-        output_dict.update(AppWindow.POSE_PARAMS[self._body_model.selected_text])
+        output_dict.update(self.session.pose_params[self._body_model.selected_text])
         logger.debug(f'Saving output to {filename}')
-        joblib.dump(output_dict, filename)
+        if filename.endswith(param_io.EXTENSION):
+            # arrays are copied here, the file is written off the UI thread
+            future = param_io.save_params_async(filename, output_dict)
+
+            def on_saved(f):
+                error = f.exception()
+                if error is not None:
+                    logger.error(f'Saving {filename} failed: {error!r}')
+                    self._post_to_main_thread(
+                        lambda: self._update_label(f'Failed to save {os.path.basename(filename)}: {error}'))
+
+            future.add_done_callback(on_saved)
+        else:
+            joblib.dump(output_dict, filename)
+
+    def _on_load_params_dialog(self):
+        dlg = gui.FileDialog(gui.FileDialog.OPEN, "Choose model params to load",
+                             self.window.theme)
+        dlg.add_filter(".bmvp .pkl", "Body model params (.bmvp, .pkl)")
+        dlg.add_filter("", "All files")
+        dlg.set_on_cancel(self._on_file_dialog_cancel)
+        dlg.set_on_done(self._on_load_params_dialog_done)
+        self.window.show_dialog(dlg)
+
+    def _on_load_params_dialog_done(self, filename):
+        self.window.close_dialog()
+        self.load_model_params(filename)
+
+    def _on_params_browse(self):
+        dlg = gui.FileDialog(gui.FileDialog.OPEN_DIR, "Choose folder of model params",
+                             self.window.theme)
+        dlg.set_on_cancel(self._on_file_dialog_cancel)
+        dlg.set_on_done(self._on_params_browse_done)
+        self.window.show_dialog(dlg)
+
+    def _on_params_browse_done(self, dirname):
+        self.window.close_dialog()
+        self.scan_params_dir(dirname)
+
+    def _on_params_list(self, new_val, is_dbl_click):
+        index = self._params_list.selected_index
+        if 0 <= index < len(self._params_files):
+            self.load_model_params(self._params_files[index])
+
+    def _on_seq_load(self):
+        dlg = gui.FileDialog(gui.FileDialog.OPEN, "Choose pose sequence",
+                             self.window.theme)
+        dlg.add_filter(".npz", "AMASS-style sequences (.npz)")
+        dlg.add_filter(".json", "Motion store index (index.json)")
+        dlg.set_on_cancel(self._on_file_dialog_cancel)
+        dlg.set_on_done(self._on_seq_load_done)
+        self.window.show_dialog(dlg)
+
+    def _on_seq_load_done(self, filename):
+        self.window.close_dialog()
+        self.load_sequence(filename)
+
+    def _on_seq_play(self):
+        if self._seq_clock is None:
+            return
+        if self._seq_clock.playing:
+            self._seq_clock.pause()
+            self._seq_play.text = "Play"
+        else:
+            self._seq_clock.play()
+            self._seq_play.text = "Pause"
+
+    def _on_seq_scrub(self, val):
+        if self._prefetcher is None:
+            return
+        self._seq_clock.seek(int(val))
+        self._prefetcher.seek(int(val))
 
     def _on_file_dialog_cancel(self):
         self.window.close_dialog()
@@ -1373,6 +1591,31 @@ class AppWindow:
         dlg.set_on_done(self._on_export_dialog_done)
         self.window.show_dialog(dlg)
 
+    def _on_menu_export_mesh(self):
+        dlg = gui.FileDialog(gui.FileDialog.SAVE, "Choose file to save",
+                             self.window.theme)
+        dlg.add_filter(".obj", "Wavefront OBJ files (.obj)")
+        dlg.add_filter(".ply", "Polygon files (.ply)")
+        dlg.add_filter(".glb", "OpenGL binary transfer files (.glb)")
+        dlg.set_on_cancel(self._on_file_dialog_cancel)
+        dlg.set_on_done(self._on_export_mesh_dialog_done)
+        self.window.show_dialog(dlg)
+
+    def _on_export_mesh_dialog_done(self, filename):
+        self.window.close_dialog()
+        bm = self._body_model.selected_text
+        model = AppWindow.PRELOADED_BODY_MODELS[get_model_key(bm, self._body_model_gender.selected_text)]
+        verts, _, _ = forward_body_model(
+            model,
+            betas=self._body_beta_tensor,
+            expression=self._body_exp_tensor,
+            pose_params=self.session.pose_params[bm],
+            ground=False,
+        )
+        verts = verts + self.session.body_transl.numpy()
+        logger.debug(f'Saving mesh to {filename}')
+        write_mesh(filename, verts, model.faces)
+
     def _on_export_dialog_done(self, filename):
         self.window.close_dialog()
         frame = self._scene.frame
@@ -1401,6 +1644,7 @@ class AppWindow:
         dlg_layout.add_child(gui.Label("Move -x/+x: 1/2"))
         dlg_layout.add_child(gui.Label("Move -y/+y: 3/4"))
         dlg_layout.add_child(gui.Label("Move -z/+z: 5/6"))
+        dlg_layout.add_child(gui.Label("Drag joint with IK: Ctrl+left drag"))
         # Add the Ok button. We need to define a callback function to handle
         # the click.
         ok = gui.Button("OK")
@@ -1425,120 +1669,413 @@ class AppWindow:
     def add_ground_plane(self):
         logger.info('drawing ground plane')
         gp = get_checkerboard_plane(plane_width=2, num_boxes=9)
-
-        for idx, g in enumerate(gp):
-            g.compute_vertex_normals()
-            self._scene.scene.add_geometry(f"__ground_{idx:04d}__", g, self.settings._materials[Settings.LIT])
+        gp.compute_vertex_normals()
+        self._add_geometry("__ground__", gp, self.settings._materials[Settings.LIT])
 
     def preload_body_models(self):
-        from smplx import SMPL, SMPLX, MANO, FLAME
-
         for body_model in AppWindow.BODY_MODEL_NAMES:
             for gender in AppWindow.BODY_MODEL_GENDERS[body_model]:
-                logger.info(f'Loading {body_model}-{gender}')
-                extra_params = {'gender': gender}
-                if body_model in ('SMPLX', 'MANO', 'FLAME'):
-                    extra_params['use_pca'] = False
-                    extra_params['flat_hand_mean'] = True
-                    extra_params['use_face_contour'] = True
-                model = eval(body_model.upper())(f'data/body_models/{body_model.lower()}', **extra_params)
-                AppWindow.PRELOADED_BODY_MODELS[f'{body_model.lower()}-{gender.lower()}'] = model
+                # models are shared by every window of the process
+                if get_model_key(body_model, gender) in AppWindow.PRELOADED_BODY_MODELS:
+                    continue
+                model = build_body_model(body_model, gender)
+                AppWindow.PRELOADED_BODY_MODELS[get_model_key(body_model, gender)] = model
+                AppWindow.SKELETON_BONES[get_model_key(body_model, gender)] = \
+                    get_skeleton_bones(model.parents.numpy())
         logger.info(f'Loaded body models {AppWindow.PRELOADED_BODY_MODELS.keys()}')
 
-    # @torch.no_grad()
-    def load_body_model(self, body_model='smpl', gender='neutral'):
-        self._scene.scene.remove_geometry("__body_model__")
+    def load_body_model(self, body_model='smpl', gender='neutral', keep_transl=False):
+        start = time.perf_counter()
+        self._alloc_meter.begin()
+        stats = self.frame_stats
+        stats.begin()
+
+        model = AppWindow.PRELOADED_BODY_MODELS[get_model_key(body_model, gender)]
+
+        with stats.stage('forward'):
+            verts, joints, _ = forward_body_model(
+                model,
+                betas=self._body_beta_tensor,
+                expression=self._body_exp_tensor,
+                pose_params=self.session.pose_params[body_model],
+                ground=False,
+            )
+        # while dragging a joint the body must stay in the frame the IK
+        # targets were defined in, so skip re-grounding it
+        if keep_transl and self.session.body_transl is not None:
+            min_y = self.session.body_transl[0, 1].item()
+        else:
+            min_y = -verts[:, 1].min()
+        with stats.stage('normals'):
+            mesh = build_body_mesh(verts, model.faces, compute_normals=False)
+            mesh.translate([0, min_y, 0])
+            mesh.compute_vertex_normals()
+        self.session.joints = joints + np.array([0, min_y, 0])
+        self._publish_mesh(get_model_key(body_model, gender),
+                           verts + np.array([0, min_y, 0], dtype=np.float32),
+                           model.faces, self.session.joints)
+
+        with stats.stage('upload'):
+            self._remove_geometry("__body_model__")
+            self._add_geometry("__body_model__", mesh,
+                                           self.settings.material)
+        bounds = mesh.get_axis_aligned_bounding_box()
+        if self.session.cam_first:
+            self._scene.setup_camera(60, bounds, bounds.get_center())
+            self.session.cam_first = False
+        self.session.body_transl = torch.tensor([[0, min_y, 0]])
+        self.session.sequence_frame = None
+        with stats.stage('joints'):
+            self._on_show_joints(self._show_joints.checked)
+        stats.end()
+        self._update_hud()
+        self._alloc_meter.end()
+
+        if self._stream is not None:
+            self._pending_body_update = None
+            self._stream.record_frame(time.perf_counter() - start)
+            self._stream.mark_changed()
+            self._stream.pushed()
+
+    def _add_geometry(self, name, geometry, material):
+        # scene geometry goes through here so the memory panel can account for it
+        self._scene.scene.add_geometry(name, geometry, material)
+        self._geometry_bytes[name] = get_geometry_bytes(geometry)
+
+    def _remove_geometry(self, name):
+        self._scene.scene.remove_geometry(name)
+        self._geometry_bytes.pop(name, None)
+
+    def get_memory_report(self):
+        models = {k: get_module_bytes(m) for k, m in AppWindow.PRELOADED_BODY_MODELS.items()}
+        caches = {}
+        if self._prefetcher is not None:
+            caches['sequence buffer'] = self._prefetcher.verts.nbytes + self._prefetcher.joints.nbytes
+        if self.loaded_geometry is not None and self.loaded_geometry['lod'] is not None:
+            caches['point cloud levels'] = sum(
+                get_geometry_bytes(g) for g in self.loaded_geometry['lod'].levels)
+        if self.render_cache is not None:
+            caches['render cache (disk)'] = self.render_cache.total_bytes
+        geometry = {}
+        for name, size in self._geometry_bytes.items():
+            key = 'joint spheres' if name.startswith('__joints_') else name.strip('_')
+            geometry[key] = geometry.get(key, 0) + size
+        return {
+            'rss': get_rss_bytes(),
+            'models': models,
+            'caches': caches,
+            'geometry': geometry,
+            'labels': len(self.joint_labels_3d_list),
+            'per_tick': self._alloc_meter.get_rates(),
+        }
+
+    def _on_memory_refresh(self):
+        self._memory_info.text = format_report(self.get_memory_report())
+        self.window.set_needs_layout()
 
-        model = AppWindow.PRELOADED_BODY_MODELS[f'{body_model.lower()}-{gender.lower()}']
+    def _post_to_main_thread(self, fn):
+        # counts callbacks waiting on the UI thread, shown as the HUD queue depth
+        self.frame_stats.post()
 
-        input_params = copy.deepcopy(AppWindow.POSE_PARAMS[body_model])
+        def run():
+            self.frame_stats.done()
+            fn()
 
-        for k, v in input_params.items():
-            input_params[k] = v.reshape(1, -1)
+        gui.Application.instance.post_to_main_thread(self.window, run)
 
-        model_output = model(
-            betas=self._body_beta_tensor,
-            expression=self._body_exp_tensor,
-            **input_params,
+    def _on_show_hud(self, show):
+        self._hud.visible = show
+        self._update_hud()
+        self.window.set_needs_layout()
+
+    def _update_hud(self):
+        if self._hud.visible:
+            self._hud.text = self.frame_stats.format()
+
+    def _publish_mesh(self, model_key, verts, faces, joints):
+        # model_key names the model the faces belong to, which is not always
+        # the one selected in the comboboxes (e.g. a playing sequence)
+        if self.mesh_stream is None:
+            return
+        self.mesh_stream.publish(model_key, faces, verts, joints)
+
+    def _on_stream_tick(self):
+        redraw = False
+        if self._pending_body_update is not None and self._stream.should_push():
+            self.load_body_model(*self._pending_body_update)
+            redraw = True
+        if self._stream.update():
+            # cheaper rendering while the body is changing, one full quality
+            # frame once the scene is idle. The window keeps the client's size.
+            view = self._scene.scene.view
+            quality = self._stream.quality
+            view.set_antialiasing(quality >= 2)
+            view.set_post_processing(quality >= 2)
+            view.set_shadowing(quality >= 1)
+            redraw = True
+        return redraw
+
+    def scan_params_dir(self, dirname):
+        # Only the small .bmvp headers are read here, pickles have no header
+        # and are listed by name
+        entries = []
+        for entry in sorted(os.scandir(dirname), key=lambda e: e.name):
+            if entry.name.endswith(param_io.EXTENSION):
+                try:
+                    header = param_io.read_header(entry.path)
+                except ValueError as e:
+                    logger.warning(e)
+                    continue
+                entries.append((entry.path, f"{entry.name} ({header['body_model']}, {header['gender']})"))
+            elif entry.name.endswith('.pkl'):
+                entries.append((entry.path, entry.name))
+        self._params_files = [path for path, _ in entries]
+        self._params_list.set_items([label for _, label in entries])
+        logger.info(f'Found {len(entries)} model params in {dirname}')
+
+    def load_model_params(self, path):
+        params = load_saved_params(path)
+        bm = params['body_model']
+        gender = params['gender']
+        betas, expression, pose_params = split_saved_params(params)
+
+        if bm != self._body_model.selected_text:
+            self.session.cam_first = True
+            self._body_model.selected_text = bm
+            self._refresh_body_model_items(bm)
+        self._body_model_gender.selected_text = gender
+
+        self._body_beta_tensor = betas.reshape(1, -1).float().clone()
+        self._body_exp_tensor = expression.reshape(1, -1).float().clone()
+        for k, v in pose_params.items():
+            if k in self.session.pose_params[bm]:
+                self.session.pose_params[bm][k] = v.reshape(1, -1, 3).float().clone()
+
+        self._body_beta_val.double_value = self._body_beta_tensor[0, self._body_model_shape_comp.selected_index].item()
+        self._body_exp_val.double_value = self._body_exp_tensor[0, self._body_model_exp_comp.selected_index].item()
+        self._reset_rot_sliders()
+        self.session.selected_joint = None
+        self.load_body_model(bm, gender=gender)
+        self._update_label(f'Loaded {os.path.basename(path)}')
+
+    def load_sequence(self, path):
+        bm = self._body_model.selected_text
+        if bm not in ('SMPL', 'SMPLX'):
+            logger.warning('Sequence playback is only implemented for SMPL and SMPLX')
+            return
+        gender = self._body_model_gender.selected_text
+        seq = open_sequence(path, bm)
+
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+        self._body_beta_tensor = seq['betas'].clone()
+        self._prefetcher = SequencePrefetcher(
+            seq, AppWindow.PRELOADED_BODY_MODELS[get_model_key(bm, gender)],
+            capacity=AppWindow.SEQ_BUFFER_FRAMES,
         )
-        verts = model_output.vertices[0].detach().numpy()
-        AppWindow.JOINTS = model_output.joints[0].detach().numpy()
-        faces = model.faces
-
-        mesh = o3d.geometry.TriangleMesh()
-
-        mesh.vertices = o3d.utility.Vector3dVector(verts)
-        mesh.triangles = o3d.utility.Vector3iVector(faces)
-        mesh.compute_vertex_normals()
-        mesh.paint_uniform_color([0.5, 0.5, 0.5])
-        # ipdb.set_trace()
-        min_y = -mesh.get_min_bound()[1]
-        mesh.translate([0, min_y, 0])
-        AppWindow.JOINTS += np.array([0, min_y, 0])
-
-        self._scene.scene.add_geometry("__body_model__", mesh,
-                                       self.settings.material)
-        bounds = mesh.get_axis_aligned_bounding_box()
-        if AppWindow.CAM_FIRST:
-            self._scene.setup_camera(60, bounds, bounds.get_center())
-            AppWindow.CAM_FIRST = False
-        AppWindow.BODY_TRANSL = torch.tensor([[0, min_y, 0]])
-        self._on_show_joints(self._show_joints.checked)
+        self._seq_clock = PlaybackClock(seq['fps'])
+        self._seq_scrubber.set_limits(0, seq['n_frames'] - 1)
+        self._seq_scrubber.int_value = 0
+        self._seq_play.text = "Play"
+        self._seq_frame_pending = False
+        logger.info(f'Loaded {seq["n_frames"]} frames at {seq["fps"]:.1f} fps from {path}')
+
+        threading.Thread(target=self._playback_loop, args=(self._prefetcher, get_model_key(bm, gender)),
+                         daemon=True).start()
+
+    def _playback_loop(self, prefetcher, model_key):
+        # Runs until another sequence is loaded. Frames are taken from the
+        # wall clock; one that is not buffered yet, or that arrives while the
+        # UI thread is still drawing the previous one, is dropped.
+        clock = self._seq_clock
+        last_frame = None
+        n_dropped = 0
+        while self._prefetcher is prefetcher:
+            time.sleep(0.5 / clock.fps)
+            frame = clock.frame()
+            if frame >= prefetcher.n_frames:
+                # loop the clip
+                frame = 0
+                clock.seek(0)
+                prefetcher.seek(0)
+            if frame == last_frame or self._seq_frame_pending:
+                continue
+            data = prefetcher.get_frame(frame)
+            if data is None:
+                continue
+            if last_frame is not None and frame > last_frame:
+                n_dropped += frame - last_frame - 1
+            last_frame = frame
+            self._seq_frame_pending = True
+
+            def update(frame=frame, data=data, n_dropped=n_dropped):
+                self._show_sequence_frame(frame, *data, model_key, prefetcher.faces, n_dropped)
+
+            self._post_to_main_thread(update)
+
+    def _show_sequence_frame(self, frame, verts, joints, transl, model_key, faces, n_dropped):
+        # the forward pass already ran on the prefetch thread
+        stats = self.frame_stats
+        stats.begin()
+        with stats.stage('normals'):
+            mesh = build_body_mesh(verts, faces)
+        with stats.stage('upload'):
+            self._remove_geometry("__body_model__")
+            self._add_geometry("__body_model__", mesh, self.settings.material)
+        self.session.joints = joints.astype(np.float64)
+        self.session.body_transl = torch.from_numpy(transl).reshape(1, 3)
+        # the scene no longer shows session.pose_params, see _get_render_key
+        self.session.sequence_frame = frame
+        self._publish_mesh(model_key, verts, faces, joints)
+        self._seq_scrubber.int_value = frame
+        self._seq_info.text = f'Frame {frame}, dropped {n_dropped}'
+        if self._show_joints.checked or self._show_skeleton.checked:
+            with stats.stage('joints'):
+                self._on_show_joints(self._show_joints.checked)
+        stats.end()
+        self._update_hud()
+        self._seq_frame_pending = False
 
     def load(self, path):
-        # self._scene.scene.clear_geometry()
-        # if self.settings.show_ground:
-        #     self.add_ground_plane()
-
-        geometry = None
-        geometry_type = o3d.io.read_file_geometry_type(path)
-
-        mesh = None
-        if geometry_type & o3d.io.CONTAINS_TRIANGLES:
-            mesh = o3d.io.read_triangle_mesh(path)
-        if mesh is not None:
-            if len(mesh.triangles) == 0:
-                print(
-                    "[WARNING] Contains 0 triangles, will read as point cloud")
-                mesh = None
-            else:
-                mesh.compute_vertex_normals()
-                if len(mesh.vertex_colors) == 0:
-                    mesh.paint_uniform_color([1, 1, 1])
-                geometry = mesh
-            # Make sure the mesh has texture coordinates
-            if not mesh.has_triangle_uvs():
-                uv = np.array([[0.0, 0.0]] * (3 * len(mesh.triangles)))
-                mesh.triangle_uvs = o3d.utility.Vector2dVector(uv)
-        else:
-            print("[Info]", path, "appears to be a point cloud")
-
-        if geometry is None:
-            cloud = None
+        # Reading, downsampling and normal estimation run on a worker thread;
+        # only adding the result to the scene happens on the UI thread.
+        self._progress.value = 0.0
+        self._progress.visible = True
+        self._update_label(f'Loading {os.path.basename(path)}')
+
+        def progress(stage, value):
+            def update():
+                self._progress.value = value
+                self._update_label(f'Loading {os.path.basename(path)}: {stage}')
+            self._post_to_main_thread(update)
+
+        def work():
             try:
-                cloud = o3d.io.read_point_cloud(path)
-            except Exception:
-                pass
-            if cloud is not None:
-                print("[Info] Successfully read", path)
-                if not cloud.has_normals():
-                    cloud.estimate_normals()
-                cloud.normalize_normals()
-                geometry = cloud
-            else:
-                print("[WARNING] Failed to read points", path)
-
-        if geometry is not None:
+                geometry = read_geometry(path, progress)
+                lod = None
+                if isinstance(geometry, o3d.geometry.PointCloud):
+                    lod = PointCloudLOD(geometry, progress=progress)
+                    geometry = lod.get_level(lod.default_level)
+            except Exception as e:
+                logger.error(e)
+                geometry, lod = None, None
+
+            def done():
+                self._progress.visible = False
+                self._update_label('' if geometry is not None else f'Failed to load {path}')
+                if geometry is not None:
+                    self._show_loaded_geometry(path, geometry, lod)
+
+            self._post_to_main_thread(done)
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _show_loaded_geometry(self, path, geometry, lod):
+        self.loaded_geometry = {'path': path, 'geometry': geometry, 'lod': lod}
+        self._lod_level.clear_items()
+        if lod is not None:
+            for name in lod.describe():
+                self._lod_level.add_item(name)
+            self._lod_level.selected_index = lod.default_level
+        self._lod_level.enabled = lod is not None and len(lod.levels) > 1
+        try:
+            if self._scene.scene.has_geometry("__model__"):
+                self._remove_geometry("__model__")
+            self._add_geometry("__model__", geometry,
+                                           self.settings.material)
+            bounds = geometry.get_axis_aligned_bounding_box()
+            self._scene.setup_camera(60, bounds, bounds.get_center())
+        except Exception as e:
+            print(e)
+
+    def _on_lod_level(self, name, index):
+        lod = self.loaded_geometry['lod'] if self.loaded_geometry is not None else None
+        if lod is None:
+            return
+        # normals of a level are estimated the first time it is shown, which
+        # runs on a worker thread like load(); the combobox stays disabled
+        # until the level is in the scene
+        self._lod_level.enabled = False
+        self._progress.value = 0.0
+        self._progress.visible = True
+        self._update_label(f'Preparing {name}')
+
+        def work():
             try:
-                self._scene.scene.add_geometry("__model__", geometry,
-                                               self.settings.material)
-                bounds = geometry.get_axis_aligned_bounding_box()
-                self._scene.setup_camera(60, bounds, bounds.get_center())
+                level = lod.get_level(index)
             except Exception as e:
-                print(e)
+                logger.error(e)
+                level = None
+
+            def done():
+                self._progress.visible = False
+                self._update_label('' if level is not None else f'Failed to prepare {name}')
+                # a different file may have been loaded in the meantime
+                if self.loaded_geometry is None or self.loaded_geometry['lod'] is not lod:
+                    return
+                self._lod_level.enabled = True
+                if level is None:
+                    return
+                self._remove_geometry("__model__")
+                self._add_geometry("__model__", level,
+                                               self.settings.material)
 
-    def export_image(self, path, width, height):
+            self._post_to_main_thread(done)
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _get_render_key(self, path, width, height):
+        # External meshes and point clouds are not part of the key, so images
+        # of scenes containing them are never cached
+        if self._scene.scene.has_geometry("__model__"):
+            return None
+        # neither are sequence frames, which are not described by the session pose
+        if self.session.sequence_frame is not None:
+            return None
+        bm = self._body_model.selected_text
+        camera = self._scene.scene.camera
+        show_overlay = self._show_joints.checked or self._show_skeleton.checked \
+            or self._show_joint_labels.checked
+        return get_render_key(
+            body_model=bm,
+            gender=self._body_model_gender.selected_text,
+            betas=self._body_beta_tensor,
+            expression=self._body_exp_tensor,
+            pose=self.session.pose_params[bm],
+            camera={
+                'view': np.asarray(camera.get_view_matrix()),
+                'projection': np.asarray(camera.get_projection_matrix()),
+            },
+            material=get_material_state(self.settings.material),
+            lighting=get_lighting_state(self.settings, self._ibl_map.selected_text),
+            scene={
+                'bg_color': [self.settings.bg_color.red, self.settings.bg_color.green,
+                             self.settings.bg_color.blue, self.settings.bg_color.alpha],
+                'show_skybox': self.settings.show_skybox,
+                'show_axes': self.settings.show_axes,
+                'show_ground': self.settings.show_ground,
+                'joints': self._show_joints.checked,
+                'skeleton': self._show_skeleton.checked,
+                'labels': self._show_joint_labels.checked,
+                'joint_positions': self.session.joints if show_overlay else None,
+                'selected_joint': self.session.selected_joint if show_overlay else None,
+            },
+            resolution=(self._scene.frame.width, self._scene.frame.height, width, height),
+            format=os.path.splitext(path)[1],
+        )
 
+    def export_image(self, path, width, height):
+        key = None
+        if self.render_cache is not None:
+            key = self._get_render_key(path, width, height)
+        if key is not None:
+            cached_path = self.render_cache.get(key, os.path.splitext(path)[1])
+            if cached_path is not None:
+                logger.debug(f'Render cache hit for {path}')
+                copy_cached(cached_path, path)
+                return
+
+        @traced(name='AppWindow.export_image.on_image')
         def on_image(image):
             img = image
 
@@ -1546,12 +2083,36 @@ class AppWindow:
             if path.endswith(".jpg"):
                 quality = 100
             o3d.io.write_image(path, img, quality)
+            if key is not None:
+                self.render_cache.put_file(key, path)
 
         self._scene.scene.scene.render_to_image(on_image)
 
 
 def main(args):
-    if args.web:
+    if args.serve:
+        # headless, no window or render context is created
+        from server import serve
+        warm = [m.split(':') if ':' in m else (m, 'neutral') for m in args.warm]
+
+        def on_ready(pool):
+            if args.no_thread_tuning and args.threads is None and args.blas_threads is None:
+                return
+            # tuned on the warm models, first gender of each
+            models = {}
+            for bm, gender in warm:
+                models.setdefault(bm, pool.get_model(bm, gender))
+            configure_threads(models, args.threads, args.blas_threads, retune=args.retune_threads)
+
+        serve(args.host, args.port, warm=warm, max_batch=args.max_batch,
+              max_wait=args.max_wait_ms / 1000, on_ready=on_ready)
+        return
+
+    if args.web or args.replay is not None:
+        # the WebRTC window system renders offscreen, which also makes
+        # replays run without a display. It also starts its HTTP server
+        # (WEBRTC_IP / WEBRTC_PORT, localhost:8888 by default), so a replay
+        # can be watched in a browser.
         logger.info('Initializing web visualization')
         o3d.visualization.webrtc_server.enable_webrtc()
 
@@ -1559,7 +2120,65 @@ def main(args):
     # for rendering and prepares the cross-platform window abstraction.
     gui.Application.instance.initialize()
 
-    w = AppWindow(1920, 1080)
+    if args.trace is not None:
+        # wrap the callbacks before any window registers them
+        tracer = enable_tracing(args.trace_buffer)
+        instrument_class(AppWindow, names=(
+            'load_body_model', 'export_image', 'load', 'load_sequence', 'load_model_params',
+            '_show_sequence_frame', '_show_loaded_geometry', '_start_joint_drag', '_end_joint_drag'))
+        atexit.register(tracer.dump, args.trace)
+        if hasattr(signal, 'SIGUSR1'):
+            # dump a running session without closing it: kill -USR1 <pid>
+            signal.signal(signal.SIGUSR1, lambda *_: tracer.dump(args.trace))
+
+    if args.record is not None:
+        recorder = EventRecorder(args.record)
+        instrument_recording(recorder)
+        atexit.register(recorder.close)
+
+    render_cache = None
+    if args.cache_dir is not None:
+        render_cache = RenderCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 ** 2)
+
+    # with --web every window is a separate session that a client can connect to;
+    # each window streams its meshes on its own port, --mesh-stream-port + index
+    windows = []
+    for i in range(args.windows):
+        mesh_stream = None
+        if args.mesh_stream_port is not None:
+            mesh_stream = MeshStreamServer(args.host, args.mesh_stream_port + i)
+        windows.append(AppWindow(1920, 1080, render_cache=render_cache, adaptive_stream=args.web,
+                                 mesh_stream=mesh_stream))
+    if args.web:
+        register_feedback_channel({f'window_{i}': w._stream for i, w in enumerate(windows)})
+
+    if not args.no_thread_tuning or args.threads is not None or args.blas_threads is not None:
+        # tuned on the models the windows already loaded, cached per host
+        models = {
+            bm: AppWindow.PRELOADED_BODY_MODELS[get_model_key(bm, AppWindow.BODY_MODEL_GENDERS[bm][0])]
+            for bm in AppWindow.BODY_MODEL_NAMES
+        }
+        configure_threads(models, args.threads, args.blas_threads, retune=args.retune_threads)
+
+    if args.replay is not None:
+        def on_replay_done(report):
+            print_latency_report(report)
+            if args.replay_report is not None:
+                with open(args.replay_report, 'w') as f:
+                    json.dump(report, f, indent=2)
+            gui.Application.instance.quit()
+
+        replay(windows[0], load_events(args.replay), args.replay_realtime, on_replay_done)
+
+    if args.memory_report is not None:
+        def report_memory():
+            while True:
+                time.sleep(args.memory_report)
+                for w in windows:
+                    gui.Application.instance.post_to_main_thread(
+                        w.window, lambda w=w: logger.info('\n' + format_report(w.get_memory_report())))
+
+        threading.Thread(target=report_memory, daemon=True).start()
 
     # Run the event loop. This will not return until the last window is closed.
     gui.Application.instance.run()
@@ -1568,6 +2187,38 @@ def main(args):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--web', action='store_true', help='Enable web visualization')
+    parser.add_argument('--windows', type=int, default=1,
+                        help='Number of windows (independent sessions) to open, e.g. one per --web client')
+    parser.add_argument('--trace', default=None,
+                        help='Record spans of UI callbacks and body updates, written as Chrome trace json on exit')
+    parser.add_argument('--trace-buffer', type=int, default=200000, help='Number of spans kept for --trace')
+    parser.add_argument('--memory-report', type=float, default=None,
+                        help='Log a memory report (models, caches, scene geometry) every this many seconds')
+    parser.add_argument('--record', default=None, help='Record UI events of this session to a jsonl file')
+    parser.add_argument('--replay', default=None, help='Replay recorded UI events headlessly and report latencies')
+    parser.add_argument('--replay-report', default=None, help='Write the replay latency percentiles as json')
+    parser.add_argument('--replay-realtime', action='store_true',
+                        help='Keep the recorded timing between events instead of replaying back to back')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='torch intra-op threads, skips the automatic tuning')
+    parser.add_argument('--blas-threads', type=int, default=None,
+                        help='OpenMP/BLAS threads, skips the automatic tuning')
+    parser.add_argument('--retune-threads', action='store_true',
+                        help='Benchmark thread counts again instead of using the cached choice for this host')
+    parser.add_argument('--no-thread-tuning', action='store_true', help='Keep the library default thread counts')
+    parser.add_argument('--cache-dir', default=None, help='Directory of the exported image cache')
+    parser.add_argument('--cache-size-mb', type=int, default=2048, help='Size cap of the image cache')
+    parser.add_argument('--serve', action='store_true', help='Run the headless HTTP mesh service instead of the GUI')
+    parser.add_argument('--host', default='127.0.0.1', help='Address of the mesh service and mesh stream')
+    parser.add_argument('--port', type=int, default=8000, help='Port of the mesh service')
+    parser.add_argument('--warm', nargs='*', default=['SMPL:neutral'],
+                        help='Models loaded at startup, as BODY_MODEL:gender')
+    parser.add_argument('--mesh-stream-port', type=int, default=None,
+                        help='Stream delta-encoded meshes of the edited body to TCP clients on this port, '
+                             'window i of --windows uses this port + i')
+    parser.add_argument('--max-batch', type=int, default=64, help='Largest micro-batch of the mesh service')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='How long the mesh service waits to fill a micro-batch')
 
     args = parser.parse_args()
     main(args)
@@ -0,0 +1,86 @@
+import os
+import sys
+import resource
+import numpy as np
+from collections import deque
+
+
+def get_rss_bytes():
+    # current resident set size; falls back to the peak where /proc is missing
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def get_module_bytes(module):
+    # parameters and buffers, counting shared storages once
+    seen = set()
+    total = 0
+    for t in list(module.parameters()) + list(module.buffers()):
+        storage = t.untyped_storage() if hasattr(t, 'untyped_storage') else t.storage()
+        ptr = storage.data_ptr()
+        if ptr not in seen:
+            seen.add(ptr)
+            total += storage.nbytes() if hasattr(storage, 'nbytes') else storage.size() * t.element_size()
+    faces = getattr(module, 'faces', None)
+    if isinstance(faces, np.ndarray):
+        total += faces.nbytes
+    return total
+
+
+def get_geometry_bytes(geometry):
+    # host-side size of an Open3D geometry, 8 bytes per double / 4 per int
+    total = 0
+    for attr, item_bytes in (('vertices', 24), ('vertex_normals', 24), ('vertex_colors', 24),
+                             ('triangles', 12), ('triangle_normals', 24), ('triangle_uvs', 16),
+                             ('points', 24), ('normals', 24), ('colors', 24), ('lines', 8)):
+        if hasattr(geometry, attr):
+            total += len(getattr(geometry, attr)) * item_bytes
+    return total
+
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f'{n:.1f} {unit}' if unit != 'B' else f'{n} B'
+        n /= 1024
+
+
+class AllocationMeter:
+    # RSS growth and python object blocks allocated per update (slider tick)
+    def __init__(self, window=100):
+        self.rss_deltas = deque(maxlen=window)
+        self.block_deltas = deque(maxlen=window)
+        self.start = None
+
+    def begin(self):
+        self.start = (get_rss_bytes(), sys.getallocatedblocks())
+
+    def end(self):
+        if self.start is None:
+            return
+        rss, blocks = self.start
+        self.rss_deltas.append(get_rss_bytes() - rss)
+        self.block_deltas.append(sys.getallocatedblocks() - blocks)
+        self.start = None
+
+    def get_rates(self):
+        if not self.rss_deltas:
+            return 0.0, 0.0
+        return float(np.mean(self.rss_deltas)), float(np.mean(self.block_deltas))
+
+
+def format_report(report):
+    lines = [f'Resident: {format_bytes(report["rss"])}']
+    for section in ('models', 'caches', 'geometry'):
+        items = report[section]
+        lines.append(f'{section.capitalize()}: {format_bytes(sum(items.values()))}')
+        for name, size in sorted(items.items(), key=lambda x: -x[1]):
+            lines.append(f'  {name}: {format_bytes(size)}')
+    lines.append(f'Labels: {report["labels"]}')
+    rss_rate, block_rate = report['per_tick']
+    lines.append(f'Per update: {format_bytes(rss_rate)} RSS, {block_rate:.0f} py blocks')
+    return '\n'.join(lines)
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import struct
+import argparse
+import tempfile
+import torch
+import numpy as np
+from loguru import logger
+
+from body_models import (
+    build_body_model,
+    forward_body_model_batch,
+    load_saved_params,
+    split_saved_params,
+)
+from motion_store import open_sequence
+from sequence import slice_sequence, z_up_to_y_up
+
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON = 0x4E4F534A
+GLB_BIN = 0x004E4942
+GL_FLOAT = 5126
+GL_UNSIGNED_INT = 5125
+GL_ARRAY_BUFFER = 34962
+GL_ELEMENT_ARRAY_BUFFER = 34963
+
+
+def compute_vertex_normals(verts, faces):
+    v0, v1, v2 = verts[faces[:, 0]], verts[faces[:, 1]], verts[faces[:, 2]]
+    face_normals = np.cross(v1 - v0, v2 - v0)
+    normals = np.zeros_like(verts)
+    for i in range(3):
+        np.add.at(normals, faces[:, i], face_normals)
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.maximum(norm, 1e-12)
+
+
+def write_mesh(path, verts, faces):
+    # Single posed body, .obj / .ply through Open3D, .glb with our writer
+    if path.endswith('.glb'):
+        writer = GlbMorphWriter(path, faces, verts)
+        writer.close()
+        return
+    import open3d as o3d
+    from body_models import build_body_mesh
+    o3d.io.write_triangle_mesh(path, build_body_mesh(verts, faces))
+
+
+class GlbMorphWriter:
+    # One glTF mesh with the body topology and every exported frame as a
+    # morph target (per-vertex offsets from the first frame). Faces are
+    # written once; the target offsets are streamed to a temporary file while
+    # their bounds are tracked, and the .glb is assembled on close.
+    def __init__(self, path, faces, base_verts):
+        self.path = path
+        self.faces = np.asarray(faces, dtype=np.uint32)
+        self.base = np.asarray(base_verts, dtype=np.float32)
+        self.tmp = tempfile.TemporaryFile()
+        self.target_bounds = []
+
+    def add_frames(self, verts, joints=None):
+        for v in np.asarray(verts, dtype=np.float32):
+            delta = v - self.base
+            self.tmp.write(delta.tobytes())
+            self.target_bounds.append((delta.min(0).tolist(), delta.max(0).tolist()))
+
+    def close(self):
+        n_verts = len(self.base)
+        indices = self.faces.reshape(-1).tobytes()
+        positions = self.base.tobytes()
+        normals = compute_vertex_normals(self.base, self.faces.astype(np.int64)).astype(np.float32).tobytes()
+        target_nbytes = n_verts * 3 * 4
+
+        buffer_views, accessors = [], []
+        offset = 0
+
+        def add_view(nbytes, target):
+            nonlocal offset
+            buffer_views.append({'buffer': 0, 'byteOffset': offset, 'byteLength': nbytes, 'target': target})
+            offset += nbytes
+            return len(buffer_views) - 1
+
+        accessors.append({'bufferView': add_view(len(indices), GL_ELEMENT_ARRAY_BUFFER),
+                          'componentType': GL_UNSIGNED_INT, 'count': self.faces.size, 'type': 'SCALAR'})
+        accessors.append({'bufferView': add_view(len(positions), GL_ARRAY_BUFFER),
+                          'componentType': GL_FLOAT, 'count': n_verts, 'type': 'VEC3',
+                          'min': self.base.min(0).tolist(), 'max': self.base.max(0).tolist()})
+        accessors.append({'bufferView': add_view(len(normals), GL_ARRAY_BUFFER),
+                          'componentType': GL_FLOAT, 'count': n_verts, 'type': 'VEC3'})
+        targets = []
+        for lo, hi in self.target_bounds:
+            accessors.append({'bufferView': add_view(target_nbytes, GL_ARRAY_BUFFER),
+                              'componentType': GL_FLOAT, 'count': n_verts, 'type': 'VEC3',
+                              'min': lo, 'max': hi})
+            targets.append({'POSITION': len(accessors) - 1})
+
+        primitive = {'attributes': {'POSITION': 1, 'NORMAL': 2}, 'indices': 0}
+        mesh = {'primitives': [primitive]}
+        if targets:
+            primitive['targets'] = targets
+            mesh['weights'] = [0.0] * len(targets)
+            mesh['extras'] = {'targetNames': [f'frame_{i:06d}' for i in range(len(targets))]}
+        gltf = {
+            'asset': {'version': '2.0', 'generator': 'body-model-visualizer'},
+            'scene': 0,
+            'scenes': [{'nodes': [0]}],
+            'nodes': [{'mesh': 0}],
+            'meshes': [mesh],
+            'buffers': [{'byteLength': offset}],
+            'bufferViews': buffer_views,
+            'accessors': accessors,
+        }
+        json_bytes = json.dumps(gltf).encode()
+        json_bytes += b' ' * (-len(json_bytes) % 4)
+        bin_pad = -offset % 4
+        total = 12 + 8 + len(json_bytes) + 8 + offset + bin_pad
+
+        self.tmp.seek(0)
+        with open(self.path, 'wb') as f:
+            f.write(struct.pack('<III', GLB_MAGIC, 2, total))
+            f.write(struct.pack('<II', len(json_bytes), GLB_JSON))
+            f.write(json_bytes)
+            f.write(struct.pack('<II', offset + bin_pad, GLB_BIN))
+            f.write(indices)
+            f.write(positions)
+            f.write(normals)
+            while True:
+                block = self.tmp.read(1 << 24)
+                if not block:
+                    break
+                f.write(block)
+            f.write(b'\0' * bin_pad)
+        self.tmp.close()
+
+
+class NpyFrameWriter:
+    # faces.npy is written once, per-frame vertices (and joints) go into
+    # memory-mapped (n_frames, V, 3) float32 .npy files as they are produced.
+    def __init__(self, output_dir, faces, n_frames, n_verts, n_joints=None):
+        os.makedirs(output_dir, exist_ok=True)
+        np.save(os.path.join(output_dir, 'faces.npy'), np.asarray(faces, dtype=np.int32))
+        self.verts = np.lib.format.open_memmap(
+            os.path.join(output_dir, 'vertices.npy'), mode='w+',
+            dtype=np.float32, shape=(n_frames, n_verts, 3))
+        self.joints = None
+        if n_joints is not None:
+            self.joints = np.lib.format.open_memmap(
+                os.path.join(output_dir, 'joints.npy'), mode='w+',
+                dtype=np.float32, shape=(n_frames, n_joints, 3))
+        self.pos = 0
+
+    def add_frames(self, verts, joints=None):
+        n = len(verts)
+        self.verts[self.pos:self.pos + n] = verts
+        if self.joints is not None and joints is not None:
+            self.joints[self.pos:self.pos + n] = joints
+        self.pos += n
+
+    def close(self):
+        self.verts.flush()
+        if self.joints is not None:
+            self.joints.flush()
+
+
+def get_writer(output, faces, first_verts, n_frames, n_joints):
+    if output.endswith('.glb'):
+        return GlbMorphWriter(output, faces, first_verts)
+    return NpyFrameWriter(output, faces, n_frames, len(first_verts), n_joints)
+
+
+def iter_param_batches(paths, batch_size):
+    # Saved params stacked into batches; they must share model and gender
+    expected = None
+    for start in range(0, len(paths), batch_size):
+        batch_paths = paths[start:start + batch_size]
+        batch = [load_saved_params(p) for p in batch_paths]
+        betas, expression, pose_params = [], [], []
+        for path, params in zip(batch_paths, batch):
+            key = (params['body_model'].upper(), params['gender'].lower())
+            if expected is None:
+                expected = key
+            elif key != expected:
+                raise ValueError(f'{path} is a {key[0]} {key[1]} model, expected {expected[0]} {expected[1]} '
+                                 f'like {paths[0]}')
+            b, e, p = split_saved_params(params)
+            betas.append(b.reshape(1, -1).float())
+            expression.append(e.reshape(1, -1).float())
+            pose_params.append(p)
+        yield (
+            batch[0],
+            torch.cat(betas),
+            torch.cat(expression),
+            {k: torch.cat([p[k].reshape(1, -1, 3).float() for p in pose_params]) for k in pose_params[0]},
+        )
+
+
+def export_params(paths, output, batch_size=64):
+    if not paths:
+        raise ValueError('No params files to export')
+    writer, model, key = None, None, None
+    for first, betas, expression, pose_params in iter_param_batches(paths, batch_size):
+        if model is None:
+            key = (first['body_model'], first['gender'])
+            model = build_body_model(*key)
+        verts, joints = forward_body_model_batch(model, betas, expression, pose_params)
+        if writer is None:
+            writer = get_writer(output, model.faces, verts[0], len(paths), joints.shape[1])
+        writer.add_frames(verts, joints)
+    writer.close()
+
+
+def export_sequence(seq, model, output, batch_size=256, stride=1, z_up=True):
+    frames = range(0, seq['n_frames'], stride)
+    if not frames:
+        raise ValueError('The sequence has no frames to export')
+    writer = None
+    for start in range(0, seq['n_frames'], batch_size * stride):
+        end = min(start + batch_size * stride, seq['n_frames'])
+        pose_params, transl = slice_sequence(seq, start, end)
+        pose_params = {k: v[::stride] for k, v in pose_params.items()}
+        verts, joints = forward_body_model_batch(
+            model, seq['betas'], torch.zeros(1, 10), pose_params, transl[::stride])
+        if z_up:
+            verts, joints = z_up_to_y_up(verts), z_up_to_y_up(joints)
+        if writer is None:
+            writer = get_writer(output, model.faces, verts[0], len(frames), joints.shape[1])
+        writer.add_frames(verts, joints)
+    writer.close()
+
+
+def main(args):
+    if args.mode == 'params':
+        export_params(args.input, args.output, batch_size=args.batch_size)
+    else:
+        clip = int(args.clip) if args.clip.isdigit() else args.clip
+        seq = open_sequence(args.input[0], args.body_model, clip=clip)
+        model = build_body_model(args.body_model, args.gender or seq['gender'])
+        export_sequence(seq, model, args.output, batch_size=args.batch_size,
+                        stride=args.stride, z_up=not args.y_up)
+    logger.info(f'Saved {args.output}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export posed body meshes sharing a single topology')
+    parser.add_argument('mode', choices=['params', 'sequence'])
+    parser.add_argument('input', nargs='+', help='Saved params files (params) or one sequence / motion store (sequence)')
+    parser.add_argument('--output', required=True,
+                        help='.glb for one mesh with a morph target per frame, otherwise a directory '
+                             'with faces.npy and (n_frames, V, 3) vertices.npy / joints.npy')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--clip', default='0', help='Clip name or index when reading from a motion store')
+    parser.add_argument('--body-model', default='SMPL', choices=['SMPL', 'SMPLX'])
+    parser.add_argument('--gender', default=None)
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--y-up', action='store_true', help='Sequence is already y-up')
+
+    args = parser.parse_args()
+    sys.exit(main(args))
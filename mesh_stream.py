@@ -0,0 +1,175 @@
+# Mesh streaming for remote viewers that render locally.
+#
+# Every message on the TCP stream is: uint8 type, uint32 length, then
+# `length` bytes of zlib-compressed `server.encode_arrays` data.
+#
+#   TOPOLOGY  faces (int32), sent once per model and to every new client
+#   KEYFRAME  vertices/joints quantized to int32 multiples of `step` meters
+#   DELTA     difference to the previous frame's quantized values, int16 when
+#             it fits (the usual case for slider edits and playback)
+import zlib
+import socket
+import struct
+import threading
+import numpy as np
+from loguru import logger
+
+from server import encode_arrays, decode_arrays
+
+TOPOLOGY, KEYFRAME, DELTA = 0, 1, 2
+DEFAULT_STEP = 1e-4  # 0.1 mm
+
+
+def pack_message(kind, arrays, level=1):
+    data = zlib.compress(encode_arrays(arrays), level)
+    return struct.pack('<BI', kind, len(data)) + data
+
+
+def unpack_message(data):
+    kind, length = struct.unpack('<BI', data[:5])
+    return kind, decode_arrays(zlib.decompress(data[5:5 + length]))
+
+
+class MeshStreamEncoder:
+    def __init__(self, step=DEFAULT_STEP, keyframe_every=300):
+        self.step = step
+        self.keyframe_every = keyframe_every
+        self.model_key = None
+        self.faces = None
+        self.last = None
+        self.n_since_keyframe = 0
+
+    def quantize(self, arrays):
+        return {k: np.round(v / self.step).astype(np.int32) for k, v in arrays.items()}
+
+    def set_topology(self, model_key, faces):
+        # returns the topology message, or None if the model did not change
+        if model_key == self.model_key:
+            return None
+        self.model_key = model_key
+        self.faces = np.asarray(faces, dtype=np.int32)
+        self.last = None
+        return self.topology_message()
+
+    def topology_message(self):
+        return pack_message(TOPOLOGY, {'faces': self.faces})
+
+    def keyframe_message(self):
+        arrays = dict(self.last)
+        arrays['step'] = np.array([self.step], dtype=np.float64)
+        return pack_message(KEYFRAME, arrays)
+
+    def encode(self, vertices, joints=None):
+        arrays = {'vertices': vertices}
+        if joints is not None:
+            arrays['joints'] = joints
+        q = self.quantize(arrays)
+        last = self.last
+        self.last = q
+        if (last is None or self.n_since_keyframe >= self.keyframe_every
+                or last.keys() != q.keys()
+                or any(last[k].shape != q[k].shape for k in q)):
+            self.n_since_keyframe = 0
+            return self.keyframe_message()
+
+        self.n_since_keyframe += 1
+        deltas = {}
+        for k, v in q.items():
+            d = v - last[k]
+            fits = np.abs(d).max(initial=0) < np.iinfo(np.int16).max
+            deltas[k] = d.astype(np.int16) if fits else d
+        return pack_message(DELTA, deltas)
+
+
+class MeshStreamDecoder:
+    def __init__(self):
+        self.faces = None
+        self.step = None
+        self.current = None
+
+    def decode(self, data):
+        # returns float32 arrays of the current frame, or None for topology
+        kind, arrays = unpack_message(data)
+        if kind == TOPOLOGY:
+            self.faces = arrays['faces']
+            self.current = None
+            return None
+        if kind == KEYFRAME:
+            self.step = float(arrays.pop('step')[0])
+            self.current = {k: v.astype(np.int32) for k, v in arrays.items()}
+        else:
+            self.current = {k: self.current[k] + v for k, v in arrays.items()}
+        return {k: (v * self.step).astype(np.float32) for k, v in self.current.items()}
+
+
+def read_message(sock):
+    header = _recv_exact(sock, 5)
+    if header is None:
+        return None
+    _, length = struct.unpack('<BI', header)
+    body = _recv_exact(sock, length)
+    return None if body is None else header + body
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class MeshStreamServer:
+    # Broadcasts encoded frames to every connected client. Clients joining
+    # mid-stream first receive the topology and a keyframe of the last frame.
+    def __init__(self, host='127.0.0.1', port=8001, step=DEFAULT_STEP):
+        self.encoder = MeshStreamEncoder(step)
+        self.clients = []
+        self.lock = threading.Lock()
+        self.sock = socket.create_server((host, port))
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.thread.start()
+        logger.info(f'Streaming meshes on tcp://{host}:{port}')
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # a stalled client is dropped instead of blocking the GUI thread
+            conn.settimeout(1.0)
+            with self.lock:
+                try:
+                    if self.encoder.faces is not None:
+                        conn.sendall(self.encoder.topology_message())
+                    if self.encoder.last is not None:
+                        conn.sendall(self.encoder.keyframe_message())
+                except OSError:
+                    conn.close()
+                    continue
+                self.clients.append(conn)
+            logger.info(f'Mesh stream client connected from {addr[0]}:{addr[1]}')
+
+    def publish(self, model_key, faces, vertices, joints=None):
+        with self.lock:
+            messages = [self.encoder.set_topology(model_key, faces),
+                        self.encoder.encode(vertices, joints)]
+            data = b''.join(m for m in messages if m is not None)
+            for conn in list(self.clients):
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    self.clients.remove(conn)
+                    conn.close()
+        return len(data)
+
+    def close(self):
+        self.sock.close()
+        with self.lock:
+            for conn in self.clients:
+                conn.close()
+            self.clients = []
@@ -0,0 +1,245 @@
+# Chunked on-disk store for large motion libraries
+#
+# A store is a directory with
+#   index.json   clip boundaries, chunk table and field layout
+#   frames.bin   concatenated chunks
+#
+# All clips live in one global frame range. Frames are grouped in chunks of
+# ``chunk_frames`` frames (chunks may span clip boundaries); a chunk holds
+# every field of its frames as float32, one field after the other, and is
+# either stored raw or zlib compressed. frames.bin is memory mapped: raw
+# chunks are read in place, compressed chunks are inflated on access and a
+# few of them are kept in an LRU cache, so memory use does not depend on the
+# size of the store.
+import os
+import sys
+import glob
+import json
+import zlib
+import argparse
+import numpy as np
+from loguru import logger
+from collections import OrderedDict
+
+from sequence import make_sequence, get_betas_tensor, load_sequence
+
+
+STORE_VERSION = 1
+INDEX_FILE = 'index.json'
+DATA_FILE = 'frames.bin'
+
+
+class MotionStoreWriter:
+    def __init__(self, root, chunk_frames=4096, codec='zlib', level=3):
+        assert codec in ('zlib', 'none')
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.chunk_frames = chunk_frames
+        self.codec = codec
+        self.level = level
+        self.fields = None
+        self.chunks = []
+        self.clips = []
+        self.n_frames = 0
+        self.pending = []
+        self.n_pending = 0
+        self.data = open(os.path.join(root, DATA_FILE), 'wb')
+
+    def add_clip(self, name, poses, trans, betas=None, fps=30.0, gender='neutral'):
+        fields = {
+            'poses': np.asarray(poses, dtype=np.float32),
+            'trans': np.asarray(trans, dtype=np.float32).reshape(-1, 3),
+        }
+        if self.fields is None:
+            self.fields = {k: list(v.shape[1:]) for k, v in fields.items()}
+        for k, v in fields.items():
+            if list(v.shape[1:]) != self.fields[k]:
+                raise ValueError(f'{name}: {k} has shape {v.shape[1:]}, store expects {self.fields[k]}')
+
+        n = fields['poses'].shape[0]
+        self.clips.append({
+            'name': name,
+            'start': self.n_frames,
+            'end': self.n_frames + n,
+            'fps': float(fps),
+            'gender': gender,
+            'betas': get_betas_tensor(betas)[0].tolist(),
+        })
+        self.n_frames += n
+        self.pending.append(fields)
+        self.n_pending += n
+        while self.n_pending >= self.chunk_frames:
+            self._flush(self.chunk_frames)
+
+    def _flush(self, n):
+        merged = {k: np.concatenate([p[k] for p in self.pending]) for k in self.fields}
+        rest = {k: v[n:] for k, v in merged.items()}
+        self.pending = [rest] if len(rest['poses']) else []
+        self.n_pending = len(rest['poses'])
+
+        payload = b''.join(np.ascontiguousarray(merged[k][:n]).tobytes() for k in self.fields)
+        raw_nbytes = len(payload)
+        if self.codec == 'zlib':
+            payload = zlib.compress(payload, self.level)
+        start = self.chunks[-1]['end'] if self.chunks else 0
+        self.chunks.append({
+            'start': start,
+            'end': start + n,
+            'offset': self.data.tell(),
+            'nbytes': len(payload),
+            'raw_nbytes': raw_nbytes,
+            'codec': self.codec,
+        })
+        self.data.write(payload)
+
+    def close(self):
+        if self.n_pending:
+            self._flush(self.n_pending)
+        self.data.close()
+        index = {
+            'version': STORE_VERSION,
+            'n_frames': self.n_frames,
+            'chunk_frames': self.chunk_frames,
+            'fields': self.fields,
+            'chunks': self.chunks,
+            'clips': self.clips,
+        }
+        with open(os.path.join(self.root, INDEX_FILE), 'w') as f:
+            json.dump(index, f)
+
+
+class MotionStore:
+    def __init__(self, root, cache_chunks=8):
+        with open(os.path.join(root, INDEX_FILE)) as f:
+            index = json.load(f)
+        if index['version'] > STORE_VERSION:
+            raise ValueError(f'{root} has store version {index["version"]}, newest supported is {STORE_VERSION}')
+        self.root = root
+        self.n_frames = index['n_frames']
+        self.fields = index['fields']
+        self.chunks = index['chunks']
+        self.clips = index['clips']
+        self.chunk_starts = np.array([c['start'] for c in self.chunks], dtype=np.int64)
+        self.data = np.memmap(os.path.join(root, DATA_FILE), dtype=np.uint8, mode='r') \
+            if self.chunks else None
+        self.cache_chunks = cache_chunks
+        self.cache = OrderedDict()
+
+    def _decode_chunk(self, idx):
+        if idx in self.cache:
+            self.cache.move_to_end(idx)
+            return self.cache[idx]
+        chunk = self.chunks[idx]
+        buf = self.data[chunk['offset']:chunk['offset'] + chunk['nbytes']]
+        if chunk['codec'] == 'zlib':
+            buf = np.frombuffer(zlib.decompress(buf), dtype=np.uint8)
+        n = chunk['end'] - chunk['start']
+        arrays = {}
+        offset = 0
+        for k, shape in self.fields.items():
+            count = n * int(np.prod(shape))
+            arrays[k] = buf[offset:offset + count * 4].view(np.float32).reshape([n] + shape)
+            offset += count * 4
+        if chunk['codec'] != 'none':
+            # raw chunks are views into the memory map and cost nothing to keep
+            self.cache[idx] = arrays
+            if len(self.cache) > self.cache_chunks:
+                self.cache.popitem(last=False)
+        return arrays
+
+    def read(self, start, end, fields=None):
+        # Returns {field: (end - start, ...) array} for a global frame range
+        fields = fields or list(self.fields.keys())
+        first = int(np.searchsorted(self.chunk_starts, start, side='right')) - 1
+        out = {k: [] for k in fields}
+        idx = first
+        while idx < len(self.chunks) and self.chunks[idx]['start'] < end:
+            chunk = self.chunks[idx]
+            arrays = self._decode_chunk(idx)
+            lo = max(start, chunk['start']) - chunk['start']
+            hi = min(end, chunk['end']) - chunk['start']
+            for k in fields:
+                out[k].append(arrays[k][lo:hi])
+            idx += 1
+        return {k: v[0] if len(v) == 1 else np.concatenate(v) for k, v in out.items()}
+
+    def get_clip(self, clip):
+        if isinstance(clip, int):
+            return self.clips[clip]
+        for c in self.clips:
+            if c['name'] == clip:
+                return c
+        raise KeyError(f'No clip named {clip} in {self.root}')
+
+    def get_sequence(self, clip, body_model='SMPL'):
+        # Sequence that streams the frames of ``clip`` from the store, usable
+        # wherever a sequence from sequence.load_sequence is
+        c = self.get_clip(clip)
+
+        def reader(start, end):
+            frames = self.read(c['start'] + start, c['start'] + min(end, c['end'] - c['start']))
+            return frames['poses'], frames['trans']
+
+        return make_sequence(
+            reader, c['end'] - c['start'], body_model,
+            betas=get_betas_tensor(c['betas']), fps=c['fps'], gender=c['gender'],
+        )
+
+    def iter_batches(self, start=0, end=None, batch_size=1024):
+        end = self.n_frames if end is None else end
+        for s in range(start, end, batch_size):
+            yield s, self.read(s, min(s + batch_size, end))
+
+
+def open_sequence(path, body_model='SMPL', clip=0):
+    # ``path`` is an npz file, a store directory or its index.json
+    if os.path.basename(path) == INDEX_FILE:
+        path = os.path.dirname(path)
+    if os.path.isdir(path):
+        return MotionStore(path).get_sequence(clip, body_model)
+    return load_sequence(path, body_model)
+
+
+def build_store(root, inputs, chunk_frames=4096, codec='zlib'):
+    writer = MotionStoreWriter(root, chunk_frames=chunk_frames, codec=codec)
+    for path in inputs:
+        data = np.load(path)
+        n = data['poses'].shape[0]
+        seq = load_sequence(path)
+        writer.add_clip(
+            os.path.splitext(os.path.relpath(path))[0],
+            data['poses'],
+            data['trans'] if 'trans' in data else np.zeros((n, 3)),
+            betas=data['betas'] if 'betas' in data else None,
+            fps=seq['fps'], gender=seq['gender'],
+        )
+    writer.close()
+    logger.info(f'Wrote {len(writer.clips)} clips, {writer.n_frames} frames in {len(writer.chunks)} chunks to {root}')
+
+
+def main(args):
+    if args.command == 'build':
+        inputs = []
+        for path in args.input:
+            if os.path.isdir(path):
+                inputs += sorted(glob.glob(os.path.join(path, '**', '*.npz'), recursive=True))
+            else:
+                inputs.append(path)
+        build_store(args.store, inputs, chunk_frames=args.chunk_frames, codec=args.codec)
+    else:
+        store = MotionStore(args.store)
+        size = os.path.getsize(os.path.join(args.store, DATA_FILE))
+        print(f'{len(store.clips)} clips, {store.n_frames} frames, {len(store.chunks)} chunks, '
+              f'{size / 1024 ** 2:.1f} MB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or inspect a chunked motion store')
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('store', help='Store directory')
+    parser.add_argument('input', nargs='*', help='AMASS-style npz files or directories (build)')
+    parser.add_argument('--chunk-frames', type=int, default=4096)
+    parser.add_argument('--codec', default='zlib', choices=['zlib', 'none'])
+
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,102 @@
+import os
+import json
+import argparse
+import numpy as np
+from loguru import logger
+
+from settings import Settings
+from offscreen import OffscreenBodyRenderer, write_image
+from body_models import load_saved_params
+
+
+# Rig files are json:
+# {
+#     "width": 1024, "height": 1024,
+#     "cameras": [
+#         {"name": "cam00",
+#          "K": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]],
+#          "R": [[...], [...], [...]],      # world-to-camera rotation
+#          "t": [tx, ty, tz]},              # world-to-camera translation
+#         ...
+#     ]
+# }
+# Extrinsics follow the OpenCV convention (x right, y down, z forward).
+
+
+def load_rig(path):
+    with open(path) as f:
+        rig = json.load(f)
+    cameras = []
+    for idx, cam in enumerate(rig['cameras']):
+        extrinsic = np.eye(4)
+        extrinsic[:3, :3] = np.asarray(cam['R'], dtype=np.float64)
+        extrinsic[:3, 3] = np.asarray(cam['t'], dtype=np.float64).reshape(3)
+        cameras.append({
+            'name': cam.get('name', f'cam{idx:02d}'),
+            'K': np.asarray(cam['K'], dtype=np.float64),
+            'extrinsic': extrinsic,
+        })
+    return {'width': int(rig['width']), 'height': int(rig['height']), 'cameras': cameras}
+
+
+def project_points(points, K, extrinsic):
+    # Returns (N, 2) pixel coordinates and (N,) camera-space depths
+    points_cam = points @ extrinsic[:3, :3].T + extrinsic[:3, 3]
+    depth = points_cam[:, 2]
+    uv = points_cam @ K.T
+    uv = uv[:, :2] / uv[:, 2:3]
+    return uv, depth
+
+
+def render_rig(renderer, rig, output_dir, prefix):
+    # The body, materials and lights stay in the scene; only the camera
+    # changes between views.
+    joints = renderer.joints
+    joints_2d, joints_depth = [], []
+    for cam in rig['cameras']:
+        renderer.set_camera_matrices(cam['K'], cam['extrinsic'])
+        write_image(os.path.join(output_dir, f'{prefix}_{cam["name"]}.png'), renderer.render())
+        depth = renderer.render_depth(z_in_view_space=True).astype(np.float32)
+        np.save(os.path.join(output_dir, f'{prefix}_{cam["name"]}_depth.npy'), depth)
+
+        uv, z = project_points(joints, cam['K'], cam['extrinsic'])
+        joints_2d.append(uv)
+        joints_depth.append(z)
+
+    np.savez(
+        os.path.join(output_dir, f'{prefix}_joints.npz'),
+        camera_names=np.array([cam['name'] for cam in rig['cameras']]),
+        joints_2d=np.stack(joints_2d).astype(np.float32),
+        joints_depth=np.stack(joints_depth).astype(np.float32),
+        joints_3d=joints.astype(np.float32),
+    )
+
+
+def main(args):
+    rig = load_rig(args.rig)
+    renderer = OffscreenBodyRenderer(
+        width=rig['width'], height=rig['height'],
+        material=args.material, lighting=args.lighting,
+        show_ground=not args.no_ground,
+    )
+    os.makedirs(args.output, exist_ok=True)
+    for path in args.input:
+        renderer.set_body(load_saved_params(path))
+        prefix = os.path.splitext(os.path.basename(path))[0]
+        render_rig(renderer, rig, args.output, prefix)
+        logger.info(f'Rendered {len(rig["cameras"])} views of {path}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render every camera of a rig for saved model params')
+    parser.add_argument('rig', help='Rig json with per camera K, R, t')
+    parser.add_argument('input', nargs='+', help='Saved model params files')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--material', default=Settings.DEFAULT_MATERIAL_NAME,
+                        choices=sorted(Settings.PREFAB.keys()))
+    parser.add_argument('--lighting', default=Settings.DEFAULT_PROFILE_NAME,
+                        choices=sorted(Settings.LIGHTING_PROFILES.keys()))
+    parser.add_argument('--no-ground', action='store_true', help='Do not draw the ground plane')
+
+    args = parser.parse_args()
+    main(args)
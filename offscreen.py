@@ -0,0 +1,128 @@
+import numpy as np
+import open3d as o3d
+import open3d.visualization.rendering as rendering
+
+from settings import Settings
+from render_cache import get_render_key, get_material_state, get_lighting_state
+from body_models import (
+    build_body_model,
+    build_body_mesh,
+    forward_body_model,
+    get_model_key,
+    split_saved_params,
+)
+
+
+class OffscreenBodyRenderer:
+    # Headless counterpart of the GUI scene. The renderer, the materials and
+    # the loaded body models are kept alive between renders so that many
+    # images can be produced from one instance.
+    def __init__(self, width=1024, height=1024,
+                 material=Settings.DEFAULT_MATERIAL_NAME,
+                 lighting=Settings.DEFAULT_PROFILE_NAME,
+                 shader=Settings.LIT, bg_color=(1.0, 1.0, 1.0, 1.0),
+                 show_ground=True):
+        self.width = width
+        self.height = height
+        self.renderer = rendering.OffscreenRenderer(width, height)
+        self.scene = self.renderer.scene
+
+        self.settings = Settings()
+        self.settings.set_material(shader)
+        if shader == Settings.LIT:
+            self.settings.apply_material_prefab(material)
+        self.settings.apply_lighting_profile(lighting)
+        self.material_name = material
+        self.lighting_name = lighting
+        self.bg_color = list(bg_color)
+        self.show_ground = show_ground
+
+        self.models = {}
+        self.mesh = None
+        self.joints = None
+        self._apply_settings()
+
+    def _apply_settings(self):
+        self.scene.set_background(self.bg_color)
+        self.scene.show_axes(False)
+        self.scene.show_ground_plane(self.show_ground, rendering.Scene.GroundPlane(0))
+        self.scene.scene.enable_indirect_light(self.settings.use_ibl)
+        self.scene.scene.set_indirect_light_intensity(self.settings.ibl_intensity)
+        sun_color = [
+            self.settings.sun_color.red, self.settings.sun_color.green,
+            self.settings.sun_color.blue
+        ]
+        self.scene.scene.set_sun_light(self.settings.sun_dir, sun_color,
+                                       self.settings.sun_intensity)
+        self.scene.scene.enable_sun_light(self.settings.use_sun)
+
+    def get_model(self, body_model, gender):
+        key = get_model_key(body_model, gender)
+        if key not in self.models:
+            self.models[key] = build_body_model(body_model, gender)
+        return self.models[key]
+
+    def set_body(self, params):
+        # params is a dict in the "Save Model Params" layout
+        model = self.get_model(params['body_model'], params['gender'])
+        betas, expression, pose_params = split_saved_params(params)
+        verts, joints, _ = forward_body_model(model, betas, expression, pose_params)
+        self.set_mesh(build_body_mesh(verts, model.faces), joints)
+        return verts, joints
+
+    def set_mesh(self, mesh, joints=None):
+        if self.scene.has_geometry("__body_model__"):
+            self.scene.remove_geometry("__body_model__")
+        self.scene.add_geometry("__body_model__", mesh, self.settings.material)
+        self.mesh = mesh
+        self.joints = joints
+
+    def setup_camera(self, fov=60.0):
+        bounds = self.mesh.get_axis_aligned_bounding_box()
+        self.renderer.setup_camera(fov, bounds, bounds.get_center())
+
+    def look_at(self, center, eye, up=(0.0, 1.0, 0.0), fov=60.0):
+        self.renderer.setup_camera(fov, np.asarray(center, dtype=np.float32),
+                                   np.asarray(eye, dtype=np.float32),
+                                   np.asarray(up, dtype=np.float32))
+
+    def set_camera_matrices(self, K, extrinsic):
+        # K is the 3x3 pinhole intrinsic matrix, extrinsic the 4x4
+        # world-to-camera transform in the OpenCV convention
+        self.renderer.setup_camera(np.asarray(K, dtype=np.float64),
+                                   np.asarray(extrinsic, dtype=np.float64),
+                                   self.width, self.height)
+
+    def get_render_key(self, params, camera='auto-60', ext='.png'):
+        # Hash of every input of the rendered image. The default camera is
+        # a function of the body, so it is identified by name only.
+        betas, expression, pose_params = split_saved_params(params)
+        return get_render_key(
+            body_model=params['body_model'],
+            gender=params['gender'],
+            betas=betas,
+            expression=expression,
+            pose=pose_params,
+            camera=camera,
+            material=get_material_state(self.settings.material),
+            # no IBL map is loaded, the renderer default is used
+            lighting=get_lighting_state(self.settings, None),
+            scene={'bg_color': self.bg_color, 'show_ground': self.show_ground},
+            resolution=(self.width, self.height),
+            format=ext,
+        )
+
+    def render(self):
+        return np.asarray(self.renderer.render_to_image())
+
+    def render_depth(self, z_in_view_space=False):
+        # z_in_view_space gives metric depth along the camera axis (inf on the
+        # background) instead of the normalized [0, 1] buffer
+        return np.asarray(self.renderer.render_to_depth_image(z_in_view_space=z_in_view_space))
+
+
+def write_image(path, image):
+    quality = 9  # png
+    if path.endswith(".jpg"):
+        quality = 100
+    o3d.io.write_image(path, o3d.geometry.Image(np.ascontiguousarray(image)), quality)
@@ -0,0 +1,168 @@
+# Compact binary format for saved body model parameters (.bmvp)
+#
+# Layout (all integers little endian):
+#   bytes 0-3     magic b'BMVP'
+#   bytes 4-5     uint16 schema version
+#   bytes 6-9     uint32 header length N
+#   bytes 10-N+9  utf-8 json header
+#   ...           raw C-ordered arrays, every one starting at a 64 byte boundary
+#
+# The json header holds the metadata (body_model, gender) and, for every
+# array, its dtype, shape and absolute byte offset:
+#   {"schema_version": 1, "body_model": "SMPL", "gender": "neutral",
+#    "arrays": {"betas": {"dtype": "<f4", "shape": [10], "offset": 256}, ...}}
+#
+# Arrays are betas (10,), expression (10,), joints (J, 3) and one (N, 3) array
+# per pose group (body_pose, global_orient, ...), all float32. Since the
+# header has every offset, files can be memory mapped and any array read
+# without touching the others, and browsing many files only reads headers.
+import os
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+from loguru import logger
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAGIC = b'BMVP'
+SCHEMA_VERSION = 1
+EXTENSION = '.bmvp'
+ALIGNMENT = 64
+PREFIX = struct.Struct('<4sHI')
+
+META_KEYS = ('body_model', 'gender')
+
+_WRITER = None
+
+
+def _to_numpy(value):
+    if hasattr(value, 'detach'):  # torch tensor
+        value = value.detach().cpu().numpy()
+    return np.asarray(value, dtype=np.float32)
+
+
+def snapshot_params(params):
+    # Copies every array so the result can be written from another thread
+    # while the caller keeps editing its tensors
+    arrays = {}
+    meta = {}
+    for k, v in params.items():
+        if k in META_KEYS:
+            meta[k] = str(v)
+        elif v is not None:
+            arrays[k] = np.array(_to_numpy(v), copy=True)
+    # pose groups are saved without their batch dimension
+    for k, v in arrays.items():
+        if v.ndim > 1 and v.shape[0] == 1:
+            arrays[k] = v[0]
+    return meta, arrays
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_params(path, params):
+    meta, arrays = snapshot_params(params)
+    _write(path, meta, arrays)
+
+
+def _write(path, meta, arrays):
+    # Offsets depend on the header length and vice versa, so reserve the
+    # header size first with placeholder offsets, then fill them in.
+    header = dict(schema_version=SCHEMA_VERSION, **meta)
+    header['arrays'] = {
+        k: {'dtype': v.dtype.str, 'shape': list(v.shape), 'offset': 0}
+        for k, v in arrays.items()
+    }
+    header_len = len(json.dumps(header).encode()) + 16 * len(arrays) + 64
+    offset = _align(PREFIX.size + header_len)
+    for k, v in arrays.items():
+        header['arrays'][k]['offset'] = offset
+        offset = _align(offset + v.nbytes)
+    header_bytes = json.dumps(header).encode().ljust(header_len)
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, SCHEMA_VERSION, header_len))
+        f.write(header_bytes)
+        for k, v in arrays.items():
+            f.seek(header['arrays'][k]['offset'])
+            f.write(np.ascontiguousarray(v).tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+
+
+def save_params_async(path, params):
+    # Arrays are copied on the calling thread, the disk write happens on a
+    # background thread. Returns a Future.
+    global _WRITER
+    if _WRITER is None:
+        _WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix='param_io')
+    meta, arrays = snapshot_params(params)
+    return _WRITER.submit(_write, path, meta, arrays)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        magic, version, header_len = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a {EXTENSION} file')
+        if version > SCHEMA_VERSION:
+            raise ValueError(f'{path} has schema version {version}, newest supported is {SCHEMA_VERSION}')
+        return json.loads(f.read(header_len).decode())
+
+
+def load_params(path, keys=None, mmap=True):
+    # Returns the metadata and the requested arrays (all of them by default).
+    # With mmap the arrays are read-only views into the file.
+    header = read_header(path)
+    params = {k: header[k] for k in META_KEYS if k in header}
+    for k, info in header['arrays'].items():
+        if keys is not None and k not in keys:
+            continue
+        shape = tuple(info['shape'])
+        if mmap:
+            params[k] = np.memmap(path, dtype=info['dtype'], mode='r',
+                                  offset=info['offset'], shape=shape)
+        else:
+            with open(path, 'rb') as f:
+                f.seek(info['offset'])
+                count = int(np.prod(shape))
+                params[k] = np.fromfile(f, dtype=info['dtype'], count=count).reshape(shape)
+    return params
+
+
+def convert_joblib(src, dst=None):
+    import joblib
+    if dst is None:
+        dst = os.path.splitext(src)[0] + EXTENSION
+    save_params(dst, joblib.load(src))
+    return dst
+
+
+def main(args):
+    files = []
+    for path in args.input:
+        if os.path.isdir(path):
+            files += [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.pkl')]
+        else:
+            files.append(path)
+    for src in files:
+        dst = None
+        if args.output is not None:
+            os.makedirs(args.output, exist_ok=True)
+            dst = os.path.join(args.output, os.path.splitext(os.path.basename(src))[0] + EXTENSION)
+        dst = convert_joblib(src, dst)
+        logger.info(f'{src} -> {dst}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=f'Convert joblib model params to {EXTENSION}')
+    parser.add_argument('input', nargs='+', help='joblib files or directories of .pkl files')
+    parser.add_argument('--output', default=None, help='Output directory, next to the inputs by default')
+
+    args = parser.parse_args()
+    sys.exit(main(args))
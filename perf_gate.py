@@ -0,0 +1,165 @@
+# Compares benchmark.py timings against a baseline json and fails on
+# regressions. A stage regresses when its median is slower than the
+# baseline by more than --rel-threshold, by more than --abs-threshold-ms,
+# and by more than --noise-k times the larger of the two MADs (scaled to a
+# standard deviation), so noisy stages need a bigger slowdown to trip.
+import os
+import sys
+import json
+import argparse
+from loguru import logger
+
+from benchmark import get_machine_info, run_benchmark, summarize
+
+MAD_TO_STD = 1.4826
+
+
+def get_key(row):
+    return row['body_model'], row['n_verts'], row['batch_size'], row['stage']
+
+
+def merge_runs(runs):
+    # pools the samples of repeated benchmark runs per stage
+    samples = {}
+    for rows in runs:
+        for row in rows:
+            samples.setdefault(get_key(row), []).extend(row['samples_ms'])
+    merged = []
+    for (body_model, n_verts, batch_size, stage), values in samples.items():
+        row = {'body_model': body_model, 'n_verts': n_verts, 'batch_size': batch_size, 'stage': stage}
+        row.update(summarize(values))
+        merged.append(row)
+    return merged
+
+
+def compare(baseline_rows, current_rows, rel_threshold=0.10, abs_threshold_ms=0.05, noise_k=3.0):
+    baseline = {get_key(r): r for r in baseline_rows}
+    comparisons = []
+    for row in current_rows:
+        key = get_key(row)
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        delta = row['median_ms'] - base['median_ms']
+        noise = noise_k * MAD_TO_STD * max(base['mad_ms'], row['mad_ms'])
+        limit = max(rel_threshold * base['median_ms'], abs_threshold_ms, noise)
+        if delta > limit:
+            verdict = 'regression'
+        elif -delta > limit:
+            verdict = 'improvement'
+        else:
+            verdict = 'unchanged'
+        comparisons.append({
+            'body_model': key[0], 'n_verts': key[1], 'batch_size': key[2], 'stage': key[3],
+            'baseline_ms': base['median_ms'],
+            'current_ms': row['median_ms'],
+            'delta_ms': delta,
+            'ratio': row['median_ms'] / base['median_ms'] if base['median_ms'] > 0 else float('inf'),
+            'limit_ms': limit,
+            'verdict': verdict,
+        })
+    missing = sorted(set(baseline) - {get_key(r) for r in current_rows})
+    return comparisons, missing
+
+
+def print_comparisons(comparisons):
+    print(f'{"model":6s} {"verts":>7s} {"batch":>5s} {"stage":8s} {"base":>9s} {"now":>9s} '
+          f'{"ratio":>6s}  verdict')
+    for c in comparisons:
+        print(f'{c["body_model"]:6s} {c["n_verts"]:7d} {c["batch_size"]:5d} {c["stage"]:8s} '
+              f'{c["baseline_ms"]:9.3f} {c["current_ms"]:9.3f} {c["ratio"]:6.2f}  {c["verdict"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fail when benchmark timings regress against a baseline')
+    parser.add_argument('baseline', help='Baseline json written by benchmark.py or --update-baseline')
+    parser.add_argument('--current', default=None,
+                        help='Compare this benchmark.py json instead of running the benchmark')
+    parser.add_argument('--body-models', nargs='+', default=None,
+                        help='Benchmarked models, defaults to those in the baseline')
+    parser.add_argument('--n-verts', type=int, nargs='+', default=None,
+                        help='Synthetic vertex counts, defaults to those in the baseline')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=None,
+                        help='Forward batch sizes, defaults to those in the baseline')
+    parser.add_argument('--runs', type=int, default=3, help='Benchmark runs whose samples are pooled')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per stage and run')
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help='Only gate these stages, e.g. forward ik joints render')
+    parser.add_argument('--rel-threshold', type=float, default=0.10, help='Allowed relative slowdown')
+    parser.add_argument('--abs-threshold-ms', type=float, default=0.05, help='Allowed absolute slowdown')
+    parser.add_argument('--noise-k', type=float, default=3.0, help='Allowed slowdown in units of noise')
+    parser.add_argument('--report', default=None, help='Write the comparison as json')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Write the current results to the baseline file instead of comparing')
+    parser.add_argument('--window', action='store_true', help='See benchmark.py --window')
+    parser.add_argument('--allow-missing', action='store_true',
+                        help='Pass even when baseline stages were not measured in this run')
+    args = parser.parse_args()
+
+    baseline = {'results': []}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.update_baseline:
+        parser.error(f'{args.baseline} does not exist, create it with --update-baseline')
+    elif args.current is None and not (args.body_models and args.n_verts and args.batch_sizes):
+        parser.error('A new baseline needs --body-models, --n-verts and --batch-sizes')
+
+    if args.current is not None:
+        with open(args.current) as f:
+            current_rows = json.load(f)['results']
+    else:
+        # benchmark exactly the configurations in the baseline
+        rows = baseline['results']
+        body_models = args.body_models or sorted({r['body_model'] for r in rows})
+        n_verts = args.n_verts or sorted({r['n_verts'] for r in rows})
+        batch_sizes = args.batch_sizes or sorted({r['batch_size'] for r in rows})
+        runs = [run_benchmark(body_models, n_verts, batch_sizes, use_window=args.window,
+                              repeat=args.repeat) for _ in range(args.runs)]
+        current_rows = merge_runs(runs)
+    if args.stages is not None:
+        current_rows = [r for r in current_rows if r['stage'] in args.stages]
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': get_machine_info(), 'results': current_rows}, f, indent=2)
+        logger.info(f'Wrote baseline {args.baseline}')
+        sys.exit(0)
+
+    # only the selected part of the baseline has to be measured again. Vertex
+    # counts are not filtered, rows hold the generated count, not the requested one
+    baseline_rows = [
+        r for r in baseline['results']
+        if (args.stages is None or r['stage'] in args.stages)
+        and (args.body_models is None or r['body_model'] in args.body_models)
+        and (args.batch_sizes is None or r['batch_size'] in args.batch_sizes)
+    ]
+    comparisons, missing = compare(baseline_rows, current_rows,
+                                   args.rel_threshold, args.abs_threshold_ms, args.noise_k)
+    print_comparisons(comparisons)
+    regressions = [c for c in comparisons if c['verdict'] == 'regression']
+    # a stage that was not measured (no offscreen renderer, no --window) must
+    # not pass unnoticed
+    failed = bool(regressions) or (bool(missing) and not args.allow_missing)
+    report = {
+        'status': 'fail' if failed else 'pass',
+        'n_regressions': len(regressions),
+        'n_improvements': sum(c['verdict'] == 'improvement' for c in comparisons),
+        'thresholds': {'rel': args.rel_threshold, 'abs_ms': args.abs_threshold_ms, 'noise_k': args.noise_k},
+        'baseline_machine': baseline.get('machine'),
+        'machine': get_machine_info(),
+        'comparisons': comparisons,
+        'missing': [list(k) for k in missing],
+    }
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    for c in regressions:
+        logger.error(f'{c["body_model"]} V={c["n_verts"]} B={c["batch_size"]} {c["stage"]}: '
+                     f'{c["baseline_ms"]:.3f} -> {c["current_ms"]:.3f} ms')
+    log = logger.warning if args.allow_missing else logger.error
+    for key in missing:
+        log(f'{key[0]} V={key[1]} B={key[2]} {key[3]}: in the baseline but not measured')
+    logger.info(f'{report["status"]}: {len(regressions)} regressions in {len(comparisons)} stages, '
+                f'{len(missing)} missing')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,153 @@
+import os
+import time
+import hashlib
+import numpy as np
+from loguru import logger
+
+
+def _update_hash(h, value):
+    # Feeds a nested structure of dicts, lists, scalars, strings, numpy arrays
+    # and torch tensors into ``h`` in a canonical order
+    if isinstance(value, dict):
+        h.update(b'{')
+        for k in sorted(value.keys()):
+            h.update(str(k).encode())
+            _update_hash(h, value[k])
+        h.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        h.update(b'[')
+        for v in value:
+            _update_hash(h, v)
+        h.update(b']')
+    elif hasattr(value, 'detach'):  # torch tensor
+        _update_hash(h, value.detach().cpu().numpy())
+    elif isinstance(value, np.ndarray):
+        # float64 and float32 copies of the same values hash the same
+        arr = value.astype(np.float32) if value.dtype.kind == 'f' else value
+        arr = np.ascontiguousarray(arr)
+        h.update(f'{arr.dtype.str}{arr.shape}'.encode())
+        h.update(arr.tobytes())
+    elif isinstance(value, float):
+        h.update(np.float32(value).tobytes())
+    else:
+        h.update(repr(value).encode())
+
+
+def get_render_key(**state):
+    h = hashlib.sha256()
+    _update_hash(h, state)
+    return h.hexdigest()
+
+
+def get_material_state(material):
+    return {
+        'shader': material.shader,
+        'base_color': list(material.base_color),
+        'metallic': material.base_metallic,
+        'roughness': material.base_roughness,
+        'reflectance': material.base_reflectance,
+        'clearcoat': material.base_clearcoat,
+        'clearcoat_roughness': material.base_clearcoat_roughness,
+        'anisotropy': material.base_anisotropy,
+        'point_size': material.point_size,
+    }
+
+
+def get_lighting_state(settings, ibl_name):
+    return {
+        'ibl': ibl_name,
+        'use_ibl': settings.use_ibl,
+        'use_sun': settings.use_sun,
+        'ibl_intensity': settings.ibl_intensity,
+        'sun_intensity': settings.sun_intensity,
+        'sun_dir': list(settings.sun_dir),
+        'sun_color': [settings.sun_color.red, settings.sun_color.green, settings.sun_color.blue],
+    }
+
+
+class RenderCache:
+    # On-disk, content addressed image cache. Entries are files named by the
+    # hash of everything that affects the rendered pixels. Reading an entry
+    # bumps its mtime, and the oldest entries are evicted once the directory
+    # grows beyond ``max_bytes``. Several processes may share the directory
+    # (batch_render workers), so the directory is re-scanned before evicting
+    # and every ``max_bytes / 16`` written by this process.
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+        self.hits = 0
+        self.misses = 0
+
+    def _scan(self):
+        self.entries = {}
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # evicted by another process
+                continue
+            if os.path.isfile(path):
+                self.entries[name] = (stat.st_size, stat.st_mtime)
+        self.total_bytes = sum(size for size, _ in self.entries.values())
+        self.bytes_since_scan = 0
+
+    def _name(self, key, ext):
+        return f'{key}{ext}'
+
+    def get(self, key, ext='.png'):
+        # Returns the path of the cached file or None
+        name = self._name(key, ext)
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.isfile(path):
+            self.entries.pop(name, None)
+            self.misses += 1
+            return None
+        now = time.time()
+        os.utime(path, (now, now))
+        self.entries[name] = (os.path.getsize(path), now)
+        self.hits += 1
+        return path
+
+    def put_file(self, key, src_path):
+        ext = os.path.splitext(src_path)[1]
+        name = self._name(key, ext)
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = os.path.join(self.cache_dir, f'.{name}.{os.getpid()}.tmp')
+        with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            dst.write(src.read())
+        # atomic, so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        old_size, _ = self.entries.get(name, (0, 0))
+        self.entries[name] = (size, time.time())
+        self.total_bytes += size - old_size
+        self.bytes_since_scan += size
+        self._evict()
+        return path
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes and self.bytes_since_scan < self.max_bytes // 16:
+            return
+        # other processes may have added or removed entries since the last scan
+        self._scan()
+        if self.total_bytes <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self.entries.items(), key=lambda x: x[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            del self.entries[name]
+            self.total_bytes -= size
+        logger.debug(f'Render cache evicted down to {self.total_bytes / 1024 ** 2:.1f} MB')
+
+
+def copy_cached(cached_path, path):
+    with open(cached_path, 'rb') as src, open(path, 'wb') as dst:
+        dst.write(src.read())
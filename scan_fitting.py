@@ -0,0 +1,150 @@
+import time
+import torch
+import numpy as np
+from loguru import logger
+from collections import defaultdict
+from scipy.spatial import cKDTree
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def __call__(self, name):
+        timer = self
+
+        class _Span:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.totals[name] += time.perf_counter() - self.start
+                timer.counts[name] += 1
+
+        return _Span()
+
+    def report(self):
+        lines = [f'{k:<14s} {v * 1000:9.1f} ms total {v * 1000 / self.counts[k]:8.2f} ms/call'
+                 for k, v in sorted(self.totals.items(), key=lambda x: -x[1])]
+        return '\n'.join(lines)
+
+
+def robust_sq(dist_sq, sigma):
+    # Geman-McClure on squared distances, outliers saturate at 1
+    return dist_sq / (dist_sq + sigma ** 2)
+
+
+def get_yaw_hypotheses(n):
+    # global_orient initializations rotated around the vertical axis
+    angles = torch.arange(n, dtype=torch.float32) * (2 * np.pi / n)
+    orient = torch.zeros(n, 3)
+    orient[:, 1] = angles
+    return orient
+
+
+def fit_body_to_scan(model, scan_points, body_model='SMPL', n_hypotheses=4,
+                     n_scan_samples=10000, rigid_iters=30, full_iters=100,
+                     lr=0.02, sigma=0.05, pose_weight=1e-3, betas_weight=1e-3,
+                     init_pose=None, init_betas=None, progress=None):
+    # Registers ``model`` to a scan with bidirectional nearest neighbor
+    # (chamfer) terms under a robust penalty.
+    #   - the scan KD-tree is built once, the body KD-tree once per iteration
+    #   - scan->body uses a fixed random subset of the scan points, body->scan
+    #     uses every body vertex, so the cost does not grow with the scan size
+    #   - ``n_hypotheses`` yaw initializations are optimized together in one
+    #     batched forward pass and the best one is returned
+    # First only global_orient and transl are optimized, then pose and betas.
+    timer = StageTimer()
+    scan_points = np.asarray(scan_points, dtype=np.float32)
+
+    with timer('scan_kdtree'):
+        scan_tree = cKDTree(scan_points)
+    rng = np.random.default_rng(0)
+    sample_idx = rng.choice(len(scan_points), min(n_scan_samples, len(scan_points)), replace=False)
+    scan_sample = torch.from_numpy(scan_points[sample_idx])
+    scan_all = torch.from_numpy(scan_points)
+
+    B = n_hypotheses
+    n_body_joints = model.NUM_BODY_JOINTS
+    body_pose = torch.zeros(B, n_body_joints * 3)
+    if init_pose is not None:
+        body_pose[:] = init_pose.reshape(1, -1)
+    betas = torch.zeros(B, model.num_betas)
+    if init_betas is not None:
+        betas[:] = init_betas.reshape(1, -1)[:, :model.num_betas]
+    global_orient = get_yaw_hypotheses(B)
+    transl = torch.from_numpy(scan_points.mean(0)).reshape(1, 3).repeat(B, 1)
+    extra = {}
+    if body_model == 'SMPLX':
+        # smplx falls back to batch-1 defaults for omitted groups
+        for k in ('left_hand_pose', 'right_hand_pose'):
+            extra[k] = torch.zeros(B, model.NUM_HAND_JOINTS * 3)
+        for k in ('jaw_pose', 'leye_pose', 'reye_pose'):
+            extra[k] = torch.zeros(B, 3)
+        extra['expression'] = torch.zeros(B, model.num_expression_coeffs)
+
+    for p in (body_pose, betas, global_orient, transl):
+        p.requires_grad_(True)
+
+    def forward():
+        with timer('forward'):
+            out = model(betas=betas, body_pose=body_pose, global_orient=global_orient,
+                        transl=transl, **extra)
+        return out.vertices
+
+    def closure_loss(verts):
+        v_np = verts.detach().numpy()
+        with timer('nn_query'):
+            # body -> scan, one query batch for every hypothesis
+            _, b2s_idx = scan_tree.query(v_np.reshape(-1, 3), k=1, workers=-1)
+            b2s_idx = torch.from_numpy(b2s_idx.reshape(B, -1))
+        s2b_idx = []
+        for b in range(B):
+            with timer('body_kdtree'):
+                body_tree = cKDTree(v_np[b])
+            with timer('nn_query'):
+                s2b_idx.append(body_tree.query(scan_sample.numpy(), k=1, workers=-1)[1])
+        s2b_idx = torch.from_numpy(np.stack(s2b_idx))
+
+        with timer('loss'):
+            b2s = ((verts - scan_all[b2s_idx]) ** 2).sum(-1)
+            s2b = ((torch.gather(verts, 1, s2b_idx[..., None].expand(-1, -1, 3)) - scan_sample[None]) ** 2).sum(-1)
+            per_hyp = robust_sq(b2s, sigma).mean(1) + robust_sq(s2b, sigma).mean(1)
+            reg = pose_weight * (body_pose ** 2).sum(1) + betas_weight * (betas ** 2).sum(1)
+        return per_hyp, per_hyp + reg
+
+    stages = [
+        ('rigid', [global_orient, transl], rigid_iters),
+        ('full', [global_orient, transl, body_pose, betas], full_iters),
+    ]
+    n_total = rigid_iters + full_iters
+    it = 0
+    per_hyp = None
+    for stage_name, params, n_iters in stages:
+        optimizer = torch.optim.Adam(params, lr=lr)
+        stage_start = time.perf_counter()
+        for i in range(n_iters):
+            verts = forward()
+            per_hyp, loss = closure_loss(verts)
+            with timer('backward'):
+                optimizer.zero_grad()
+                loss.sum().backward()
+            with timer('step'):
+                optimizer.step()
+            it += 1
+            if progress is not None:
+                progress(stage_name, it / n_total)
+        logger.info(f'Scan fitting stage "{stage_name}" took {time.perf_counter() - stage_start:.2f}s, '
+                    f'best chamfer {per_hyp.min().item():.5f}')
+
+    best = int(torch.argmin(per_hyp))
+    logger.info(f'Scan fitting timings:\n{timer.report()}')
+    return {
+        'body_pose': body_pose[best].detach().reshape(1, -1, 3),
+        'global_orient': global_orient[best].detach().reshape(1, 1, 3),
+        'betas': betas[best].detach().reshape(1, -1),
+        'transl': transl[best].detach().reshape(1, 3),
+        'loss': per_hyp[best].item(),
+        'timings': dict(timer.totals),
+    }
@@ -0,0 +1,91 @@
+import numpy as np
+import open3d as o3d
+from loguru import logger
+
+
+# clouds above this many points are displayed through a voxel LOD level
+MAX_DISPLAY_POINTS = 500000
+N_COARSER_LEVELS = 2
+
+
+def read_geometry(path, progress=lambda stage, value: None):
+    # Reads a triangle mesh or a point cloud. Safe to call off the UI thread,
+    # nothing here touches the scene.
+    progress('reading', 0.0)
+    geometry_type = o3d.io.read_file_geometry_type(path)
+
+    if geometry_type & o3d.io.CONTAINS_TRIANGLES:
+        mesh = o3d.io.read_triangle_mesh(path)
+        if len(mesh.triangles) == 0:
+            logger.warning(f'{path} contains 0 triangles, will read as point cloud')
+        else:
+            progress('normals', 0.5)
+            mesh.compute_vertex_normals()
+            if len(mesh.vertex_colors) == 0:
+                mesh.paint_uniform_color([1, 1, 1])
+            # Make sure the mesh has texture coordinates
+            if not mesh.has_triangle_uvs():
+                mesh.triangle_uvs = o3d.utility.Vector2dVector(np.zeros((3 * len(mesh.triangles), 2)))
+            progress('done', 1.0)
+            return mesh
+    else:
+        logger.info(f'{path} appears to be a point cloud')
+
+    cloud = o3d.io.read_point_cloud(path)
+    if len(cloud.points) == 0:
+        raise IOError(f'Failed to read points from {path}')
+    logger.info(f'Read {len(cloud.points)} points from {path}')
+    progress('done', 1.0)
+    return cloud
+
+
+class PointCloudLOD:
+    # Keeps the full resolution cloud (used for fitting) and a few voxel
+    # downsampled levels for display. Normals are only estimated for a level
+    # once it is displayed.
+    def __init__(self, cloud, max_points=MAX_DISPLAY_POINTS, n_coarser=N_COARSER_LEVELS,
+                 progress=lambda stage, value: None):
+        self.full = cloud
+        self.levels = [cloud]
+        self.voxel_sizes = [0.0]
+        if len(cloud.points) <= max_points:
+            return
+
+        bounds = cloud.get_axis_aligned_bounding_box()
+        diag = np.linalg.norm(bounds.get_extent())
+        # scans are surfaces, so the point count scales with 1 / voxel^2
+        voxel = diag / np.sqrt(max_points)
+        down = cloud.voxel_down_sample(voxel)
+        while len(down.points) > max_points:
+            voxel *= 1.1 * np.sqrt(len(down.points) / max_points)
+            down = cloud.voxel_down_sample(voxel)
+        levels = [(voxel, down)]
+        for i in range(n_coarser):
+            progress('downsampling', (i + 1) / (n_coarser + 1))
+            voxel = voxel * 2
+            levels.append((voxel, cloud.voxel_down_sample(voxel)))
+
+        # coarse to fine, full resolution last
+        for voxel, down in reversed(levels):
+            self.levels.insert(len(self.levels) - 1, down)
+            self.voxel_sizes.insert(len(self.voxel_sizes) - 1, voxel)
+
+    @property
+    def default_level(self):
+        # finest level that is not the full resolution one, if any
+        return max(0, len(self.levels) - 2)
+
+    def get_level(self, idx):
+        cloud = self.levels[idx]
+        if not cloud.has_normals():
+            if self.voxel_sizes[idx] > 0:
+                search = o3d.geometry.KDTreeSearchParamHybrid(radius=3 * self.voxel_sizes[idx], max_nn=30)
+                cloud.estimate_normals(search)
+            else:
+                cloud.estimate_normals()
+        cloud.normalize_normals()
+        return cloud
+
+    def describe(self):
+        return [f'{len(c.points)} points' + (' (full)' if i == len(self.levels) - 1 else '')
+                for i, c in enumerate(self.levels)]
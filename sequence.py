@@ -0,0 +1,249 @@
+import time
+import torch
+import threading
+import numpy as np
+
+from body_models import POSE_PARAM_SHAPES, forward_body_model_batch
+from tracing import traced
+
+
+# AMASS stores a flat axis-angle ``poses`` array, its layout is identified by
+# its width. Slices are (pose group, first column, number of joints).
+POSES_LAYOUTS = {
+    72: [('global_orient', 0, 1), ('body_pose', 3, 23)],                      # SMPL
+    156: [('global_orient', 0, 1), ('body_pose', 3, 21),                      # SMPL-H
+          ('left_hand_pose', 66, 15), ('right_hand_pose', 111, 15)],
+    165: [('global_orient', 0, 1), ('body_pose', 3, 21), ('jaw_pose', 66, 1),  # SMPL-X
+          ('leye_pose', 69, 1), ('reye_pose', 72, 1),
+          ('left_hand_pose', 75, 15), ('right_hand_pose', 120, 15)],
+}
+
+
+def z_up_to_y_up(points):
+    # AMASS is z-up, the viewer is y-up: rotate -90 degrees around x
+    return np.stack([points[..., 0], points[..., 2], -points[..., 1]], axis=-1)
+
+
+def poses_to_pose_params(poses, body_model):
+    # Splits flat (n_frames, D) axis-angle poses into the pose groups of
+    # ``body_model``. Groups missing in the layout stay zero, joints missing
+    # in a group (e.g. SMPL hands from SMPL-H data) are zero padded.
+    n_frames = poses.shape[0]
+    layout = POSES_LAYOUTS.get(poses.shape[1])
+    if layout is None:
+        raise ValueError(f'Unknown poses layout with {poses.shape[1]} values per frame')
+
+    poses = torch.from_numpy(np.array(poses, dtype=np.float32))
+    pose_params = {}
+    for k, n_joints in POSE_PARAM_SHAPES[body_model].items():
+        pose_params[k] = torch.zeros(n_frames, n_joints, 3)
+    for k, start, n_joints in layout:
+        if k not in pose_params:
+            continue
+        n = min(n_joints, pose_params[k].shape[1])
+        pose_params[k][:, :n] = poses[:, start:start + n * 3].reshape(n_frames, n, 3)
+    return pose_params
+
+
+def make_sequence(reader, n_frames, body_model, betas=None, fps=30.0, gender='neutral'):
+    # A sequence only keeps a ``reader(start, end) -> (poses, trans)``
+    # callable, so frames are fetched and split into pose groups on demand
+    # and the sequence itself can be larger than memory.
+    if betas is None:
+        betas = torch.zeros(1, 10)
+    return {
+        'reader': reader,
+        'body_model': body_model,
+        'betas': betas,
+        'fps': fps,
+        'gender': gender,
+        'n_frames': n_frames,
+    }
+
+
+def get_betas_tensor(betas):
+    out = torch.zeros(1, 10)
+    if betas is not None:
+        betas = np.asarray(betas, dtype=np.float32).reshape(-1)[:10]
+        out[0, :len(betas)] = torch.from_numpy(betas)
+    return out
+
+
+def load_sequence(path, body_model='SMPL'):
+    # Reads an AMASS-style npz (poses, trans, betas)
+    data = np.load(path)
+    poses = data['poses'].astype(np.float32)
+    n_frames = poses.shape[0]
+    if poses.shape[1] not in POSES_LAYOUTS:
+        raise ValueError(f'Unknown poses layout with {poses.shape[1]} values per frame in {path}')
+
+    if 'trans' in data:
+        trans = data['trans'].astype(np.float32)
+    else:
+        trans = np.zeros((n_frames, 3), dtype=np.float32)
+
+    fps = 30.0
+    for key in ('mocap_framerate', 'mocap_frame_rate', 'fps'):
+        if key in data:
+            fps = float(data[key])
+            break
+
+    gender = 'neutral'
+    if 'gender' in data:
+        gender = str(data['gender'])
+        if gender.startswith('b\''):  # bytes saved as str
+            gender = gender[2:-1]
+
+    return make_sequence(
+        lambda start, end: (poses[start:end], trans[start:end]),
+        n_frames, body_model,
+        betas=get_betas_tensor(data['betas'] if 'betas' in data else None),
+        fps=fps, gender=gender,
+    )
+
+
+def slice_sequence(seq, start, end):
+    poses, trans = seq['reader'](start, end)
+    pose_params = poses_to_pose_params(poses, seq['body_model'])
+    return pose_params, torch.from_numpy(np.array(trans, dtype=np.float32))
+
+
+class SequencePrefetcher:
+    # A producer thread runs batched forward passes ahead of the consumer into
+    # a fixed-size ring buffer. Frame ``f`` lives in slot ``f % capacity``
+    # and ``slot_frame`` records which frame a slot currently holds, so a
+    # lookup is a single comparison and frames left over from before a seek
+    # are still valid. The producer never overwrites frames at or after the
+    # consumer position.
+    def __init__(self, seq, model, capacity=256, batch_size=32, z_up=True):
+        assert capacity > batch_size
+        self.seq = seq
+        self.model = model
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.z_up = z_up
+        self.n_frames = seq['n_frames']
+        self.faces = model.faces
+
+        verts, joints, _ = self._forward(0, 1)
+        # the whole clip is grounded on its first frame
+        self.ground = np.array([0, -verts[0, :, 1].min(), 0], dtype=np.float32)
+        self.verts = np.zeros((capacity,) + verts.shape[1:], dtype=np.float32)
+        self.joints = np.zeros((capacity,) + joints.shape[1:], dtype=np.float32)
+        self.transl = np.zeros((capacity, 3), dtype=np.float32)
+        self.slot_frame = np.full(capacity, -1, dtype=np.int64)
+
+        self.cond = threading.Condition()
+        self.consumer_pos = 0
+        self.produce_pos = 0
+        self.generation = 0
+        self.lead = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @traced
+    def _forward(self, start, end):
+        pose_params, transl = slice_sequence(self.seq, start, end)
+        verts, joints = forward_body_model_batch(
+            self.model, self.seq['betas'], torch.zeros(1, 10), pose_params, transl,
+        )
+        transl = transl.numpy()
+        if self.z_up:
+            verts, joints = z_up_to_y_up(verts), z_up_to_y_up(joints)
+            transl = z_up_to_y_up(transl)
+        return verts, joints, transl
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and (
+                        self.produce_pos >= self.n_frames or
+                        self.produce_pos - self.consumer_pos > self.capacity - self.batch_size):
+                    self.cond.wait()
+                if not self.running:
+                    return
+                start = self.produce_pos
+                end = min(start + self.batch_size, self.n_frames)
+                generation = self.generation
+
+            verts, joints, transl = self._forward(start, end)
+
+            with self.cond:
+                if generation != self.generation:
+                    # a seek moved the window while this batch was computed
+                    continue
+                slots = np.arange(start, end) % self.capacity
+                self.verts[slots] = verts + self.ground
+                self.joints[slots] = joints + self.ground
+                self.transl[slots] = transl + self.ground
+                self.slot_frame[slots] = np.arange(start, end)
+                self.produce_pos = end
+
+    def get_frame(self, frame):
+        # Returns (verts, joints, transl) copies, or None if the frame is not
+        # ready yet; the caller is expected to drop it rather than wait.
+        # ``transl`` is the translation the frame is displayed with.
+        with self.cond:
+            if frame != self.consumer_pos:
+                self.consumer_pos = frame
+                if self.produce_pos < frame:
+                    # the playhead overtook the producer, frames it would
+                    # compute next are already in the past. Restart ahead of
+                    # the playhead, further each time this happens, so the
+                    # next batch is ready before the clock gets there.
+                    self.lead = min(max(2 * self.lead, self.batch_size),
+                                    self.capacity - self.batch_size)
+                    self.produce_pos = min(frame + self.lead, self.n_frames)
+                    self.generation += 1
+                self.cond.notify()
+            slot = frame % self.capacity
+            if self.slot_frame[slot] != frame:
+                return None
+            return self.verts[slot].copy(), self.joints[slot].copy(), self.transl[slot].copy()
+
+    def seek(self, frame):
+        with self.cond:
+            self.consumer_pos = frame
+            # keep producing from the end of the contiguous run of buffered
+            # frames starting at ``frame``, or refill from scratch
+            pos = frame
+            while pos < self.n_frames and pos < frame + self.capacity and \
+                    self.slot_frame[pos % self.capacity] == pos:
+                pos += 1
+            if pos != self.produce_pos:
+                self.produce_pos = pos
+                self.generation += 1
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+
+class PlaybackClock:
+    # Maps wall-clock time to a frame index, so when rendering falls behind
+    # the next shown frame simply skips ahead instead of stalling.
+    def __init__(self, fps):
+        self.fps = fps
+        self.playing = False
+        self.origin_frame = 0
+        self.origin_time = time.perf_counter()
+
+    def frame(self):
+        if not self.playing:
+            return self.origin_frame
+        return self.origin_frame + int((time.perf_counter() - self.origin_time) * self.fps)
+
+    def play(self):
+        self.origin_time = time.perf_counter()
+        self.playing = True
+
+    def pause(self):
+        self.origin_frame = self.frame()
+        self.playing = False
+
+    def seek(self, frame):
+        self.origin_frame = frame
+        self.origin_time = time.perf_counter()
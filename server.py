@@ -0,0 +1,309 @@
+# Headless parameter -> mesh service
+#
+#   GET  /health                     models loaded, queue stats
+#   GET  /faces?body_model=SMPL      model faces, binary
+#   POST /forward                    vertices and/or joints, binary
+#   POST /render                     PNG of the posed body
+#
+# POST bodies are json in the "Save Model Params" layout, e.g.
+#   {"body_model": "SMPL", "gender": "neutral", "betas": [...10],
+#    "body_pose": [[x, y, z], ...], "global_orient": [[x, y, z]],
+#    "outputs": ["vertices", "joints"]}
+# Missing pose groups, betas and expression default to zeros.
+#
+# Binary responses are: uint32 header length N, N bytes of json header
+# {"arrays": {name: {"dtype", "shape", "offset"}}}, then the raw arrays with
+# offsets relative to the end of the header.
+import os
+import json
+import time
+import queue
+import struct
+import tempfile
+import threading
+import numpy as np
+from loguru import logger
+from concurrent.futures import Future
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import torch
+
+from body_models import (
+    POSE_PARAM_SHAPES,
+    build_body_model,
+    forward_body_model_batch,
+    get_model_key,
+)
+
+
+def encode_arrays(arrays):
+    header = {'arrays': {}}
+    offset = 0
+    blobs = []
+    for k, v in arrays.items():
+        v = np.ascontiguousarray(v)
+        header['arrays'][k] = {'dtype': v.dtype.str, 'shape': list(v.shape), 'offset': offset}
+        blobs.append(v.tobytes())
+        offset += v.nbytes
+    header_bytes = json.dumps(header).encode()
+    return struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(blobs)
+
+
+def decode_arrays(data):
+    (header_len,) = struct.unpack('<I', data[:4])
+    header = json.loads(data[4:4 + header_len].decode())
+    body = memoryview(data)[4 + header_len:]
+    arrays = {}
+    for k, info in header['arrays'].items():
+        count = int(np.prod(info['shape']))
+        arrays[k] = np.frombuffer(body, dtype=info['dtype'], count=count,
+                                  offset=info['offset']).reshape(info['shape'])
+    return arrays
+
+
+# exceptions raised for malformed requests, answered with a 400
+BAD_REQUEST_ERRORS = (ValueError, KeyError, TypeError)
+GENDERS = ('neutral', 'male', 'female')
+
+
+def parse_model(body_model, gender):
+    body_model, gender = str(body_model).upper(), str(gender).lower()
+    if body_model not in POSE_PARAM_SHAPES:
+        raise ValueError(f'Unknown body model {body_model}')
+    if gender not in GENDERS:
+        raise ValueError(f'Unknown gender {gender}')
+    return body_model, gender
+
+
+def parse_params(payload):
+    if not isinstance(payload, dict):
+        raise ValueError('Expected a json object')
+    body_model, gender = parse_model(payload.get('body_model', 'SMPL'), payload.get('gender', 'neutral'))
+
+    def vector(name, n):
+        out = torch.zeros(1, n)
+        if payload.get(name) is not None:
+            values = torch.tensor(payload[name], dtype=torch.float32).reshape(-1)[:n]
+            out[0, :len(values)] = values
+        return out
+
+    pose_params = {}
+    for k, n_joints in POSE_PARAM_SHAPES[body_model].items():
+        pose_params[k] = torch.zeros(1, n_joints, 3)
+        if payload.get(k) is not None:
+            values = torch.tensor(payload[k], dtype=torch.float32)
+            if values.numel() != n_joints * 3:
+                raise ValueError(f'{k} needs {n_joints} x 3 values, got {values.numel()}')
+            pose_params[k][:] = values.reshape(1, n_joints, 3)
+    return body_model, gender, vector('betas', 10), vector('expression', 10), pose_params
+
+
+class MicroBatcher:
+    # Requests for the same model that arrive within ``max_wait`` seconds of
+    # each other are stacked and evaluated in a single forward pass.
+    def __init__(self, model, max_batch=64, max_wait=0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.n_batches = 0
+        self.n_requests = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, betas, expression, pose_params):
+        future = Future()
+        self.queue.put((betas, expression, pose_params, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                verts, joints = forward_body_model_batch(
+                    self.model,
+                    torch.cat([b[0] for b in batch]),
+                    torch.cat([b[1] for b in batch]),
+                    {k: torch.cat([b[2][k] for b in batch]) for k in batch[0][2]},
+                )
+            except Exception as e:
+                for b in batch:
+                    b[3].set_exception(e)
+                continue
+            self.n_batches += 1
+            self.n_requests += len(batch)
+            for i, b in enumerate(batch):
+                b[3].set_result((verts[i], joints[i]))
+
+
+class ModelPool:
+    # Models and their batchers are created once and shared by all requests;
+    # only the model data is shared, each request carries its own parameters.
+    def __init__(self, warm=(), max_batch=64, max_wait=0.005):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.models = {}
+        self.batchers = {}
+        for body_model, gender in warm:
+            self.get_batcher(body_model, gender)
+
+    def get_model(self, body_model, gender):
+        key = get_model_key(body_model, gender)
+        with self.lock:
+            if key not in self.models:
+                self.models[key] = build_body_model(body_model, gender)
+            return self.models[key]
+
+    def get_batcher(self, body_model, gender):
+        key = get_model_key(body_model, gender)
+        model = self.get_model(body_model, gender)
+        with self.lock:
+            if key not in self.batchers:
+                self.batchers[key] = MicroBatcher(model, self.max_batch, self.max_wait)
+            return self.batchers[key]
+
+
+class BodyModelService:
+    def __init__(self, pool, render_size=(512, 512)):
+        self.pool = pool
+        self.render_size = render_size
+        self.renderer = None
+        self.render_lock = threading.Lock()
+
+    def forward(self, payload):
+        body_model, gender, betas, expression, pose_params = parse_params(payload)
+        batcher = self.pool.get_batcher(body_model, gender)
+        return batcher.submit(betas, expression, pose_params).result()
+
+    def render(self, payload):
+        from offscreen import OffscreenBodyRenderer
+        from body_models import build_body_mesh
+        verts, joints = self.forward(payload)
+        model = self.pool.get_model(payload.get('body_model', 'SMPL').upper(),
+                                    payload.get('gender', 'neutral').lower())
+        verts = verts + np.array([0, -verts[:, 1].min(), 0], dtype=np.float32)
+        # one renderer, created on first use, so /forward needs no display
+        with self.render_lock:
+            if self.renderer is None:
+                self.renderer = OffscreenBodyRenderer(*self.render_size)
+            self.renderer.set_mesh(build_body_mesh(verts, model.faces), joints)
+            self.renderer.setup_camera()
+            return self.renderer.render()
+
+    def stats(self):
+        return {
+            'models': sorted(self.pool.models.keys()),
+            'batches': {k: {'requests': b.n_requests, 'batches': b.n_batches,
+                            'queued': b.queue.qsize()}
+                        for k, b in self.pool.batchers.items()},
+        }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, code, body, content_type):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code, obj):
+        self._send(code, json.dumps(obj).encode(), 'application/json')
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length).decode())
+
+    def _send_error(self, e):
+        # 400 for malformed requests, 500 with the traceback logged otherwise
+        if isinstance(e, ConnectionError):
+            logger.debug(f'{self.command} {self.path}: client went away ({e})')
+            return
+        if isinstance(e, BAD_REQUEST_ERRORS):
+            logger.warning(f'{self.command} {self.path}: bad request: {e!r}')
+            code = 400
+        else:
+            logger.exception(f'{self.command} {self.path} failed')
+            code = 500
+        try:
+            self._send_json(code, {'error': f'{type(e).__name__}: {e}'})
+        except ConnectionError:
+            pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == '/health':
+                self._send_json(200, self.service.stats())
+            elif url.path == '/faces':
+                query = parse_qs(url.query)
+                body_model, gender = parse_model(query.get('body_model', ['SMPL'])[0],
+                                                 query.get('gender', ['neutral'])[0])
+                model = self.service.pool.get_model(body_model, gender)
+                faces = np.asarray(model.faces, dtype=np.int32)
+                self._send(200, encode_arrays({'faces': faces}), 'application/octet-stream')
+            else:
+                self._send_json(404, {'error': f'Unknown path {url.path}'})
+        except Exception as e:
+            self._send_error(e)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            payload = self._read_json()
+            if url.path == '/forward':
+                verts, joints = self.service.forward(payload)
+                outputs = payload.get('outputs', ['vertices', 'joints'])
+                arrays = {}
+                if 'vertices' in outputs:
+                    arrays['vertices'] = verts.astype(np.float32)
+                if 'joints' in outputs:
+                    arrays['joints'] = joints.astype(np.float32)
+                self._send(200, encode_arrays(arrays), 'application/octet-stream')
+            elif url.path == '/render':
+                from offscreen import write_image
+                image = self.service.render(payload)
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, 'render.png')
+                    write_image(path, image)
+                    with open(path, 'rb') as f:
+                        self._send(200, f.read(), 'image/png')
+            else:
+                self._send_json(404, {'error': f'Unknown path {url.path}'})
+        except Exception as e:
+            self._send_error(e)
+
+    def log_message(self, format, *args):
+        logger.debug(f'{self.address_string()} {format % args}')
+
+
+def create_server(host='127.0.0.1', port=8000, warm=(), max_batch=64, max_wait=0.005):
+    RequestHandler.service = BodyModelService(ModelPool(warm, max_batch, max_wait))
+    return ThreadingHTTPServer((host, port), RequestHandler)
+
+
+def serve(host='127.0.0.1', port=8000, warm=(), max_batch=64, max_wait=0.005, on_ready=None):
+    # on_ready is called with the model pool once the warm models are loaded
+    server = create_server(host, port, warm, max_batch, max_wait)
+    if on_ready is not None:
+        on_ready(RequestHandler.service.pool)
+    logger.info(f'Serving body models on http://{host}:{port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
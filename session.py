@@ -0,0 +1,15 @@
+from body_models import POSE_PARAM_SHAPES, get_default_pose_params
+
+
+class ViewerSession:
+    # Editing state of a single window. Several windows (e.g. one per --web
+    # client) run in one process; they each own a session and only share the
+    # read-only body models in AppWindow.PRELOADED_BODY_MODELS.
+    def __init__(self):
+        self.pose_params = {bm: get_default_pose_params(bm) for bm in POSE_PARAM_SHAPES}
+        self.joints = None
+        self.selected_joint = None
+        self.body_transl = None
+        self.cam_first = True
+        # index of the sequence frame on screen, None when the body shows pose_params
+        self.sequence_frame = None
@@ -0,0 +1,230 @@
+# Record the UI events of an editing session and replay them headlessly.
+#
+# Recording wraps the `_on_*` handlers as they are registered as widget or
+# menu callbacks and appends one json line per call, so only calls that came
+# from the UI are recorded, not handlers called by other code. Replaying restores the widget value the event carried, calls
+# the same handler on a window of the headless (WebRTC) window system and
+# reports per-handler latency percentiles.
+#
+# Mouse events are not recorded: camera moves happen inside the scene widget
+# and joint picks finish in an asynchronous depth callback, so replaying them
+# would not reproduce the session. Old recordings that contain them have
+# them skipped.
+import json
+import time
+import functools
+import threading
+import numpy as np
+from loguru import logger
+import open3d.visualization.gui as gui
+
+# handlers that are not user input, or would end the replay
+SKIPPED_HANDLERS = ('_on_layout', '_on_stream_tick', '_on_menu_quit')
+
+# handler -> widget whose value the event changed
+HANDLER_WIDGETS = {
+    '_on_show_skybox': '_show_skybox',
+    '_on_show_axes': '_show_axes',
+    '_on_show_ground': '_show_ground',
+    '_on_lighting_profile': '_profiles',
+    '_on_lod_level': '_lod_level',
+    '_on_use_ibl': '_use_ibl',
+    '_on_use_sun': '_use_sun',
+    '_on_new_ibl': '_ibl_map',
+    '_on_ibl_intensity': '_ibl_intensity',
+    '_on_sun_intensity': '_sun_intensity',
+    '_on_shader': '_shader',
+    '_on_material_prefab': '_material_prefab',
+    '_on_point_size': '_point_size',
+    '_on_show_joints': '_show_joints',
+    '_on_show_joint_labels': '_show_joint_labels',
+    '_on_show_skeleton': '_show_skeleton',
+    '_on_show_hud': '_show_hud',
+    '_on_body_model': '_body_model',
+    '_on_body_model_gender': '_body_model_gender',
+    '_on_body_beta_val': '_body_beta_val',
+    '_on_body_model_shape_comp': '_body_model_shape_comp',
+    '_on_body_exp_val': '_body_exp_val',
+    '_on_body_model_exp_comp': '_body_model_exp_comp',
+    '_on_body_pose_comp': '_body_pose_comp',
+    '_on_body_pose_joint': '_body_pose_joint',
+    '_on_body_pose_joint_x': '_body_pose_joint_x',
+    '_on_body_pose_joint_y': '_body_pose_joint_y',
+    '_on_body_pose_joint_z': '_body_pose_joint_z',
+    '_on_seq_scrub': '_seq_scrubber',
+}
+
+
+def encode_arg(arg):
+    if isinstance(arg, (bool, int, float, str)) or arg is None:
+        return arg
+    if isinstance(arg, np.ndarray):
+        return {'__type__': 'ndarray', 'value': arg.tolist()}
+    if isinstance(arg, gui.KeyEvent):
+        return {'__type__': 'KeyEvent', 'type': int(arg.type), 'key': int(arg.key)}
+    if isinstance(arg, gui.Color):
+        return {'__type__': 'Color', 'value': [arg.red, arg.green, arg.blue, arg.alpha]}
+    return {'__type__': 'unsupported', 'repr': repr(arg)}
+
+
+def decode_arg(arg):
+    if not isinstance(arg, dict):
+        return arg
+    kind = arg['__type__']
+    if kind == 'ndarray':
+        return np.array(arg['value'])
+    if kind == 'Color':
+        return gui.Color(*arg['value'])
+    if kind == 'KeyEvent':
+        event = gui.KeyEvent()
+        event.type = gui.KeyEvent.Type(arg['type'])
+        event.key = arg['key']
+        return event
+    raise ValueError(f'Cannot replay argument {arg["repr"]}')
+
+
+class EventRecorder:
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.n_events = 0
+
+    def record(self, handler, args, kwargs):
+        if args and isinstance(args[0], gui.MouseEvent):
+            return
+        line = json.dumps({
+            't': time.perf_counter() - self.start,
+            'handler': handler,
+            'args': [encode_arg(a) for a in args],
+            'kwargs': {k: encode_arg(v) for k, v in kwargs.items()},
+        })
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(line + '\n')
+            self.file.flush()
+            self.n_events += 1
+
+    def wrap_callback(self, callback):
+        # bound `_on_*` methods are recorded under their name, anything else
+        # (menu ids, lambdas, skipped handlers) is passed through
+        name = getattr(callback, '__name__', '')
+        if not callable(callback) or not name.startswith('_on_') or name in SKIPPED_HANDLERS:
+            return callback
+
+        @functools.wraps(callback)
+        def wrapper(*args, **kwargs):
+            self.record(name, args, kwargs)
+            return callback(*args, **kwargs)
+
+        return wrapper
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        logger.info(f'Recorded {self.n_events} events to {self.file.name}')
+
+
+def instrument_recording(recorder):
+    # Wraps the `set_on_*` methods of the gui classes so callbacks are
+    # recorded from the moment they are registered; must run before windows
+    # are created
+    def wrap_setter(setter):
+        @functools.wraps(setter)
+        def wrapper(widget, *args):
+            return setter(widget, *[recorder.wrap_callback(a) for a in args])
+
+        return wrapper
+
+    for cls in vars(gui).values():
+        if not isinstance(cls, type):
+            continue
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('set_on_') and callable(value):
+                setattr(cls, attr, wrap_setter(value))
+
+
+def load_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def apply_widget_state(window, handler, args):
+    widget = getattr(window, HANDLER_WIDGETS.get(handler, ''), None)
+    if widget is None or not args:
+        return
+    if isinstance(widget, gui.Combobox):
+        widget.selected_index = args[1]
+    elif isinstance(widget, gui.Checkbox):
+        widget.checked = args[0]
+    elif isinstance(widget, gui.Slider):
+        if widget.type == gui.Slider.INT:
+            widget.int_value = int(args[0])
+        else:
+            widget.double_value = args[0]
+
+
+def summarize_latencies(latencies):
+    def stats(values):
+        values = np.asarray(values)
+        return {
+            'count': int(values.size),
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p90_ms': float(np.percentile(values, 90)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max()),
+        }
+
+    report = {name: stats(values) for name, values in sorted(latencies.items())}
+    all_values = [v for values in latencies.values() for v in values]
+    if all_values:
+        report['all'] = stats(all_values)
+    return report
+
+
+def print_latency_report(report):
+    print(f'{"handler":32s} {"count":>6s} {"p50":>8s} {"p90":>8s} {"p99":>8s} {"max":>8s}')
+    for name, s in report.items():
+        print(f'{name:32s} {s["count"]:6d} {s["p50_ms"]:8.2f} {s["p90_ms"]:8.2f} '
+              f'{s["p99_ms"]:8.2f} {s["max_ms"]:8.2f}')
+
+
+def replay(window, events, realtime=False, on_done=None):
+    # Events are posted to the UI thread one at a time, so each handler runs
+    # against the state left by the previous one. With `realtime` the
+    # recorded gaps between events are kept, otherwise they run back to back.
+    latencies = {}
+    is_mouse = [any(isinstance(a, dict) and a.get('__type__') == 'MouseEvent' for a in e['args'])
+                for e in events]
+    if any(is_mouse):
+        logger.warning(f'Skipping {sum(is_mouse)} mouse events, they cannot be replayed')
+        events = [e for e, mouse in zip(events, is_mouse) if not mouse]
+
+    def run_event(event, finished):
+        args = [decode_arg(a) for a in event['args']]
+        kwargs = {k: decode_arg(v) for k, v in event.get('kwargs', {}).items()}
+        apply_widget_state(window, event['handler'], args)
+        start = time.perf_counter()
+        try:
+            getattr(window, event['handler'])(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f'{event["handler"]} failed during replay: {e}')
+        latencies.setdefault(event['handler'], []).append(1000 * (time.perf_counter() - start))
+        finished.set()
+
+    def worker():
+        start = time.perf_counter()
+        for event in events:
+            if realtime:
+                time.sleep(max(0.0, event['t'] - (time.perf_counter() - start)))
+            finished = threading.Event()
+            gui.Application.instance.post_to_main_thread(
+                window.window, lambda event=event, finished=finished: run_event(event, finished))
+            finished.wait()
+        report = summarize_latencies(latencies)
+        if on_done is not None:
+            gui.Application.instance.post_to_main_thread(window.window, lambda: on_done(report))
+
+    threading.Thread(target=worker, daemon=True).start()
@@ -5,6 +5,8 @@ from tqdm import tqdm
 from smplx import SMPL
 from loguru import logger
 
+from tracing import traced
+
 
 def timeit(func):
     def wrapper(*args, **kwargs):
@@ -16,6 +18,7 @@ def timeit(func):
 
     return wrapper
 
+@traced(name='simple_ik_solver')
 @timeit
 def simple_ik_solver(model, target, init=None, device='cpu', max_iter=20,
                      mse_threshold=1e-8, transl=torch.zeros(1, 3), betas=None):
@@ -44,6 +47,32 @@ def simple_ik_solver(model, target, init=None, device='cpu', max_iter=20,
     logger.info(f'IK final loss {last_mse.item():.3f}')
     return init_pose
 
+
+class IncrementalIKSolver:
+    # Keeps the pose and the optimizer state alive between calls so that
+    # each mouse-move event only needs a few warm-started iterations.
+    def __init__(self, model, init, device='cpu', lr=0.05, n_joints=22, **model_kwargs):
+        self.model = model
+        self.n_joints = n_joints
+        self.model_kwargs = model_kwargs
+        self.pose = init.reshape(1, -1).detach().clone().to(device).requires_grad_(True)
+        self.optimizer = torch.optim.Adam([self.pose], lr=lr)
+        self.last_loss = None
+
+    @traced
+    def step(self, target, max_iter=5, time_budget=0.015):
+        start = time.perf_counter()
+        for i in range(max_iter):
+            joints = self.model(body_pose=self.pose, **self.model_kwargs).joints[0, :self.n_joints]
+            loss = torch.mean(torch.square(joints - target))
+            self.optimizer.zero_grad()
+            loss.backward()
+            self.optimizer.step()
+            self.last_loss = loss.item()
+            if time.perf_counter() - start > time_budget:
+                break
+        return self.pose.detach().clone()
+
 if __name__ == '__main__':
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
     model = SMPL(f'data/body_models/smpl').float()
@@ -0,0 +1,119 @@
+import json
+import time
+import threading
+from loguru import logger
+
+
+class AdaptiveStreamController:
+    # Decides the resolution and frame rate a --web window is streamed at.
+    #
+    # Inputs are the measured cost of a scene update (forward pass + mesh
+    # upload + render) and optional client feedback sent over the WebRTC data
+    # channel. While the scene is changing the render quality is lowered and
+    # updates are paced to the target FPS; once nothing changed for
+    # ``idle_after`` seconds a single full quality frame is pushed. The window
+    # size is left to the client.
+    #
+    # quality levels: 2 full, 1 no antialiasing / post-processing, 0 also no shadows
+    MAX_QUALITY = 2
+
+    def __init__(self, fps_range=(10, 30), idle_after=0.5, smoothing=0.2, adjust_every=0.25):
+        self.min_fps, self.max_fps = fps_range
+        self.idle_after = idle_after
+        self.smoothing = smoothing
+        self.adjust_every = adjust_every
+        self.last_adjust = 0.0
+
+        self.quality = self.MAX_QUALITY
+        self.target_fps = self.max_fps
+        self.frame_cost = None
+        self.client_fps = None
+        self.client_rtt = None
+        self.last_change = 0.0
+        self.last_push = 0.0
+        self.dirty = False
+        self.idle = True
+        self.lock = threading.Lock()
+
+    def record_frame(self, seconds):
+        with self.lock:
+            if self.frame_cost is None:
+                self.frame_cost = seconds
+            else:
+                self.frame_cost += self.smoothing * (seconds - self.frame_cost)
+
+    def record_feedback(self, message):
+        # {"fps": frames decoded per second, "rtt_ms": round trip time}
+        with self.lock:
+            self.client_fps = message.get('fps', self.client_fps)
+            self.client_rtt = message.get('rtt_ms', self.client_rtt)
+
+    def mark_changed(self, now=None):
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            self.last_change = now
+            self.dirty = True
+            self.idle = False
+
+    def should_push(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return now - self.last_push >= 1.0 / self.target_fps
+
+    def pushed(self, now=None):
+        self.last_push = time.perf_counter() if now is None else now
+        self.dirty = False
+
+    def update(self, now=None):
+        # returns True when the stream settings changed
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            old = (self.quality, self.target_fps, self.idle)
+            if now - self.last_change > self.idle_after:
+                self.idle = True
+                self.quality = self.MAX_QUALITY
+                return old != (self.quality, self.target_fps, self.idle)
+            if now - self.last_adjust < self.adjust_every:
+                self.idle = False
+                return old != (self.quality, self.target_fps, self.idle)
+            self.last_adjust = now
+
+            budget = 1.0 / self.target_fps
+            client_behind = self.client_fps is not None and self.client_fps < 0.8 * self.target_fps
+            if (self.frame_cost is not None and self.frame_cost > 0.8 * budget) or client_behind:
+                if self.quality > 0:
+                    self.quality -= 1
+                else:
+                    self.target_fps = max(self.min_fps, self.target_fps - 5)
+            elif self.frame_cost is not None and self.frame_cost < 0.4 * budget:
+                if self.target_fps < self.max_fps:
+                    self.target_fps = min(self.max_fps, self.target_fps + 5)
+                else:
+                    self.quality = min(self.MAX_QUALITY, self.quality + 1)
+            changed = old != (self.quality, self.target_fps, self.idle)
+        if changed:
+            logger.debug(f'Stream quality {self.quality}, {self.target_fps} fps '
+                         f'(frame cost {1000 * (self.frame_cost or 0):.1f} ms)')
+        return changed
+
+def register_feedback_channel(controllers):
+    # Clients send {"class_name": "stream_feedback", "window_uid": "window_0",
+    # "fps": .., "rtt_ms": ..} on the WebRTC data channel. ``controllers`` maps
+    # window uids to the controller of that window; the WebRTC window system
+    # names windows window_0, window_1, .. in creation order.
+    import open3d as o3d
+
+    def on_message(message):
+        try:
+            feedback = json.loads(message)
+            controller = controllers.get(feedback.get('window_uid'))
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f'Ignoring malformed stream feedback {message!r}: {e}')
+            return 'malformed'
+        if controller is None:
+            logger.warning(f'Ignoring stream feedback for unknown window {feedback.get("window_uid")!r}')
+            return 'unknown window'
+        controller.record_feedback(feedback)
+        return 'ok'
+
+    o3d.visualization.webrtc_server.register_data_channel_message_callback(
+        'stream_feedback', on_message)
@@ -0,0 +1,137 @@
+# Writes body model files with the structure of the official SMPL, SMPL-X,
+# MANO and FLAME releases but random contents, so that smplx (and
+# build_body_model) can load them on machines without the licensed files.
+# The meshes are UV spheres with a configurable vertex count; the joint
+# counts are those of the smplx classes, which fix the pose dimensions.
+import os
+import pickle
+import argparse
+import numpy as np
+from loguru import logger
+
+from body_models import BODY_MODEL_DIR
+
+N_JOINTS = {'SMPL': 24, 'SMPLX': 55, 'MANO': 16, 'FLAME': 5}
+DEFAULT_N_VERTS = {'SMPL': 6890, 'SMPLX': 10475, 'MANO': 778, 'FLAME': 5023}
+N_LANDMARKS = 51
+N_CONTOUR_LANDMARKS = 17
+
+
+def get_sphere_mesh(n_verts, radius=0.5):
+    # rows x cols grid wrapped around a sphere, about n_verts vertices
+    rows = max(3, int(np.sqrt(n_verts / 2)))
+    cols = max(3, n_verts // rows)
+    theta = np.linspace(0.05, np.pi - 0.05, rows)
+    phi = np.linspace(0, 2 * np.pi, cols, endpoint=False)
+    theta, phi = np.meshgrid(theta, phi, indexing='ij')
+    verts = radius * np.stack([
+        np.sin(theta) * np.cos(phi),
+        np.cos(theta) * 2,  # stretched along y, like a standing body
+        np.sin(theta) * np.sin(phi),
+    ], axis=-1).reshape(-1, 3)
+
+    r, c = np.meshgrid(np.arange(rows - 1), np.arange(cols), indexing='ij')
+    v0 = r * cols + c
+    v1 = r * cols + (c + 1) % cols
+    v2 = v0 + cols
+    v3 = v1 + cols
+    faces = np.concatenate([
+        np.stack([v0, v2, v1], axis=-1).reshape(-1, 3),
+        np.stack([v1, v2, v3], axis=-1).reshape(-1, 3),
+    ])
+    return verts.astype(np.float64), faces.astype(np.uint32)
+
+
+def get_synthetic_model_data(body_model, n_verts=None, n_shape=10, n_expression=10, seed=0):
+    rng = np.random.default_rng(seed)
+    n_joints = N_JOINTS[body_model]
+    verts, faces = get_sphere_mesh(n_verts or DEFAULT_N_VERTS[body_model])
+    n_verts = verts.shape[0]
+
+    # joints are the means of random vertex clusters, skinning weights fall
+    # off with the distance to them
+    centers = verts[rng.choice(n_verts, n_joints, replace=False)] * 0.8
+    dist = np.linalg.norm(verts[:, None] - centers[None], axis=-1)
+    weights = np.exp(-dist / 0.05)
+    weights /= weights.sum(1, keepdims=True)
+    nearest = np.argsort(dist, axis=0)[:8]
+    j_regressor = np.zeros((n_joints, n_verts))
+    j_regressor[np.arange(n_joints)[None].repeat(8, 0), nearest] = 1.0 / 8
+
+    # every joint hangs off one of the joints before it
+    parents = np.concatenate([[4294967295], [rng.integers(0, i) for i in range(1, n_joints)]])
+    n_dirs = n_shape + (n_expression if body_model in ('SMPLX', 'FLAME') else 0)
+    data = {
+        'v_template': verts,
+        'f': faces,
+        'weights': weights,
+        'J_regressor': j_regressor,
+        'kintree_table': np.stack([parents, np.arange(n_joints)]).astype(np.int64),
+        'shapedirs': rng.normal(scale=1e-3, size=(n_verts, 3, n_dirs)),
+        'posedirs': rng.normal(scale=1e-4, size=(n_verts, 3, (n_joints - 1) * 9)),
+    }
+    n_faces = faces.shape[0]
+    if body_model == 'SMPLX':
+        for side in 'lr':
+            data[f'hands_components{side}'] = np.eye(45)
+            data[f'hands_mean{side}'] = np.zeros(45)
+        data['lmk_faces_idx'] = rng.integers(0, n_faces, N_LANDMARKS)
+        data['lmk_bary_coords'] = rng.dirichlet(np.ones(3), N_LANDMARKS)
+        data['dynamic_lmk_faces_idx'] = rng.integers(0, n_faces, (79, N_CONTOUR_LANDMARKS))
+        data['dynamic_lmk_bary_coords'] = rng.dirichlet(np.ones(3), (79, N_CONTOUR_LANDMARKS))
+    elif body_model == 'MANO':
+        data['hands_components'] = np.eye(45)
+        data['hands_mean'] = np.zeros(45)
+    return data
+
+
+def write_synthetic_models(output_dir, body_models=('SMPL', 'SMPLX', 'MANO', 'FLAME'),
+                           genders=('neutral', 'male', 'female'), n_verts=None, **kwargs):
+    # Same layout as BODY_MODEL_DIR, so `build_body_model(bm, gender, output_dir)`
+    # loads the synthetic files.
+    for body_model in body_models:
+        model_dir = os.path.join(output_dir, body_model.lower())
+        os.makedirs(model_dir, exist_ok=True)
+        data = get_synthetic_model_data(body_model, n_verts, **kwargs)
+        names = {
+            'SMPL': [f'SMPL_{g.upper()}.pkl' for g in genders],
+            'SMPLX': [f'SMPLX_{g.upper()}.npz' for g in genders],
+            'MANO': ['MANO_RIGHT.pkl', 'MANO_LEFT.pkl'],
+            'FLAME': [f'FLAME_{g.upper()}.pkl' for g in genders],
+        }[body_model]
+        for name in names:
+            path = os.path.join(model_dir, name)
+            if name.endswith('.npz'):
+                np.savez(path, **data)
+            else:
+                with open(path, 'wb') as f:
+                    pickle.dump(data, f)
+
+        if body_model == 'FLAME':
+            rng = np.random.default_rng(0)
+            n_faces = data['f'].shape[0]
+            with open(os.path.join(model_dir, 'flame_static_embedding.pkl'), 'wb') as f:
+                pickle.dump({
+                    'lmk_face_idx': rng.integers(0, n_faces, N_LANDMARKS),
+                    'lmk_b_coords': rng.dirichlet(np.ones(3), N_LANDMARKS),
+                }, f)
+            np.save(os.path.join(model_dir, 'flame_dynamic_embedding.npy'), {
+                'lmk_face_idx': rng.integers(0, n_faces, (79, N_CONTOUR_LANDMARKS)),
+                'lmk_b_coords': rng.dirichlet(np.ones(3), (79, N_CONTOUR_LANDMARKS)),
+            }, allow_pickle=True)
+        logger.info(f'Wrote synthetic {body_model} with {data["v_template"].shape[0]} vertices '
+                    f'to {model_dir}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic body model files')
+    parser.add_argument('output_dir', help=f'Output directory, same layout as {BODY_MODEL_DIR}')
+    parser.add_argument('--body-models', nargs='+', default=['SMPL', 'SMPLX', 'MANO', 'FLAME'])
+    parser.add_argument('--n-verts', type=int, default=None,
+                        help='Vertex count, defaults to that of the real model')
+    parser.add_argument('--n-shape', type=int, default=10, help='Number of shape components')
+    parser.add_argument('--n-expression', type=int, default=10, help='Number of expression components')
+    args = parser.parse_args()
+
+    write_synthetic_models(args.output_dir, args.body_models, n_verts=args.n_verts,
+                           n_shape=args.n_shape, n_expression=args.n_expression)
@@ -0,0 +1,132 @@
+# Picks the torch intra-op and BLAS/OpenMP thread counts per host. The
+# defaults use every core, which oversubscribes the CPU once the renderer,
+# the sequence prefetch thread and IK run at the same time. The tuner times
+# the forward pass and IK of the loaded models for a few thread counts and
+# caches the fastest (fewest threads within 5% of the best) per host.
+import os
+import json
+import time
+import socket
+import platform
+import numpy as np
+import torch
+from loguru import logger
+
+from body_models import get_default_pose_params
+from simple_ik import IncrementalIKSolver
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'body_model_visualizer', 'threads.json')
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def get_host_key():
+    return f'{socket.gethostname()}-{platform.machine()}-{os.cpu_count()}cpu-torch{torch.__version__}'
+
+
+def get_candidates(n_cpus=None):
+    # leave a core for the render thread
+    n_cpus = max(1, (n_cpus or os.cpu_count() or 1) - 1)
+    candidates = {1, n_cpus}
+    n = 2
+    while n < n_cpus:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def time_models(models, repeat=10, prefetch_batch=32):
+    # interactive forward + IK step, plus a prefetch-sized batch weighted as
+    # one frame's share of it
+    total = 0.0
+    for body_model, model in models.items():
+        for batch_size, weight in ((1, 1.0), (prefetch_batch, 1.0 / prefetch_batch)):
+            betas = torch.zeros(batch_size, 10)
+            pose_params = {k: v.reshape(batch_size, -1)
+                           for k, v in get_default_pose_params(body_model, batch_size).items()}
+            with torch.no_grad():
+                samples = []
+                for i in range(repeat + 1):
+                    start = time.perf_counter()
+                    model(betas=betas, expression=torch.zeros(batch_size, 10), **pose_params)
+                    if i > 0:
+                        samples.append(time.perf_counter() - start)
+            total += weight * float(np.median(samples))
+        if body_model in ('SMPL', 'SMPLX'):
+            pose = get_default_pose_params(body_model, 1)['body_pose']
+            solver = IncrementalIKSolver(model, pose, betas=torch.zeros(1, 10))
+            with torch.no_grad():
+                target = model(betas=torch.zeros(1, 10)).joints[0, :22] + 0.05
+            samples = []
+            for i in range(repeat + 1):
+                start = time.perf_counter()
+                solver.step(target, max_iter=2, time_budget=float('inf'))
+                if i > 0:
+                    samples.append(time.perf_counter() - start)
+            total += float(np.median(samples))
+    return total
+
+
+def tune_threads(models, candidates=None, repeat=10):
+    previous = torch.get_num_threads()
+    timings = {}
+    for n in candidates or get_candidates():
+        torch.set_num_threads(n)
+        timings[n] = time_models(models, repeat)
+        logger.debug(f'{n} threads: {1000 * timings[n]:.2f} ms')
+    torch.set_num_threads(previous)
+    best = min(timings.values())
+    n_threads = min(n for n, t in timings.items() if t <= 1.05 * best)
+    return {
+        'torch_threads': n_threads,
+        'blas_threads': n_threads,
+        'timings_ms': {str(n): 1000 * t for n, t in timings.items()},
+        'models': sorted(models.keys()),
+    }
+
+
+def load_cached_config(path=CACHE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get(get_host_key())
+
+
+def save_cached_config(config, path=CACHE_PATH):
+    cache = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            cache = json.load(f)
+    cache[get_host_key()] = config
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+
+def apply_thread_config(torch_threads=None, blas_threads=None):
+    if torch_threads is not None:
+        torch.set_num_threads(torch_threads)
+    if blas_threads is not None:
+        # child processes (e.g. batch_render workers) read the environment;
+        # libraries already loaded here are limited through threadpoolctl
+        for var in BLAS_ENV_VARS:
+            os.environ[var] = str(blas_threads)
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(blas_threads)
+        except ImportError:
+            pass
+    logger.info(f'Using {torch.get_num_threads()} torch threads, '
+                f'{os.environ.get("OMP_NUM_THREADS", "default")} BLAS/OpenMP threads')
+
+
+def configure_threads(models, torch_threads=None, blas_threads=None, retune=False, cache_path=CACHE_PATH):
+    # explicit counts win, then the cached config of this host, then a new tuning run
+    if torch_threads is None and blas_threads is None:
+        config = None if retune else load_cached_config(cache_path)
+        if config is None and models:
+            logger.info(f'Tuning thread counts for {", ".join(sorted(models))}')
+            config = tune_threads(models)
+            save_cached_config(config, cache_path)
+        if config is not None:
+            torch_threads, blas_threads = config['torch_threads'], config['blas_threads']
+    apply_thread_config(torch_threads, blas_threads)
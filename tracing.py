@@ -0,0 +1,93 @@
+# Opt-in span tracing, exported as Chrome trace json (chrome://tracing or
+# https://ui.perfetto.dev). Spans are kept in a ring buffer, so tracing can
+# stay on in long sessions; when tracing is disabled `span` and `traced`
+# cost a single global lookup.
+import os
+import json
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from loguru import logger
+
+TRACER = None
+
+
+class Tracer:
+    def __init__(self, capacity=200000):
+        self.events = deque(maxlen=capacity)
+        self.thread_names = {}
+        self.pid = os.getpid()
+
+    def add(self, name, start_ns, end_ns, args=None):
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        event = {
+            'name': name, 'ph': 'X', 'pid': self.pid, 'tid': tid,
+            'ts': start_ns / 1000, 'dur': (end_ns - start_ns) / 1000,
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def dump(self, path):
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in self.thread_names.items()
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': metadata + list(self.events), 'displayTimeUnit': 'ms'}, f)
+        logger.info(f'Wrote {len(self.events)} trace events to {path}')
+
+
+def enable_tracing(capacity=200000):
+    global TRACER
+    TRACER = Tracer(capacity)
+    return TRACER
+
+
+def disable_tracing():
+    global TRACER
+    TRACER = None
+
+
+@contextmanager
+def span(name, **args):
+    tracer = TRACER
+    if tracer is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        tracer.add(name, start, time.perf_counter_ns(), args)
+
+
+def traced(fn=None, name=None):
+    if fn is None:
+        return functools.partial(traced, name=name)
+    span_name = name or fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        tracer = TRACER
+        if tracer is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            tracer.add(span_name, start, time.perf_counter_ns())
+
+    return wrapper
+
+
+def instrument_class(cls, prefixes=('_on_',), names=()):
+    # Replaces matching methods on the class itself; must run before the
+    # instances register their bound methods as GUI callbacks.
+    for attr, value in list(vars(cls).items()):
+        if callable(value) and (attr.startswith(prefixes) or attr in names):
+            setattr(cls, attr, traced(value))
@@ -518,32 +518,65 @@ BODY_KEYPOINT_NAMES = [SMPLX_NAMES[ii] for ii in BODY_IDXS]
 
 
 def get_checkerboard_plane(plane_width=20, num_boxes=15, center=True):
-
+    # A single triangle mesh with per-vertex colors, so any grid resolution
+    # is one geometry and one draw call. Every tile owns its 4 corners so the
+    # colors do not bleed across tile borders.
     pw = plane_width/num_boxes
     # white = [0.8, 0.8, 0.8]
     # black = [0.2, 0.2, 0.2]
     white = [230./255., 244./255., 244./255.]
     black = [int(150 / 1.3)/255., int(217 / 1.3)/255., int(217 / 1.3)/255.]
 
-    meshes = []
-    for i in range(num_boxes):
-        for j in range(num_boxes):
-            c = i * pw, j * pw
-            # ground = trimesh.primitives.Box(
-            #     center=[0, 0, -0.0001],
-            #     extents=[pw, pw, 0.0002]
-            # )
-            ground = o3d.geometry.TriangleMesh.create_box(width=pw, height=0.0002, depth=pw)
-
-            if center:
-                c = c[0]+(pw/2)-(plane_width/2), c[1]+(pw/2)-(plane_width/2)
-            # trans = trimesh.transformations.scale_and_translate(scale=1, translate=[c[0], c[1], 0])
-            ground.translate([c[0], 0, c[1]])
-            # ground.apply_transform(trimesh.transformations.rotation_matrix(np.rad2deg(-120), direction=[1,0,0]))
-            ground.paint_uniform_color(black if ((i+j) % 2) == 0 else white)
-            meshes.append(ground)
-
-    return meshes
+    i, j = np.meshgrid(np.arange(num_boxes), np.arange(num_boxes), indexing='ij')
+    i, j = i.reshape(-1), j.reshape(-1)
+    x0, z0 = i * pw, j * pw
+    if center:
+        x0, z0 = x0 - (plane_width/2), z0 - (plane_width/2)
+    x1, z1 = x0 + pw, z0 + pw
+
+    # (num_tiles, 4, 3) corners, in the xz plane at y=0
+    y = np.zeros_like(x0)
+    corners = np.stack([
+        np.stack([x0, y, z0], axis=1),
+        np.stack([x1, y, z0], axis=1),
+        np.stack([x1, y, z1], axis=1),
+        np.stack([x0, y, z1], axis=1),
+    ], axis=1)
+
+    # wound so that the normals point to +y
+    base = (np.arange(len(x0)) * 4)[:, None]
+    triangles = np.concatenate([
+        base + np.array([0, 2, 1]),
+        base + np.array([0, 3, 2]),
+    ], axis=0)
+
+    tile_colors = np.where((((i + j) % 2) == 0)[:, None], black, white)
+    colors = np.repeat(tile_colors, 4, axis=0)
+
+    ground = o3d.geometry.TriangleMesh()
+    ground.vertices = o3d.utility.Vector3dVector(corners.reshape(-1, 3))
+    ground.triangles = o3d.utility.Vector3iVector(triangles.astype(np.int32))
+    ground.vertex_colors = o3d.utility.Vector3dVector(colors)
+    return ground
+
+
+def get_skeleton_bones(parents):
+    # (num_bones, 2) array of (parent, child) joint indices, root excluded
+    parents = np.asarray(parents).astype(np.int64)
+    children = np.arange(len(parents), dtype=np.int64)
+    valid = parents >= 0
+    return np.stack([parents[valid], children[valid]], axis=1)
+
+
+def get_skeleton_lineset(joints, bones, color=(0.1, 0.1, 0.1)):
+    # Every bone owns its two endpoints, so refreshing the overlay is a single
+    # fancy-indexing op: points = joints[bones.reshape(-1)]
+    lines = np.arange(2 * len(bones), dtype=np.int32).reshape(-1, 2)
+    line_set = o3d.geometry.LineSet()
+    line_set.points = o3d.utility.Vector3dVector(joints[bones.reshape(-1)])
+    line_set.lines = o3d.utility.Vector2iVector(lines)
+    line_set.paint_uniform_color(color)
+    return line_set
 
 
 if __name__ == '__main__':
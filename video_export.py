@@ -0,0 +1,200 @@
+import os
+import math
+import queue
+import argparse
+import threading
+import subprocess
+import torch
+import numpy as np
+from loguru import logger
+
+from settings import Settings
+from offscreen import OffscreenBodyRenderer, write_image
+from body_models import (
+    build_body_mesh,
+    forward_body_model_batch,
+    load_saved_params,
+)
+from sequence import slice_sequence, z_up_to_y_up
+from motion_store import open_sequence
+
+
+class FFmpegWriter:
+    # Raw RGB frames are piped into ffmpeg's stdin. The OS pipe buffer is the
+    # only frame queue, so a slow encoder blocks the renderer instead of
+    # letting frames pile up in memory.
+    def __init__(self, path, width, height, fps=30, crf=18, codec='libx264'):
+        if width % 2 or height % 2:
+            raise ValueError(f'yuv420p needs even frame sizes, got {width}x{height}')
+        cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            '-c:v', codec, '-pix_fmt', 'yuv420p', '-crf', str(crf),
+            path,
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(np.ascontiguousarray(frame[..., :3]).tobytes())
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f'ffmpeg exited with code {self.proc.returncode}')
+
+
+class ImageSequenceWriter:
+    # PNG encoding runs on a few threads; the queue size bounds the number of
+    # frames held in memory at any time. The first encoding error is re-raised
+    # from write() or close(); the workers keep draining the queue so the
+    # producer never blocks on a dead worker.
+    def __init__(self, output_dir, max_in_flight=8, n_threads=2):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.queue = queue.Queue(maxsize=max_in_flight)
+        self.n_frames = 0
+        self.error = None
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(n_threads)]
+        for t in self.threads:
+            t.start()
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            path, frame = item
+            try:
+                write_image(path, frame)
+            except Exception as e:
+                logger.error(f'Failed to write {path}: {e}')
+                self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        path = os.path.join(self.output_dir, f'{self.n_frames:06d}.png')
+        self.queue.put((path, frame))
+        self.n_frames += 1
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        if self.error is not None:
+            raise self.error
+
+
+def get_writer(output, width, height, fps):
+    if output.endswith(('.mp4', '.mov', '.mkv', '.webm')):
+        return FFmpegWriter(output, width, height, fps=fps)
+    return ImageSequenceWriter(output)
+
+
+def get_turntable_eye(center, radius, angle, elevation=0.0):
+    return center + np.array([radius * math.sin(angle), elevation, radius * math.cos(angle)])
+
+
+def get_camera_radius(bounds, fov=60.0, margin=1.2):
+    extent = bounds.get_extent().max()
+    return margin * 0.5 * extent / math.tan(math.radians(fov) / 2)
+
+
+def export_turntable(renderer, writer, n_frames, fov=60.0, elevation=0.0):
+    bounds = renderer.mesh.get_axis_aligned_bounding_box()
+    center = bounds.get_center()
+    radius = get_camera_radius(bounds, fov)
+    for i in range(n_frames):
+        angle = 2 * math.pi * i / n_frames
+        renderer.look_at(center, get_turntable_eye(center, radius, angle, elevation), fov=fov)
+        writer.write(renderer.render())
+
+
+def export_sequence(renderer, writer, seq, model, batch_size=64, stride=1,
+                    fov=60.0, follow=False, z_up=True):
+    # Frames are posed in batches of ``batch_size`` and rendered one by one, so
+    # memory does not depend on the clip length.
+    ground = None
+    center = eye = None
+    for start in range(0, seq['n_frames'], batch_size * stride):
+        end = min(start + batch_size * stride, seq['n_frames'])
+        pose_params, transl = slice_sequence(seq, start, end)
+        pose_params = {k: v[::stride] for k, v in pose_params.items()}
+        verts, joints = forward_body_model_batch(
+            model, seq['betas'], torch.zeros(1, 10),
+            pose_params, transl[::stride],
+        )
+        if z_up:
+            verts, joints = z_up_to_y_up(verts), z_up_to_y_up(joints)
+        if ground is None:
+            # ground the clip once, on its first frame
+            ground = np.array([0, -verts[0, :, 1].min(), 0])
+
+        for v, j in zip(verts, joints):
+            renderer.set_mesh(build_body_mesh(v + ground, model.faces), j + ground)
+            if center is None:
+                bounds = renderer.mesh.get_axis_aligned_bounding_box()
+                center = bounds.get_center()
+                eye = get_turntable_eye(center, get_camera_radius(bounds, fov), 0.0)
+                root_start = j[0] + ground
+            if follow:
+                offset = (j[0] + ground) - root_start
+                renderer.look_at(center + offset, eye + offset, fov=fov)
+            else:
+                renderer.look_at(center, eye, fov=fov)
+            writer.write(renderer.render())
+
+
+def main(args):
+    renderer = OffscreenBodyRenderer(
+        width=args.width, height=args.height,
+        material=args.material, lighting=args.lighting,
+    )
+    if args.mode == 'turntable':
+        params = load_saved_params(args.input)
+        renderer.set_body(params)
+        writer = get_writer(args.output, args.width, args.height, args.fps)
+        export_turntable(renderer, writer, args.frames, elevation=args.elevation)
+    else:
+        clip = int(args.clip) if args.clip.isdigit() else args.clip
+        seq = open_sequence(args.input, args.body_model, clip=clip)
+        gender = args.gender or seq['gender']
+        model = renderer.get_model(args.body_model, gender)
+        fps = args.fps or seq['fps'] / args.stride
+        writer = get_writer(args.output, args.width, args.height, fps)
+        export_sequence(renderer, writer, seq, model, stride=args.stride,
+                        follow=args.follow, z_up=not args.y_up)
+    writer.close()
+    logger.info(f'Saved {args.output}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export turntable or pose sequence videos without a display')
+    parser.add_argument('mode', choices=['turntable', 'sequence'])
+    parser.add_argument('input', help='Saved model params (turntable), AMASS-style npz or motion store (sequence)')
+    parser.add_argument('--clip', default='0', help='Clip name or index when reading from a motion store')
+    parser.add_argument('--output', required=True, help='Video file (.mp4/.mov/.mkv/.webm) or image directory')
+    parser.add_argument('--width', type=int, default=1024)
+    parser.add_argument('--height', type=int, default=1024)
+    parser.add_argument('--fps', type=float, default=None)
+    parser.add_argument('--frames', type=int, default=120, help='Number of turntable frames')
+    parser.add_argument('--elevation', type=float, default=0.0, help='Turntable camera height offset')
+    parser.add_argument('--body-model', default='SMPL', choices=['SMPL', 'SMPLX'])
+    parser.add_argument('--gender', default=None)
+    parser.add_argument('--stride', type=int, default=1, help='Render every n-th sequence frame')
+    parser.add_argument('--follow', action='store_true', help='Camera follows the root joint')
+    parser.add_argument('--y-up', action='store_true', help='Sequence is already y-up')
+    parser.add_argument('--material', default=Settings.DEFAULT_MATERIAL_NAME,
+                        choices=sorted(Settings.PREFAB.keys()))
+    parser.add_argument('--lighting', default=Settings.DEFAULT_PROFILE_NAME,
+                        choices=sorted(Settings.LIGHTING_PROFILES.keys()))
+
+    args = parser.parse_args()
+    if args.fps is None and args.mode == 'turntable':
+        args.fps = 30
+    main(args)